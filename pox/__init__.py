@@ -0,0 +1,52 @@
+import sys
+
+# `import pox` loads nothing else: each name below is imported from its
+# module the first time it is looked up, and then kept in the package.
+_LAZY = {
+    "lex_and_parse": "pox.func_parse",
+    "parse_file": "pox.func_parse",
+    "to_json": "pox.func_parse",
+    "Session": "pox.func_parse",
+    "tokenize": "pox.tokenizer",
+    "iter_tokens": "pox.tokenizer",
+    "iter_file_tokens": "pox.tokenizer",
+    "TokenStream": "pox.tokenizer",
+    "TokenBuffer": "pox.tokenizer",
+    "SymbolTable": "pox.symbols",
+    "LineIndex": "pox.lines",
+    "parse_many": "pox.batch",
+    "ParseCache": "pox.cache",
+    "NodeFactory": "pox.hashcons",
+    "AstArena": "pox.arena",
+}
+
+_SUBMODULES = (
+    "arena", "ast_binary", "ast_json", "batch", "bytecode", "cache", "func_parse", "grammar", "hashcons", "interp", "lines", "mutable_parse",
+    "incremental", "optimize", "pycompile", "resolver", "stack_parse", "symbols", "token_types", "tokenizer", "vm",
+)
+
+
+def _import(module: str) -> object:
+    # plain __import__ rather than importlib, which would cost more to
+    # import than this whole package
+    __import__(module)
+    return sys.modules[module]
+
+
+def __getattr__(name: str) -> object:
+    module = _LAZY.get(name)
+    if module is not None:
+        value = getattr(_import(module), name)
+    elif name in _SUBMODULES:
+        value = _import(f"pox.{name}")
+    else:
+        raise AttributeError(f"module 'pox' has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_LAZY) | set(_SUBMODULES))
+
+
+__all__ = list(_LAZY)
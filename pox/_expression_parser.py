@@ -0,0 +1,209 @@
+# generated by pox.grammar, don't edit. change the grammar there and run
+# `python -m pox.grammar` to regenerate this file.
+from pox.token_types import TOKEN_TYPES, CLOSE_PAREN, FALSE, NULL, NUMBER, OPEN_PAREN, STRING, TRUE
+from pox import token_types as TT
+# imported from the bottom of pox.mutable_parse, which defines all of this
+from pox.mutable_parse import Binary, Grouping, Literal, Unary
+from pox.mutable_parse import _binary_operators, _unary_operators, expected, unexpected
+
+
+def expression(tokens, i):
+    # precedence climbing with explicit stacks: operands wait on `operands`
+    # until an operator that binds no tighter than the one before them
+    # shows up, then the pending operators are folded in, left associative
+    binary = _binary_operators
+    unary = _unary_operators
+    operands = []
+    pending = []
+
+    while True:
+        if not tokens.has(i):
+            unexpected(tokens, i, 'Expect expression')
+        token = tokens[i]
+        token_type = token.token_type
+        if token_type is NUMBER:
+            i += 1
+            expr = Literal(float(token.lexeme))
+        elif unary[token_type.code] is None:
+            expr, i = primary(tokens, i)
+        else:
+            prefix = []
+            while tokens.has(i) and unary[tokens[i].token_type.code] is not None:
+                prefix.append(unary[tokens[i].token_type.code])
+                i += 1
+            expr, i = primary(tokens, i)
+            for operator in reversed(prefix):
+                expr = Unary(operator, expr)
+
+        entry = binary[tokens[i].token_type.code] if tokens.has(i) else None
+        while pending and (entry is None or pending[-1][0] >= entry[0]):
+            expr = Binary(operands.pop(), pending.pop()[1], expr)
+
+        if entry is None:
+            return expr, i
+        operands.append(expr)
+        pending.append(entry)
+        i += 1
+
+
+def primary(tokens, i):
+    if not tokens.has(i):
+        primary_error(tokens, i)
+    return primary_alternatives[tokens[i].token_type.code](tokens, i)
+
+
+def primary_error(tokens, i):
+    unexpected(tokens, i, 'Expect expression')
+
+
+def primary_1(tokens, i):
+    # FALSE
+    i += 1
+    return Literal(TT.FALSE), i
+
+
+def primary_2(tokens, i):
+    # TRUE
+    i += 1
+    return Literal(TT.TRUE), i
+
+
+def primary_3(tokens, i):
+    # NULL
+    i += 1
+    return Literal(TT.NULL), i
+
+
+def primary_4(tokens, i):
+    # NUMBER
+    _1 = tokens[i]
+    i += 1
+    return Literal(float(_1.lexeme)), i
+
+
+def primary_5(tokens, i):
+    # STRING
+    _1 = tokens[i]
+    i += 1
+    return Literal(_1.lexeme), i
+
+
+def primary_6(tokens, i):
+    # OPEN_PAREN expression CLOSE_PAREN
+    i += 1
+    _2, i = expression(tokens, i)
+    if not tokens.has(i) or tokens[i].token_type is not CLOSE_PAREN:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    return Grouping(_2), i
+
+
+def expression_in_buffer(tokens, i):
+    kinds = tokens.kinds
+    # precedence climbing with explicit stacks: operands wait on `operands`
+    # until an operator that binds no tighter than the one before them
+    # shows up, then the pending operators are folded in, left associative
+    binary = _binary_operators
+    unary = _unary_operators
+    operands = []
+    pending = []
+
+    while True:
+        if i >= len(kinds):
+            unexpected(tokens, i, 'Expect expression')
+        kind = kinds[i]
+        if kind == NUMBER.code:
+            token = tokens[i]
+            i += 1
+            expr = Literal(float(token.lexeme))
+        elif unary[kind] is None:
+            expr, i = primary_in_buffer(tokens, i)
+        else:
+            prefix = []
+            while i < len(kinds) and unary[kinds[i]] is not None:
+                prefix.append(unary[kinds[i]])
+                i += 1
+            expr, i = primary_in_buffer(tokens, i)
+            for operator in reversed(prefix):
+                expr = Unary(operator, expr)
+
+        entry = binary[kinds[i]] if i < len(kinds) else None
+        while pending and (entry is None or pending[-1][0] >= entry[0]):
+            expr = Binary(operands.pop(), pending.pop()[1], expr)
+
+        if entry is None:
+            return expr, i
+        operands.append(expr)
+        pending.append(entry)
+        i += 1
+
+
+def primary_in_buffer(tokens, i):
+    kinds = tokens.kinds
+    if i >= len(kinds):
+        primary_error(tokens, i)
+    return primary_alternatives_in_buffer[kinds[i]](tokens, i)
+
+
+def primary_1_in_buffer(tokens, i):
+    # FALSE
+    kinds = tokens.kinds
+    i += 1
+    return Literal(TT.FALSE), i
+
+
+def primary_2_in_buffer(tokens, i):
+    # TRUE
+    kinds = tokens.kinds
+    i += 1
+    return Literal(TT.TRUE), i
+
+
+def primary_3_in_buffer(tokens, i):
+    # NULL
+    kinds = tokens.kinds
+    i += 1
+    return Literal(TT.NULL), i
+
+
+def primary_4_in_buffer(tokens, i):
+    # NUMBER
+    kinds = tokens.kinds
+    _1 = tokens[i]
+    i += 1
+    return Literal(float(_1.lexeme)), i
+
+
+def primary_5_in_buffer(tokens, i):
+    # STRING
+    kinds = tokens.kinds
+    _1 = tokens[i]
+    i += 1
+    return Literal(_1.lexeme), i
+
+
+def primary_6_in_buffer(tokens, i):
+    # OPEN_PAREN expression CLOSE_PAREN
+    kinds = tokens.kinds
+    i += 1
+    _2, i = expression_in_buffer(tokens, i)
+    if i >= len(kinds) or kinds[i] != CLOSE_PAREN.code:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    return Grouping(_2), i
+
+
+primary_alternatives = [primary_error] * len(TOKEN_TYPES)
+primary_alternatives[FALSE.code] = primary_1
+primary_alternatives[TRUE.code] = primary_2
+primary_alternatives[NULL.code] = primary_3
+primary_alternatives[NUMBER.code] = primary_4
+primary_alternatives[STRING.code] = primary_5
+primary_alternatives[OPEN_PAREN.code] = primary_6
+primary_alternatives_in_buffer = [primary_error] * len(TOKEN_TYPES)
+primary_alternatives_in_buffer[FALSE.code] = primary_1_in_buffer
+primary_alternatives_in_buffer[TRUE.code] = primary_2_in_buffer
+primary_alternatives_in_buffer[NULL.code] = primary_3_in_buffer
+primary_alternatives_in_buffer[NUMBER.code] = primary_4_in_buffer
+primary_alternatives_in_buffer[STRING.code] = primary_5_in_buffer
+primary_alternatives_in_buffer[OPEN_PAREN.code] = primary_6_in_buffer
@@ -0,0 +1,433 @@
+# generated by pox.grammar, don't edit. change the grammar there and run
+# `python -m pox.grammar` to regenerate this file.
+from pox.token_types import TOKEN_TYPES, BANG, CLOSE_BRACE, CLOSE_PAREN, COMMA, FUN, IDENTIFIER, MINUS, NUMBER, OPEN_BRACE, OPEN_PAREN, PRINT, RETURN, SEMICOLON
+# imported from the bottom of pox.func_parse, which defines all of this
+from pox.func_parse import Binary, Block, Function, Grouping, Identifier, Literal, Print, Return, Unary
+from pox.func_parse import _binary_operators, _unary_operators, calls, expected, parsed_statement, panic as unexpected
+
+
+def _stmt(tokens, i):
+    if not tokens.has(i):
+        _stmt_error(tokens, i)
+    node, j = _stmt_alternatives[tokens[i].token_type.code](tokens, i)
+    parsed_statement(tokens, i, node)
+    return node, j
+
+
+def _stmt_error(tokens, i):
+    unexpected(tokens, i, 'Expected a statement')
+
+
+def _stmt_1(tokens, i):
+    # PRINT OPEN_PAREN _expression CLOSE_PAREN SEMICOLON
+    i += 1
+    if not tokens.has(i) or tokens[i].token_type is not OPEN_PAREN:
+        expected(tokens, i, OPEN_PAREN)
+    i += 1
+    _3, i = _expression(tokens, i)
+    if not tokens.has(i) or tokens[i].token_type is not CLOSE_PAREN:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    if not tokens.has(i) or tokens[i].token_type is not SEMICOLON:
+        expected(tokens, i, SEMICOLON)
+    i += 1
+    return Print(_3), i
+
+
+def _stmt_2(tokens, i):
+    # FUN IDENTIFIER OPEN_PAREN {IDENTIFIER / COMMA} CLOSE_PAREN _block [SEMICOLON]
+    i += 1
+    if not tokens.has(i) or tokens[i].token_type is not IDENTIFIER:
+        expected(tokens, i, IDENTIFIER)
+    _2 = tokens[i]
+    i += 1
+    if not tokens.has(i) or tokens[i].token_type is not OPEN_PAREN:
+        expected(tokens, i, OPEN_PAREN)
+    i += 1
+    _4 = []
+    if tokens.has(i) and tokens[i].token_type is IDENTIFIER:
+        _4_1 = tokens[i]
+        i += 1
+        _4.append(_4_1)
+        while tokens.has(i) and tokens[i].token_type is COMMA:
+            i += 1
+            if not tokens.has(i) or tokens[i].token_type is not IDENTIFIER:
+                expected(tokens, i, IDENTIFIER)
+            _4_1 = tokens[i]
+            i += 1
+            _4.append(_4_1)
+    if not tokens.has(i) or tokens[i].token_type is not CLOSE_PAREN:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    _6, i = _block(tokens, i)
+    if tokens.has(i) and tokens[i].token_type is SEMICOLON:
+        i += 1
+    return Function(_2.lexeme, [p.lexeme for p in _4], _6, _2.symbol, tuple(p.symbol for p in _4)), i
+
+
+def _stmt_3(tokens, i):
+    # RETURN _expression SEMICOLON
+    i += 1
+    _2, i = _expression(tokens, i)
+    if not tokens.has(i) or tokens[i].token_type is not SEMICOLON:
+        expected(tokens, i, SEMICOLON)
+    i += 1
+    return Return(_2), i
+
+
+def _stmt_4(tokens, i):
+    # _expression SEMICOLON
+    _1, i = _expression(tokens, i)
+    if not tokens.has(i) or tokens[i].token_type is not SEMICOLON:
+        expected(tokens, i, SEMICOLON)
+    i += 1
+    return _1, i
+
+
+def _block(tokens, i):
+    # OPEN_BRACE {_stmt} CLOSE_BRACE
+    if not tokens.has(i) or tokens[i].token_type is not OPEN_BRACE:
+        expected(tokens, i, OPEN_BRACE)
+    i += 1
+    _2 = []
+    while tokens.has(i) and tokens[i].token_type.code in _first_0:
+        _2_1, i = _stmt(tokens, i)
+        _2.append(_2_1)
+    if not tokens.has(i) or tokens[i].token_type is not CLOSE_BRACE:
+        expected(tokens, i, CLOSE_BRACE)
+    i += 1
+    return Block(tuple(_2)), i
+
+
+def _expression(tokens, i):
+    # precedence climbing with explicit stacks: operands wait on `operands`
+    # until an operator that binds no tighter than the one before them
+    # shows up, then the pending operators are folded in, left associative
+    binary = _binary_operators
+    unary = _unary_operators
+    operands = []
+    pending = []
+
+    while True:
+        if not tokens.has(i):
+            unexpected(tokens, i, 'Expected an expression')
+        token = tokens[i]
+        token_type = token.token_type
+        if token_type is NUMBER:
+            i += 1
+            expr = Literal(float(token.lexeme))
+        elif token_type is IDENTIFIER:
+            i += 1
+            _2 = []
+            while tokens.has(i) and tokens[i].token_type is OPEN_PAREN:
+                _2_1, i = _arguments(tokens, i)
+                _2.append(_2_1)
+            expr = calls(Identifier(token.lexeme, token.symbol), _2) if _2 else Identifier(token.lexeme, token.symbol)
+        elif unary[token_type.code] is None:
+            expr, i = _primary(tokens, i)
+        else:
+            prefix = []
+            while tokens.has(i) and unary[tokens[i].token_type.code] is not None:
+                prefix.append(unary[tokens[i].token_type.code])
+                i += 1
+            expr, i = _primary(tokens, i)
+            for operator in reversed(prefix):
+                expr = Unary(operator, expr)
+
+        entry = binary[tokens[i].token_type.code] if tokens.has(i) else None
+        while pending and (entry is None or pending[-1][0] >= entry[0]):
+            expr = Binary(pending.pop()[1], operands.pop(), expr)
+
+        if entry is None:
+            return expr, i
+        operands.append(expr)
+        pending.append(entry)
+        i += 1
+
+
+def _primary(tokens, i):
+    if not tokens.has(i):
+        _primary_error(tokens, i)
+    return _primary_alternatives[tokens[i].token_type.code](tokens, i)
+
+
+def _primary_error(tokens, i):
+    unexpected(tokens, i, 'Expected an expression')
+
+
+def _primary_1(tokens, i):
+    # NUMBER
+    _1 = tokens[i]
+    i += 1
+    return Literal(float(_1.lexeme)), i
+
+
+def _primary_2(tokens, i):
+    # IDENTIFIER {_arguments}
+    _1 = tokens[i]
+    i += 1
+    _2 = []
+    while tokens.has(i) and tokens[i].token_type is OPEN_PAREN:
+        _2_1, i = _arguments(tokens, i)
+        _2.append(_2_1)
+    return calls(Identifier(_1.lexeme, _1.symbol), _2) if _2 else Identifier(_1.lexeme, _1.symbol), i
+
+
+def _primary_3(tokens, i):
+    # OPEN_PAREN _expression CLOSE_PAREN
+    i += 1
+    _2, i = _expression(tokens, i)
+    if not tokens.has(i) or tokens[i].token_type is not CLOSE_PAREN:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    return Grouping(_2), i
+
+
+def _arguments(tokens, i):
+    # OPEN_PAREN {_expression / COMMA} CLOSE_PAREN
+    if not tokens.has(i) or tokens[i].token_type is not OPEN_PAREN:
+        expected(tokens, i, OPEN_PAREN)
+    i += 1
+    _2 = []
+    if tokens.has(i) and tokens[i].token_type.code in _first_1:
+        _2_1, i = _expression(tokens, i)
+        _2.append(_2_1)
+        while tokens.has(i) and tokens[i].token_type is COMMA:
+            i += 1
+            _2_1, i = _expression(tokens, i)
+            _2.append(_2_1)
+    if not tokens.has(i) or tokens[i].token_type is not CLOSE_PAREN:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    return tuple(_2), i
+
+
+def _stmt_in_buffer(tokens, i):
+    kinds = tokens.kinds
+    if i >= len(kinds):
+        _stmt_error(tokens, i)
+    node, j = _stmt_alternatives_in_buffer[kinds[i]](tokens, i)
+    parsed_statement(tokens, i, node)
+    return node, j
+
+
+def _stmt_1_in_buffer(tokens, i):
+    # PRINT OPEN_PAREN _expression CLOSE_PAREN SEMICOLON
+    kinds = tokens.kinds
+    i += 1
+    if i >= len(kinds) or kinds[i] != OPEN_PAREN.code:
+        expected(tokens, i, OPEN_PAREN)
+    i += 1
+    _3, i = _expression_in_buffer(tokens, i)
+    if i >= len(kinds) or kinds[i] != CLOSE_PAREN.code:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    if i >= len(kinds) or kinds[i] != SEMICOLON.code:
+        expected(tokens, i, SEMICOLON)
+    i += 1
+    return Print(_3), i
+
+
+def _stmt_2_in_buffer(tokens, i):
+    # FUN IDENTIFIER OPEN_PAREN {IDENTIFIER / COMMA} CLOSE_PAREN _block [SEMICOLON]
+    kinds = tokens.kinds
+    i += 1
+    if i >= len(kinds) or kinds[i] != IDENTIFIER.code:
+        expected(tokens, i, IDENTIFIER)
+    _2 = tokens[i]
+    i += 1
+    if i >= len(kinds) or kinds[i] != OPEN_PAREN.code:
+        expected(tokens, i, OPEN_PAREN)
+    i += 1
+    _4 = []
+    if i < len(kinds) and kinds[i] == IDENTIFIER.code:
+        _4_1 = tokens[i]
+        i += 1
+        _4.append(_4_1)
+        while i < len(kinds) and kinds[i] == COMMA.code:
+            i += 1
+            if i >= len(kinds) or kinds[i] != IDENTIFIER.code:
+                expected(tokens, i, IDENTIFIER)
+            _4_1 = tokens[i]
+            i += 1
+            _4.append(_4_1)
+    if i >= len(kinds) or kinds[i] != CLOSE_PAREN.code:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    _6, i = _block_in_buffer(tokens, i)
+    if i < len(kinds) and kinds[i] == SEMICOLON.code:
+        i += 1
+    return Function(_2.lexeme, [p.lexeme for p in _4], _6, _2.symbol, tuple(p.symbol for p in _4)), i
+
+
+def _stmt_3_in_buffer(tokens, i):
+    # RETURN _expression SEMICOLON
+    kinds = tokens.kinds
+    i += 1
+    _2, i = _expression_in_buffer(tokens, i)
+    if i >= len(kinds) or kinds[i] != SEMICOLON.code:
+        expected(tokens, i, SEMICOLON)
+    i += 1
+    return Return(_2), i
+
+
+def _stmt_4_in_buffer(tokens, i):
+    # _expression SEMICOLON
+    kinds = tokens.kinds
+    _1, i = _expression_in_buffer(tokens, i)
+    if i >= len(kinds) or kinds[i] != SEMICOLON.code:
+        expected(tokens, i, SEMICOLON)
+    i += 1
+    return _1, i
+
+
+def _block_in_buffer(tokens, i):
+    # OPEN_BRACE {_stmt} CLOSE_BRACE
+    kinds = tokens.kinds
+    if i >= len(kinds) or kinds[i] != OPEN_BRACE.code:
+        expected(tokens, i, OPEN_BRACE)
+    i += 1
+    _2 = []
+    while i < len(kinds) and kinds[i] in _first_0:
+        _2_1, i = _stmt_in_buffer(tokens, i)
+        _2.append(_2_1)
+    if i >= len(kinds) or kinds[i] != CLOSE_BRACE.code:
+        expected(tokens, i, CLOSE_BRACE)
+    i += 1
+    return Block(tuple(_2)), i
+
+
+def _expression_in_buffer(tokens, i):
+    kinds = tokens.kinds
+    # precedence climbing with explicit stacks: operands wait on `operands`
+    # until an operator that binds no tighter than the one before them
+    # shows up, then the pending operators are folded in, left associative
+    binary = _binary_operators
+    unary = _unary_operators
+    operands = []
+    pending = []
+
+    while True:
+        if i >= len(kinds):
+            unexpected(tokens, i, 'Expected an expression')
+        kind = kinds[i]
+        if kind == NUMBER.code:
+            token = tokens[i]
+            i += 1
+            expr = Literal(float(token.lexeme))
+        elif kind == IDENTIFIER.code:
+            token = tokens[i]
+            i += 1
+            _2 = []
+            while i < len(kinds) and kinds[i] == OPEN_PAREN.code:
+                _2_1, i = _arguments_in_buffer(tokens, i)
+                _2.append(_2_1)
+            expr = calls(Identifier(token.lexeme, token.symbol), _2) if _2 else Identifier(token.lexeme, token.symbol)
+        elif unary[kind] is None:
+            expr, i = _primary_in_buffer(tokens, i)
+        else:
+            prefix = []
+            while i < len(kinds) and unary[kinds[i]] is not None:
+                prefix.append(unary[kinds[i]])
+                i += 1
+            expr, i = _primary_in_buffer(tokens, i)
+            for operator in reversed(prefix):
+                expr = Unary(operator, expr)
+
+        entry = binary[kinds[i]] if i < len(kinds) else None
+        while pending and (entry is None or pending[-1][0] >= entry[0]):
+            expr = Binary(pending.pop()[1], operands.pop(), expr)
+
+        if entry is None:
+            return expr, i
+        operands.append(expr)
+        pending.append(entry)
+        i += 1
+
+
+def _primary_in_buffer(tokens, i):
+    kinds = tokens.kinds
+    if i >= len(kinds):
+        _primary_error(tokens, i)
+    return _primary_alternatives_in_buffer[kinds[i]](tokens, i)
+
+
+def _primary_1_in_buffer(tokens, i):
+    # NUMBER
+    kinds = tokens.kinds
+    _1 = tokens[i]
+    i += 1
+    return Literal(float(_1.lexeme)), i
+
+
+def _primary_2_in_buffer(tokens, i):
+    # IDENTIFIER {_arguments}
+    kinds = tokens.kinds
+    _1 = tokens[i]
+    i += 1
+    _2 = []
+    while i < len(kinds) and kinds[i] == OPEN_PAREN.code:
+        _2_1, i = _arguments_in_buffer(tokens, i)
+        _2.append(_2_1)
+    return calls(Identifier(_1.lexeme, _1.symbol), _2) if _2 else Identifier(_1.lexeme, _1.symbol), i
+
+
+def _primary_3_in_buffer(tokens, i):
+    # OPEN_PAREN _expression CLOSE_PAREN
+    kinds = tokens.kinds
+    i += 1
+    _2, i = _expression_in_buffer(tokens, i)
+    if i >= len(kinds) or kinds[i] != CLOSE_PAREN.code:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    return Grouping(_2), i
+
+
+def _arguments_in_buffer(tokens, i):
+    # OPEN_PAREN {_expression / COMMA} CLOSE_PAREN
+    kinds = tokens.kinds
+    if i >= len(kinds) or kinds[i] != OPEN_PAREN.code:
+        expected(tokens, i, OPEN_PAREN)
+    i += 1
+    _2 = []
+    if i < len(kinds) and kinds[i] in _first_1:
+        _2_1, i = _expression_in_buffer(tokens, i)
+        _2.append(_2_1)
+        while i < len(kinds) and kinds[i] == COMMA.code:
+            i += 1
+            _2_1, i = _expression_in_buffer(tokens, i)
+            _2.append(_2_1)
+    if i >= len(kinds) or kinds[i] != CLOSE_PAREN.code:
+        expected(tokens, i, CLOSE_PAREN)
+    i += 1
+    return tuple(_2), i
+
+
+_stmt_alternatives = [_stmt_error] * len(TOKEN_TYPES)
+_stmt_alternatives[PRINT.code] = _stmt_1
+_stmt_alternatives[FUN.code] = _stmt_2
+_stmt_alternatives[RETURN.code] = _stmt_3
+_stmt_alternatives[BANG.code] = _stmt_4
+_stmt_alternatives[IDENTIFIER.code] = _stmt_4
+_stmt_alternatives[MINUS.code] = _stmt_4
+_stmt_alternatives[NUMBER.code] = _stmt_4
+_stmt_alternatives[OPEN_PAREN.code] = _stmt_4
+_first_0 = frozenset((BANG.code, FUN.code, IDENTIFIER.code, MINUS.code, NUMBER.code, OPEN_PAREN.code, PRINT.code, RETURN.code))
+_primary_alternatives = [_primary_error] * len(TOKEN_TYPES)
+_primary_alternatives[NUMBER.code] = _primary_1
+_primary_alternatives[IDENTIFIER.code] = _primary_2
+_primary_alternatives[OPEN_PAREN.code] = _primary_3
+_first_1 = frozenset((BANG.code, IDENTIFIER.code, MINUS.code, NUMBER.code, OPEN_PAREN.code))
+_stmt_alternatives_in_buffer = [_stmt_error] * len(TOKEN_TYPES)
+_stmt_alternatives_in_buffer[PRINT.code] = _stmt_1_in_buffer
+_stmt_alternatives_in_buffer[FUN.code] = _stmt_2_in_buffer
+_stmt_alternatives_in_buffer[RETURN.code] = _stmt_3_in_buffer
+_stmt_alternatives_in_buffer[BANG.code] = _stmt_4_in_buffer
+_stmt_alternatives_in_buffer[IDENTIFIER.code] = _stmt_4_in_buffer
+_stmt_alternatives_in_buffer[MINUS.code] = _stmt_4_in_buffer
+_stmt_alternatives_in_buffer[NUMBER.code] = _stmt_4_in_buffer
+_stmt_alternatives_in_buffer[OPEN_PAREN.code] = _stmt_4_in_buffer
+_primary_alternatives_in_buffer = [_primary_error] * len(TOKEN_TYPES)
+_primary_alternatives_in_buffer[NUMBER.code] = _primary_1_in_buffer
+_primary_alternatives_in_buffer[IDENTIFIER.code] = _primary_2_in_buffer
+_primary_alternatives_in_buffer[OPEN_PAREN.code] = _primary_3_in_buffer
@@ -0,0 +1,391 @@
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+from pox.func_parse import (
+    AST,
+    BINARY_OPERATORS,
+    UNARY_OPERATORS,
+    Binary,
+    Block,
+    Call,
+    Function,
+    FunctionApply,
+    Grouping,
+    Identifier,
+    Literal,
+    Print,
+    Program,
+    Return,
+    Session,
+    Unary,
+    Value,
+    Var,
+    _run,
+    _stmt,
+)
+from pox.lines import LineIndex
+from pox.symbols import SymbolTable
+from pox.tokenizer import TokenStream
+
+R = TypeVar('R')
+
+# a node's kind is the position of its type in KINDS
+KINDS = (
+    Program, Block, Function, FunctionApply, Print, Return, Binary, Unary, Grouping, Identifier, Literal, Var, Value, Call,
+)
+(
+    PROGRAM, BLOCK, FUNCTION, FUNCTION_APPLY, PRINT, RETURN, BINARY, UNARY, GROUPING, IDENTIFIER, LITERAL, VAR, VALUE, CALL,
+) = range(len(KINDS))
+_KINDS = {t: k for k, t in enumerate(KINDS)}
+
+OPERATORS = tuple(dict.fromkeys([op for _, op in BINARY_OPERATORS.values()] + list(UNARY_OPERATORS.values())))
+_OPERATORS = {op: n for n, op in enumerate(OPERATORS)}
+
+# what the three slots a, b and c hold for each kind. lists are stored in
+# `links` as a count followed by the items, and a slot holds their offset.
+#
+#   PROGRAM, BLOCK          a: statements
+#   FUNCTION                a: name symbol, b: body block, c: parameter symbols
+#   FUNCTION_APPLY          a: function symbol, c: argument symbols
+#   PRINT, RETURN, GROUPING a: expression
+#   BINARY                  a: left, b: right, c: operator
+#   UNARY                   a: operand, c: operator
+#   IDENTIFIER              a: symbol
+#   LITERAL, VALUE          a: offset in values
+#   VAR                     a: symbol, b: referent
+#   CALL                    a: callee, b: arguments
+
+
+def _kind(node: AST) -> int:
+    kind = _KINDS.get(type(node))
+    if kind is None:
+        # subclasses, e.g. hash-consed nodes, are stored as the type they extend
+        kind = next(_KINDS[t] for t in type(node).__mro__ if t in _KINDS)
+    return kind
+
+
+def _children(node: AST, kind: int) -> Sequence[AST]:
+    if kind <= BLOCK:
+        return node.statements
+    if kind == FUNCTION:
+        return (node.body,)
+    if kind == BINARY:
+        return (node.left, node.right)
+    if kind == UNARY:
+        return (node.right,)
+    if kind in (PRINT, RETURN, GROUPING):
+        return (node.expr,)
+    if kind == VAR:
+        return (node.referent,)
+    if kind == CALL:
+        return (node.callee, *node.arguments)
+    return ()
+
+
+class AstArena:
+    # a whole tree in parallel arrays: a kind byte and three int slots per
+    # node, instead of one object each. children are always stored before
+    # their parents, so a pass over the whole program is a single loop
+    # over the arrays. literal values are kept in a list, as they are: a
+    # parsed literal is always a float, but a Value can hold anything.
+    def __init__(self, symbols: Optional[SymbolTable] = None) -> None:
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.kinds = array('B')
+        self.a = array('i')
+        self.b = array('i')
+        self.c = array('i')
+        self.links = array('i')
+        self.values: List[Any] = []
+        self.root = -1
+        # whether every node is under root, as after a parse
+        self._only_root = False
+
+    @classmethod
+    def from_source(cls, src: str, symbols: Optional[SymbolTable] = None) -> 'AstArena':
+        from pox.tokenizer import iter_tokens
+        arena = cls(symbols)
+        session = Session(src=src, lines=LineIndex.from_source(src))
+        session.tokens = TokenStream(iter_tokens(src, arena.symbols))
+        return _run(session, arena._parse)
+
+    @classmethod
+    def from_file(cls, path: str, symbols: Optional[SymbolTable] = None) -> 'AstArena':
+        from pox.tokenizer import iter_file_tokens
+        arena = cls(symbols)
+        session = Session(path=path, lines=LineIndex())
+        session.tokens = TokenStream(iter_file_tokens(path, symbols=arena.symbols, lines=session.lines))
+        return _run(session, arena._parse)
+
+    @classmethod
+    def from_program(cls, program: AST, symbols: Optional[SymbolTable] = None) -> 'AstArena':
+        arena = cls(symbols)
+        arena.root = arena.add(program)
+        arena._only_root = True
+        return arena
+
+    def _parse(self, tokens: TokenStream) -> 'AstArena':
+        # top-level statements go into the arrays as they are parsed, so
+        # only one statement's objects exist at a time
+        statements = []
+        j = 0
+        while tokens.has(j):
+            stmt, j = _stmt(tokens, j)
+            statements.append(self.add(stmt))
+            tokens.release(j)
+        self.root = self._append(PROGRAM, self._link(statements))
+        self._only_root = True
+        return self
+
+    def _append(self, kind: int, a: int = 0, b: int = 0, c: int = 0) -> int:
+        self.kinds.append(kind)
+        self.a.append(a)
+        self.b.append(b)
+        self.c.append(c)
+        return len(self.kinds) - 1
+
+    def _link(self, items: Sequence[int]) -> int:
+        offset = len(self.links)
+        self.links.append(len(items))
+        self.links.extend(items)
+        return offset
+
+    def _value(self, value: Any) -> int:
+        self.values.append(value)
+        return len(self.values) - 1
+
+    def add(self, tree: AST) -> int:
+        # appends tree, children first, and returns the id of its root.
+        # subtrees shared between parents are stored once.
+        self._only_root = False
+        intern = self.symbols.intern
+        done: Dict[int, int] = {}
+        # (node, -1, ()) on the way down, (node, kind, children) on the way up
+        stack: List[Tuple[AST, int, Sequence[AST]]] = [(tree, -1, ())]
+        while stack:
+            node, kind, children = stack.pop()
+            if kind < 0:
+                if id(node) in done:
+                    continue
+                kind = _kind(node)
+                children = _children(node, kind)
+                stack.append((node, kind, children))
+                stack.extend((child, -1, ()) for child in reversed(children))
+                continue
+
+            ids = [done[id(child)] for child in children]
+            if kind <= BLOCK:
+                n = self._append(kind, self._link(ids))
+            elif kind == FUNCTION:
+                parameters = self._link([intern(p) for p in node.parameters])
+                n = self._append(kind, intern(node.name), ids[0], parameters)
+            elif kind == FUNCTION_APPLY:
+                n = self._append(kind, intern(node.f_name), 0, self._link([intern(a) for a in node.arg_names]))
+            elif kind == BINARY:
+                n = self._append(kind, ids[0], ids[1], _OPERATORS[node.operator])
+            elif kind == UNARY:
+                n = self._append(kind, ids[0], 0, _OPERATORS[node.operator])
+            elif kind in (PRINT, RETURN, GROUPING):
+                n = self._append(kind, ids[0])
+            elif kind == IDENTIFIER:
+                n = self._append(kind, intern(node.symbol))
+            elif kind in (LITERAL, VALUE):
+                n = self._append(kind, self._value(node.val))
+            elif kind == CALL:
+                n = self._append(kind, ids[0], self._link(ids[1:]))
+            else:
+                n = self._append(kind, intern(node.symbol), ids[0])
+            done[id(node)] = n
+        return done[id(tree)]
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, n: int) -> 'NodeView':
+        if not 0 <= n < len(self.kinds):
+            raise IndexError(f"node {n} is not in the arena")
+        return NodeView(self, n)
+
+    def kind(self, n: int) -> int:
+        return self.kinds[n]
+
+    def node_type(self, n: int) -> type:
+        return KINDS[self.kinds[n]]
+
+    def _list(self, offset: int) -> List[int]:
+        links = self.links
+        return links[offset + 1:offset + 1 + links[offset]].tolist()
+
+    def children(self, n: int) -> List[int]:
+        kind = self.kinds[n]
+        if kind <= BLOCK:
+            return self._list(self.a[n])
+        if kind in (PRINT, RETURN, GROUPING, UNARY):
+            return [self.a[n]]
+        if kind == BINARY:
+            return [self.a[n], self.b[n]]
+        if kind in (FUNCTION, VAR):
+            return [self.b[n]]
+        if kind == CALL:
+            return [self.a[n], *self._list(self.b[n])]
+        return []
+
+    def symbol(self, n: int) -> int:
+        # for functions, calls, identifiers and vars
+        return self.a[n]
+
+    def name(self, n: int) -> str:
+        return self.symbols.names[self.a[n]]
+
+    def symbols_of(self, n: int) -> List[int]:
+        # parameters of a function or arguments of a call
+        return self._list(self.c[n])
+
+    def operator(self, n: int) -> Callable[..., Any]:
+        return OPERATORS[self.c[n]]
+
+    def value(self, n: int) -> Any:
+        return self.values[self.a[n]]
+
+    def walk(self, root: Optional[int] = None) -> Iterator[int]:
+        # node ids in source order, parents before children
+        stack = [self.root if root is None else root]
+        while stack:
+            n = stack.pop()
+            yield n
+            stack.extend(reversed(self.children(n)))
+
+    def fold(self, handlers: Mapping[type, Callable[['AstArena', int, List[R]], R]], root: Optional[int] = None) -> R:
+        # the visitor: handlers[node type](arena, n, results of n's
+        # children) for every node under root, once each, in storage order
+        # so each node's children are done before it. raises TypeError for
+        # a node with no handler.
+        root = self.root if root is None else root
+        table = [handlers.get(t) for t in KINDS]
+        kinds = self.kinds
+        children = self.children
+        results: Any
+        if root == self.root and self._only_root:
+            # every node is under root, no need to look for them
+            nodes: Iterable[int] = range(root + 1)
+            results = [None] * (root + 1)
+        else:
+            under = {root}
+            stack = [root]
+            while stack:
+                for c in children(stack.pop()):
+                    if c not in under:
+                        under.add(c)
+                        stack.append(c)
+            nodes = sorted(under)
+            results = {}
+        for n in nodes:
+            handler = table[kinds[n]]
+            if handler is None:
+                raise TypeError(f"no handler for {KINDS[kinds[n]].__name__} node {n}")
+            results[n] = handler(self, n, [results[c] for c in children(n)])
+        return results[root]
+
+    def to_program(self, root: Optional[int] = None) -> AST:
+        return self.fold(_TO_NODE, root)
+
+    def to_json(self, root: Optional[int] = None) -> Dict[str, Any]:
+        # the same documents as pox.func_parse.to_json
+        return self.fold(_TO_JSON, root)
+
+    def __repr__(self):
+        return f"AstArena({len(self.kinds)} nodes)"
+
+
+class NodeView:
+    # a cursor on one node of an AstArena
+    __slots__ = ("arena", "index")
+
+    def __init__(self, arena: AstArena, index: int) -> None:
+        self.arena = arena
+        self.index = index
+
+    @property
+    def kind(self) -> int:
+        return self.arena.kinds[self.index]
+
+    @property
+    def node_type(self) -> type:
+        return KINDS[self.arena.kinds[self.index]]
+
+    @property
+    def children(self) -> List['NodeView']:
+        return [NodeView(self.arena, c) for c in self.arena.children(self.index)]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, NodeView):
+            return self.arena is other.arena and self.index == other.index
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self.arena), self.index))
+
+    def __repr__(self):
+        return f"{self.node_type.__name__}(node={self.index})"
+
+
+def _function(arena: AstArena, n: int, children: List[Any]) -> Function:
+    parameters = arena.symbols_of(n)
+    names = arena.symbols.names
+    return Function(
+        name=arena.name(n),
+        parameters=[names[p] for p in parameters],
+        body=children[0],
+        name_id=arena.symbol(n),
+        parameter_ids=tuple(parameters),
+    )
+
+
+def _function_apply(arena: AstArena, n: int, children: List[Any]) -> FunctionApply:
+    arguments = arena.symbols_of(n)
+    names = arena.symbols.names
+    return FunctionApply(arena.name(n), tuple(names[a] for a in arguments), arena.symbol(n), tuple(arguments))
+
+
+_TO_NODE: Dict[type, Callable[[AstArena, int, List[Any]], Any]] = {
+    Program: lambda arena, n, children: Program(tuple(children)),
+    Block: lambda arena, n, children: Block(tuple(children)),
+    Function: _function,
+    FunctionApply: _function_apply,
+    Print: lambda arena, n, children: Print(children[0]),
+    Return: lambda arena, n, children: Return(children[0]),
+    Binary: lambda arena, n, children: Binary(arena.operator(n), children[0], children[1]),
+    Unary: lambda arena, n, children: Unary(arena.operator(n), children[0]),
+    Grouping: lambda arena, n, children: Grouping(children[0]),
+    Identifier: lambda arena, n, children: Identifier(arena.name(n), arena.symbol(n)),
+    Literal: lambda arena, n, children: Literal(arena.value(n)),
+    Var: lambda arena, n, children: Var(arena.name(n), children[0]),
+    Value: lambda arena, n, children: Value(arena.value(n)),
+    Call: lambda arena, n, children: Call(children[0], tuple(children[1:])),
+}
+
+_TO_JSON: Dict[type, Callable[[AstArena, int, List[Any]], Any]] = {
+    Program: lambda arena, n, children: {"type": "program", "statement": children},
+    Block: lambda arena, n, children: {"type": "block", "statement": children},
+    Function: lambda arena, n, children: {
+        "type": "function",
+        "name": arena.name(n),
+        "parameters": [arena.symbols.names[p] for p in arena.symbols_of(n)],
+        "body": children[0]["statement"],
+    },
+    Print: lambda arena, n, children: {"type": "print", "expr": children[0]},
+    Return: lambda arena, n, children: {"type": "return", "expr": children[0]},
+    Binary: lambda arena, n, children: {
+        "type": "binary",
+        "op": str(arena.operator(n)),
+        "left": children[0],
+        "right": children[1],
+    },
+    Unary: lambda arena, n, children: {"type": "unary", "op": str(arena.operator(n)), "right": children[0]},
+    Grouping: lambda arena, n, children: {"type": "grouping", "expr": children[0]},
+    Identifier: lambda arena, n, children: {"type": "identifier", "symbol": arena.name(n)},
+    Literal: lambda arena, n, children: {"type": "literal", "val": arena.value(n)},
+    Call: lambda arena, n, children: {"type": "call", "callee": children[0], "arguments": children[1:]},
+}
+
+
+__all__ = ["AstArena", "NodeView", "KINDS", "OPERATORS"]
@@ -0,0 +1,398 @@
+import gc
+import struct
+import threading
+from contextlib import contextmanager
+from typing import IO, Any, Iterator, List, Optional, Sequence, Tuple, Union
+from operator import add, mul, sub, truediv, neg, not_, eq, ne, lt, le, gt, ge, and_, or_, xor
+
+import rho.ast as rho
+from pox.func_parse import (
+    Binary,
+    Block,
+    Call,
+    Function,
+    FunctionApply,
+    Grouping,
+    Identifier,
+    Literal,
+    Print,
+    Program,
+    Return,
+    Unary,
+    Value,
+    Var,
+    _node_type,
+    logical_and,
+    logical_or,
+)
+from pox.symbols import SymbolTable
+
+# A compact binary form for pox.func_parse and rho.ast trees:
+#
+#   magic     b'POXA'
+#   version   varint
+#   strings   varint count, then for each a varint byte length and utf-8
+#   nodes     the tree in preorder
+#
+# every node is its kind byte, then its scalar fields, then its children.
+# nodes with a variable number of children store the count among their
+# scalars. names are indexes into the string table, which lists them in
+# the order they are first met, the order the parser interns them in.
+
+MAGIC = b'POXA'
+VERSION = 2
+
+# the two tables below are part of the format: only ever append to them,
+# and bump VERSION when doing so
+OPERATORS = (add, sub, mul, truediv, neg, not_, eq, ne, lt, le, gt, ge, and_, or_, xor, logical_and, logical_or)
+_OPERATORS = {op: n for n, op in enumerate(OPERATORS)}
+
+KINDS = (
+    Program, Block, Function, FunctionApply, Print, Return, Binary, Unary, Grouping, Identifier, Literal, Var, Value,
+    rho.Print, rho.Plus, rho.Times, rho.Literal, rho.GetNumber, Call,
+)
+(
+    PROGRAM, BLOCK, FUNCTION, FUNCTION_APPLY, PRINT, RETURN, BINARY, UNARY, GROUPING, IDENTIFIER, LITERAL, VAR, VALUE,
+    RHO_PRINT, RHO_PLUS, RHO_TIMES, RHO_LITERAL, RHO_GET_NUMBER, CALL,
+) = range(len(KINDS))
+_KINDS = {t: k for k, t in enumerate(KINDS)}
+
+# children of the kinds with a fixed number of them
+_ARITY = {
+    FUNCTION: 1, FUNCTION_APPLY: 0, PRINT: 1, RETURN: 1, BINARY: 2, UNARY: 1, GROUPING: 1, IDENTIFIER: 0,
+    LITERAL: 0, VAR: 1, VALUE: 0, RHO_PRINT: 1, RHO_PLUS: 2, RHO_TIMES: 2, RHO_LITERAL: 0, RHO_GET_NUMBER: 0,
+}
+
+# tags in front of literal values
+_FLOAT, _INT, _NEG_INT, _STR, _TRUE, _FALSE, _NONE = range(7)
+
+_double = struct.Struct('<d')
+_new = object.__new__
+
+
+class FormatError(ValueError):
+    pass
+
+
+def _varint(out: bytearray, n: int) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.out = bytearray()
+        self.strings: dict = {}
+
+    def string(self, s: str) -> None:
+        n = self.strings.get(s)
+        if n is None:
+            n = self.strings[s] = len(self.strings)
+        _varint(self.out, n)
+
+    def names(self, names: Sequence[str]) -> None:
+        _varint(self.out, len(names))
+        for name in names:
+            self.string(name)
+
+    def value(self, val: Any) -> None:
+        out = self.out
+        if type(val) is float:
+            out.append(_FLOAT)
+            out += _double.pack(val)
+        elif val is True or val is False:
+            out.append(_TRUE if val else _FALSE)
+        elif type(val) is int:
+            out.append(_INT if val >= 0 else _NEG_INT)
+            _varint(out, abs(val))
+        elif type(val) is str:
+            out.append(_STR)
+            self.string(val)
+        elif val is None:
+            out.append(_NONE)
+        else:
+            raise TypeError(f"can't store literal {val!r}")
+
+    def node(self, kind: int, node: Any) -> Sequence[Any]:
+        # writes the scalars of node and returns its children
+        out = self.out
+        out.append(kind)
+        if kind == BINARY:
+            _varint(out, _OPERATORS[node.operator])
+            return node.left, node.right
+        if kind == IDENTIFIER:
+            self.string(node.symbol)
+            return ()
+        if kind == LITERAL or kind == VALUE or kind == RHO_LITERAL:
+            self.value(node.val)
+            return ()
+        if kind == PROGRAM or kind == BLOCK:
+            _varint(out, len(node.statements))
+            return node.statements
+        if kind == FUNCTION:
+            self.string(node.name)
+            self.names(node.parameters)
+            return node.body,
+        if kind == FUNCTION_APPLY:
+            self.string(node.f_name)
+            self.names(node.arg_names)
+            return ()
+        if kind == UNARY:
+            _varint(out, _OPERATORS[node.operator])
+            return node.right,
+        if kind == VAR:
+            self.string(node.symbol)
+            return node.referent,
+        if kind == PRINT or kind == RETURN or kind == GROUPING:
+            return node.expr,
+        if kind == RHO_PRINT:
+            return node.val,
+        if kind == RHO_PLUS or kind == RHO_TIMES:
+            return node.left, node.right
+        if kind == CALL:
+            _varint(out, len(node.arguments))
+            return (node.callee, *node.arguments)
+        return ()
+
+
+def dumps(tree: Any) -> bytes:
+    w = _Writer()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        children = w.node(_KINDS[_node_type(_KINDS, node, "binary form")], node)
+        stack.extend(reversed(children))
+
+    head = bytearray(MAGIC)
+    _varint(head, VERSION)
+    _varint(head, len(w.strings))
+    for s in w.strings:
+        data = s.encode('utf-8', 'surrogatepass')
+        _varint(head, len(data))
+        head += data
+    return bytes(head + w.out)
+
+
+def dump(tree: Any, fp: IO[bytes]) -> None:
+    fp.write(dumps(tree))
+
+
+def _long_varint(view: memoryview, pos: int, n: int) -> Tuple[int, int]:
+    # the rest of a varint whose first byte n had its high bit set
+    n &= 0x7f
+    shift = 7
+    while True:
+        b = view[pos]
+        pos += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+# the collector is one switch for the whole process: the first load to
+# start turns it off, the last one to finish puts back what it found, so
+# loads overlapping in threads can't leave it off for good
+_pause_lock = threading.Lock()
+_pauses = 0
+_was_enabled = False
+
+
+@contextmanager
+def _collector_paused() -> Iterator[None]:
+    global _pauses, _was_enabled
+    with _pause_lock:
+        if _pauses == 0:
+            _was_enabled = gc.isenabled()
+            gc.disable()
+        _pauses += 1
+    try:
+        yield
+    finally:
+        with _pause_lock:
+            _pauses -= 1
+            if _pauses == 0 and _was_enabled:
+                gc.enable()
+
+
+def loads(data: Union[bytes, bytearray, memoryview], symbols: Optional[SymbolTable] = None, pause_gc: bool = False) -> Any:
+    # decodes straight out of any buffer, e.g. a memoryview over an mmap.
+    # names get their ids from symbols, or from a fresh table.
+    #
+    # a tree has no cycles for the collector to find, but building one
+    # sets it off every few hundred nodes, each time walking every node
+    # built so far. pause_gc turns the collector off while the tree is
+    # built, which is several times faster for large trees; the switch is
+    # process-wide, so no thread collects anything until the load is done.
+    view = memoryview(data)
+    if bytes(view[:4]) != MAGIC:
+        raise FormatError("not a pox AST")
+    try:
+        version, pos = _long_varint(view, 5, view[4]) if view[4] >= 0x80 else (view[4], 5)
+        if version != VERSION:
+            raise FormatError(f"can't read version {version}, only {VERSION}")
+        count, pos = _long_varint(view, pos + 1, view[pos]) if view[pos] >= 0x80 else (view[pos], pos + 1)
+        strings = []
+        for _ in range(count):
+            length, pos = _long_varint(view, pos + 1, view[pos]) if view[pos] >= 0x80 else (view[pos], pos + 1)
+            strings.append(str(view[pos:pos + length], 'utf-8', 'surrogatepass'))
+            pos += length
+        reader = _Reader(view, strings, symbols if symbols is not None else SymbolTable())
+        if not pause_gc:
+            return reader.nodes(pos)
+        with _collector_paused():
+            return reader.nodes(pos)
+    except (IndexError, KeyError, struct.error) as e:
+        raise FormatError(f"damaged pox AST: {e!r}") from None
+
+
+def load(fp: IO[bytes], symbols: Optional[SymbolTable] = None, pause_gc: bool = False) -> Any:
+    return loads(fp.read(), symbols, pause_gc)
+
+
+class _Reader:
+    def __init__(self, view: memoryview, strings: List[str], symbols: SymbolTable) -> None:
+        self.view = view
+        self.strings = strings
+        self.intern = symbols.intern
+        # symbol ids of the strings used as names, filled in when first met
+        self.ids: List[Optional[int]] = [None] * len(strings)
+
+    def symbol(self, n: int) -> int:
+        symbol = self.ids[n]
+        if symbol is None:
+            symbol = self.ids[n] = self.intern(self.strings[n])
+        return symbol
+
+    def nodes(self, pos: int) -> Any:
+        # a node is finished once its last child is, so unfinished nodes
+        # wait on a stack as [kind, scalar, children, children to come].
+        # one byte varints are read inline, they are nearly all of them.
+        view = self.view
+        strings = self.strings
+        pending: List[List[Any]] = []
+
+        while True:
+            kind = view[pos]
+            pos += 1
+            if kind == LITERAL or kind == VALUE or kind == RHO_LITERAL:
+                tag = view[pos]
+                pos += 1
+                if tag == _FLOAT:
+                    scalar: Any = _double.unpack_from(view, pos)[0]
+                    pos += 8
+                elif tag <= _STR:
+                    n = view[pos]
+                    pos += 1
+                    if n >= 0x80:
+                        n, pos = _long_varint(view, pos, n)
+                    scalar = n if tag == _INT else -n if tag == _NEG_INT else strings[n]
+                elif tag <= _NONE:
+                    scalar = (True, False, None)[tag - _TRUE]
+                else:
+                    raise FormatError(f"unknown value tag {tag} at {pos - 1}")
+                count = 0
+            elif kind == FUNCTION or kind == FUNCTION_APPLY:
+                # the name then the parameters or arguments, as string indexes
+                scalar = []
+                n = view[pos]
+                pos += 1
+                if n >= 0x80:
+                    n, pos = _long_varint(view, pos, n)
+                scalar.append(n)
+                length = view[pos]
+                pos += 1
+                if length >= 0x80:
+                    length, pos = _long_varint(view, pos, length)
+                for _ in range(length):
+                    n = view[pos]
+                    pos += 1
+                    if n >= 0x80:
+                        n, pos = _long_varint(view, pos, n)
+                    scalar.append(n)
+                # interned now, in preorder, so a fresh table gets the ids
+                # the parser handed out
+                for n in scalar:
+                    self.symbol(n)
+                count = _ARITY[kind]
+            elif kind <= VAR and kind != PRINT and kind != RETURN and kind != GROUPING or kind == CALL:
+                # a count of statements or arguments, an operator or a string index
+                scalar = view[pos]
+                pos += 1
+                if scalar >= 0x80:
+                    scalar, pos = _long_varint(view, pos, scalar)
+                if kind == IDENTIFIER or kind == VAR:
+                    self.symbol(scalar)
+                count = scalar if kind <= BLOCK else scalar + 1 if kind == CALL else _ARITY[kind]
+            elif kind < len(KINDS):
+                scalar = None
+                count = _ARITY[kind]
+            else:
+                raise FormatError(f"unknown node kind {kind} at {pos - 1}")
+
+            if count:
+                pending.append([kind, scalar, [], count])
+                continue
+
+            node = self.build(kind, scalar, ())
+            while pending:
+                top = pending[-1]
+                top[2].append(node)
+                top[3] -= 1
+                if top[3]:
+                    break
+                pending.pop()
+                node = self.build(top[0], top[1], top[2])
+            else:
+                return node
+
+    def build(self, kind: int, scalar: Any, children: Sequence[Any]) -> Any:
+        # the common nodes skip their frozen dataclass __init__ and get
+        # their fields put straight into __dict__, as unpickling does
+        if kind == BINARY:
+            node = _new(Binary)
+            fields = node.__dict__
+            fields['operator'] = OPERATORS[scalar]
+            fields['left'] = children[0]
+            fields['right'] = children[1]
+            return node
+        if kind == IDENTIFIER:
+            node = _new(Identifier)
+            fields = node.__dict__
+            fields['symbol'] = self.strings[scalar]
+            fields['symbol_id'] = self.symbol(scalar)
+            return node
+        if kind == LITERAL:
+            node = _new(Literal)
+            node.__dict__['val'] = scalar
+            return node
+        if kind == GROUPING or kind == PRINT or kind == RETURN:
+            node = _new(KINDS[kind])
+            node.__dict__['expr'] = children[0]
+            return node
+        if kind == PROGRAM:
+            return Program(tuple(children))
+        if kind == BLOCK:
+            return Block(tuple(children))
+        if kind == FUNCTION or kind == FUNCTION_APPLY:
+            names = [self.strings[n] for n in scalar]
+            symbols = [self.symbol(n) for n in scalar]
+            if kind == FUNCTION:
+                return Function(names[0], names[1:], children[0], symbols[0], tuple(symbols[1:]))
+            return FunctionApply(names[0], tuple(names[1:]), symbols[0], tuple(symbols[1:]))
+        if kind == UNARY:
+            return Unary(OPERATORS[scalar], children[0])
+        if kind == VAR:
+            return Var(self.strings[scalar], children[0])
+        if kind == VALUE:
+            return Value(scalar)
+        if kind == RHO_LITERAL:
+            return rho.Literal(scalar)
+        if kind == CALL:
+            return Call(children[0], tuple(children[1:]))
+        return KINDS[kind](*children)
+
+
+__all__ = ["dump", "dumps", "load", "loads", "FormatError", "VERSION"]
@@ -0,0 +1,182 @@
+import io
+import json
+import re
+from json.encoder import encode_basestring_ascii as _string
+from typing import IO, Any, Callable, Dict, List, Optional, Union
+
+from pox.func_parse import (
+    AST,
+    BINARY_OPERATORS,
+    UNARY_OPERATORS,
+    Binary,
+    Block,
+    Call,
+    Function,
+    Grouping,
+    Identifier,
+    Literal,
+    Print,
+    Program,
+    Return,
+    Unary,
+    _node_type,
+)
+from pox.symbols import SymbolTable
+
+# Reading and writing the documents pox.func_parse.to_json builds. dump
+# writes them piece by piece, without the dict tree and without
+# recursion, and load builds nodes as soon as each object is decoded.
+
+# a node's document is a list of parts: strings are written as they are,
+# nodes are replaced by their own parts
+_Parts = List[Union[str, AST]]
+
+
+def _number(val: Any) -> str:
+    if type(val) is float and val == val and val not in (float('inf'), float('-inf')):
+        return float.__repr__(val)
+    return json.dumps(val)
+
+
+def _list(nodes: Any) -> _Parts:
+    if not nodes:
+        return ['[]']
+    parts: _Parts = ['[']
+    for node in nodes:
+        parts.append(node)
+        parts.append(', ')
+    parts[-1] = ']'
+    return parts
+
+
+_PARTS: Dict[type, Callable[[Any], _Parts]] = {
+    Binary: lambda ast: [
+        '{"type": "binary", "op": ', _string(str(ast.operator)),
+        ', "left": ', ast.left, ', "right": ', ast.right, '}',
+    ],
+    Unary: lambda ast: ['{"type": "unary", "op": ', _string(str(ast.operator)), ', "right": ', ast.right, '}'],
+    Literal: lambda ast: ['{"type": "literal", "val": ' + _number(ast.val) + '}'],
+    Grouping: lambda ast: ['{"type": "grouping", "expr": ', ast.expr, '}'],
+    Print: lambda ast: ['{"type": "print", "expr": ', ast.expr, '}'],
+    Block: lambda ast: ['{"type": "block", "statement": ', *_list(ast.statements), '}'],
+    Program: lambda ast: ['{"type": "program", "statement": ', *_list(ast.statements), '}'],
+    Return: lambda ast: ['{"type": "return", "expr": ', ast.expr, '}'],
+    Function: lambda ast: [
+        '{"type": "function", "name": ', _string(ast.name),
+        ', "parameters": [' + ', '.join(map(_string, ast.parameters)) + '], "body": ',
+        *_list(ast.body.statements), '}',
+    ],
+    Identifier: lambda ast: ['{"type": "identifier", "symbol": ' + _string(ast.symbol) + '}'],
+    Call: lambda ast: ['{"type": "call", "callee": ', ast.callee, ', "arguments": ', *_list(ast.arguments), '}'],
+}
+
+
+def dump(ast: AST, fp: IO[str], buffer_size: int = 1 << 16) -> None:
+    # the same text as json.dump(to_json(ast), fp)
+    out: List[str] = []
+    size = 0
+    stack: _Parts = [ast]
+    while stack:
+        part = stack.pop()
+        if type(part) is str:
+            out.append(part)
+            size += len(part)
+            if size >= buffer_size:
+                fp.write(''.join(out))
+                out.clear()
+                size = 0
+        else:
+            parts = _PARTS[_node_type(_PARTS, part, "json form")](part)
+            parts.reverse()
+            stack.extend(parts)
+    fp.write(''.join(out))
+
+
+def dumps(ast: AST) -> str:
+    out = io.StringIO()
+    dump(ast, out)
+    return out.getvalue()
+
+
+# operators are written as str(operator), which for plain functions has
+# an address in it that won't survive a restart, so they are looked up
+# by name
+_OPERATOR_NAME = re.compile(r"<(?:built-in )?function (\w+)")
+_OPERATORS: Dict[str, Callable[..., Any]] = {
+    op.__name__: op for op in [op for _, op in BINARY_OPERATORS.values()] + list(UNARY_OPERATORS.values())
+}
+
+
+def _operator(text: str) -> Callable[..., Any]:
+    m = _OPERATOR_NAME.match(text)
+    name = m.group(1) if m else text
+    try:
+        return _OPERATORS[name]
+    except KeyError:
+        raise ValueError(f"unknown operator {text!r}") from None
+
+
+def _hook(symbols: SymbolTable) -> Callable[[Dict[str, Any]], Any]:
+    intern = symbols.intern
+    nodes: Dict[str, Callable[[Dict[str, Any]], AST]] = {
+        "binary": lambda d: Binary(_operator(d["op"]), d["left"], d["right"]),
+        "unary": lambda d: Unary(_operator(d["op"]), d["right"]),
+        "literal": lambda d: Literal(d["val"]),
+        "grouping": lambda d: Grouping(d["expr"]),
+        "print": lambda d: Print(d["expr"]),
+        "block": lambda d: Block(tuple(d["statement"])),
+        "program": lambda d: Program(tuple(d["statement"])),
+        "return": lambda d: Return(d["expr"]),
+        "function": lambda d: Function(
+            name=d["name"],
+            parameters=d["parameters"],
+            body=Block(tuple(d["body"])),
+            name_id=intern(d["name"]),
+            parameter_ids=tuple(intern(p) for p in d["parameters"]),
+        ),
+        "identifier": lambda d: Identifier(d["symbol"], intern(d["symbol"])),
+        "call": lambda d: Call(d["callee"], tuple(d["arguments"])),
+    }
+
+    def hook(d: Dict[str, Any]) -> Any:
+        try:
+            return nodes[d["type"]](d)
+        except KeyError as e:
+            raise ValueError(f"not a pox node: {d!r}") from e
+
+    return hook
+
+
+def loads(text: str, symbols: Optional[SymbolTable] = None) -> AST:
+    # symbol ids refer to symbols, or to a fresh table. they are handed
+    # out in the order nodes are decoded, which isn't the parser's order.
+    return json.loads(text, object_hook=_hook(symbols if symbols is not None else SymbolTable()))
+
+
+def load(fp: IO[str], symbols: Optional[SymbolTable] = None) -> AST:
+    return json.load(fp, object_hook=_hook(symbols if symbols is not None else SymbolTable()))
+
+
+def from_json(doc: Dict[str, Any], symbols: Optional[SymbolTable] = None) -> AST:
+    # the inverse of to_json, for documents already decoded
+    hook = _hook(symbols if symbols is not None else SymbolTable())
+    # bottom up without recursion, the way the decoder calls the hook
+    done: Dict[int, Any] = {}
+    stack: List[Any] = [(doc, False)]
+    while stack:
+        value, ready = stack.pop()
+        if id(value) in done:
+            continue
+        children = value.values() if isinstance(value, dict) else value
+        if not ready:
+            stack.append((value, True))
+            stack.extend((v, False) for v in children if isinstance(v, (dict, list)))
+            continue
+        if isinstance(value, dict):
+            done[id(value)] = hook({k: done.get(id(v), v) for k, v in value.items()})
+        else:
+            done[id(value)] = [done.get(id(v), v) for v in value]
+    return done[id(doc)]
+
+
+__all__ = ["dump", "dumps", "load", "loads", "from_json"]
@@ -0,0 +1,172 @@
+import os
+import re
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from pox import ast_binary
+from pox.func_parse import AST, Program, lex_and_parse, parse_file
+from pox.symbols import SymbolTable
+from pox.tokenizer import _multi_line_comment_end
+
+
+@dataclass
+class ParseResult:
+    path: str
+    program: Optional[AST]
+    # the symbol ids recorded in program refer to this table
+    symbols: Optional[SymbolTable]
+    error: Optional[str]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _parse_one(path: str) -> Tuple[str, Optional[bytes], Optional[str]]:
+    symbols = SymbolTable()
+    try:
+        program = parse_file(path, symbols)
+    except Exception as e:
+        # parse errors carry the source context in their message
+        return path, None, f"{type(e).__name__}: {e}"
+    # the binary form is a fraction of the size of a pickled tree. its
+    # string table is in the order the parser interned the names in, so
+    # loading it into a fresh table gives back the same symbol ids.
+    return path, ast_binary.dumps(program), None
+
+
+def _result(packed: Tuple[str, Optional[bytes], Optional[str]]) -> ParseResult:
+    path, data, error = packed
+    if error is not None:
+        return ParseResult(path, None, None, error)
+    symbols = SymbolTable()
+    return ParseResult(path, ast_binary.loads(data, symbols), symbols, None)
+
+
+def parse_many(paths: Iterable[str], workers: Optional[int] = None) -> List[ParseResult]:
+    # parses every file, in parallel unless workers is 1. one bad file
+    # gives one failed result, it doesn't stop the batch.
+    paths = list(paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(paths) <= 1:
+        return [_result(_parse_one(path)) for path in paths]
+
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [_result(packed) for packed in pool.map(_parse_one, paths, chunksize=chunksize)]
+
+
+# the only things a top-level statement boundary depends on. strings and
+# comments are matched whole so the brackets inside them are skipped;
+# everything else is jumped over by the search.
+_boundary_event = re.compile(
+    r"[(){};]"
+    r"|\"(?:\\[\s\S]|[^\"\\])*\"|'(?:\\[\s\S]|[^'\\])*'"
+    r"|//(?:\\[\s\S]?|[^\n\\])*\n?"
+    r"|/\*"
+)
+_whitespace = re.compile(r"\s*")
+
+
+def statement_starts(src: str) -> List[int]:
+    # the character offsets top-level statements can be cut at, found by
+    # counting brackets instead of lexing and parsing. a statement ends at
+    # a ';' or at the '}' closing a fun, and then takes in a ';' right
+    # after it, as the parser does. wrong for programs that don't parse,
+    # which is fine: a chunk cut in the wrong place fails to parse too.
+    starts = [0]
+    depth = 0
+    # end of a top-level '}' that a ';' might still follow
+    pending = blank = -1
+    search = _boundary_event.search
+    i = 0
+    while True:
+        m = search(src, i)
+        if m is None:
+            break
+        c = src[m.start()]
+        i = m.end()
+        if c == "/":
+            if src[m.start() + 1] == "*":
+                i = _multi_line_comment_end(src, m.start() + 1)
+            if pending >= 0 and _whitespace.match(src, blank).end() >= m.start():
+                blank = i
+            continue
+        if pending >= 0:
+            # the ';' belongs to the fun when only blanks and comments
+            # come between
+            if c == ";" and _whitespace.match(src, blank).end() >= m.start():
+                starts.append(i)
+                pending = -1
+                continue
+            starts.append(pending)
+            pending = -1
+        if c in "({":
+            depth += 1
+        elif c in ")}":
+            depth -= 1
+            if depth == 0 and c == "}":
+                pending = blank = i
+        elif depth == 0 and c == ";":
+            starts.append(i)
+    if pending >= 0:
+        starts.append(pending)
+    if _whitespace.match(src, starts[-1]).end() == len(src):
+        starts.pop()
+    return starts
+
+
+def _parse_chunk(src: str) -> bytes:
+    symbols = SymbolTable()
+    return ast_binary.dumps(lex_and_parse(src, symbols))
+
+
+def parse_split(
+    src: str, symbols: Optional[SymbolTable] = None, workers: Optional[int] = None, chunks: Optional[int] = None
+) -> AST:
+    # parses one large program in parallel: the source is cut into chunks
+    # of whole top-level statements, each parsed in its own process, and
+    # the statements put back together in order. the result is the same
+    # tree, with the same symbol ids, that lex_and_parse(src, symbols)
+    # gives, and so are the errors.
+    if symbols is None:
+        symbols = SymbolTable()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunks is None:
+        chunks = workers * 4
+    if workers <= 1 or chunks <= 1:
+        return lex_and_parse(src, symbols)
+    starts = statement_starts(src)
+    if len(starts) < 2:
+        return lex_and_parse(src, symbols)
+
+    # about the same amount of text in each chunk
+    offsets = [0]
+    for n in range(1, chunks):
+        k = bisect_left(starts, len(src) * n // chunks)
+        if k < len(starts) and starts[k] > offsets[-1]:
+            offsets.append(starts[k])
+    offsets.append(len(src))
+    pieces = [src[a:b] for a, b in zip(offsets, offsets[1:])]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            packed = list(pool.map(_parse_chunk, pieces))
+    except Exception:
+        # chunks only know their own text, so errors come from a serial
+        # parse that can point at the right line
+        return lex_and_parse(src, symbols)
+    # loading in source order interns the names in the order a serial lex
+    # meets them
+    statements = []
+    for data in packed:
+        statements.extend(ast_binary.loads(data, symbols).statements)
+    return Program(tuple(statements))
+
+
+__all__ = ["parse_many", "parse_split", "statement_starts", "ParseResult"]
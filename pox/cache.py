@@ -0,0 +1,181 @@
+import os
+import tempfile
+from collections import OrderedDict
+from dataclasses import fields, replace
+from hashlib import sha256
+from typing import Any, List, Optional, Sequence, Tuple
+
+from pox import ast_binary
+from pox.func_parse import AST, PARSER_VERSION, Function, FunctionApply, Identifier, lex_and_parse
+from pox.symbols import SymbolTable
+
+# a parsed tree with the names its symbol ids index
+_Entry = Tuple[AST, List[str]]
+
+
+def _remap(node: Any, ids: Sequence[int]) -> Any:
+    # rewrites symbol ids from the table the tree was parsed with to the
+    # caller's table, ids[old] being the new id
+    if isinstance(node, Identifier):
+        return replace(node, symbol_id=ids[node.symbol_id])
+    if isinstance(node, Function):
+        return replace(
+            node,
+            body=_remap(node.body, ids),
+            name_id=ids[node.name_id],
+            parameter_ids=tuple(ids[p] for p in node.parameter_ids),
+        )
+    if isinstance(node, FunctionApply):
+        return replace(node, f_id=ids[node.f_id], arg_ids=tuple(ids[a] for a in node.arg_ids))
+    if isinstance(node, AST):
+        return replace(node, **{f.name: _remap(getattr(node, f.name), ids) for f in fields(node)})
+    if isinstance(node, tuple):
+        return tuple(_remap(x, ids) for x in node)
+    return node
+
+
+class ParseCache:
+    # parsed trees keyed by a hash of the source and PARSER_VERSION. a
+    # bounded LRU in memory sits in front of an optional directory that
+    # several builds can share: entries are written to a temporary file and
+    # renamed into place, and once the directory grows past max_bytes the
+    # least recently used files go. trees served from memory are shared
+    # between callers, don't mutate them.
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 256, max_bytes: int = 64 << 20) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, _Entry]' = OrderedDict()
+        # only a running estimate, other processes write to the directory
+        # too. it is recounted whenever it says the limit is reached.
+        self._disk_bytes: Optional[int] = None
+
+    @staticmethod
+    def key(src: str) -> str:
+        digest = sha256(f"pox {PARSER_VERSION} {ast_binary.VERSION}\0".encode())
+        digest.update(src.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def parse(self, src: str, symbols: Optional[SymbolTable] = None) -> AST:
+        # lex_and_parse, skipped for any source seen before
+        key = self.key(src)
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+        else:
+            entry = self._load(key)
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                table = SymbolTable()
+                entry = lex_and_parse(src, table), table.names
+                self._store(key, entry)
+            self._memory[key] = entry
+            if len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+        program, names = entry
+        if symbols is None:
+            return program
+        ids = [symbols.intern(name) for name in names]
+        if ids == list(range(len(names))):
+            return program
+        return _remap(program, ids)
+
+    def clear(self) -> None:
+        # empties the memory tier only, the directory may be in use elsewhere
+        self._memory.clear()
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def _load(self, key: str) -> Optional[_Entry]:
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            symbols = SymbolTable()
+            entry = ast_binary.loads(data, symbols), symbols.names
+        except Exception:
+            # a file from an incompatible build, or damaged. parse again
+            # and let _store replace it.
+            return None
+        try:
+            # eviction goes by modification time, so a hit counts as a use
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        if self.directory is None:
+            return
+        # the names come back in the same order from the string table
+        data = ast_binary.dumps(entry[0])
+        path = self._path(key)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, size, _ in self._files())
+        else:
+            self._disk_bytes += len(data)
+        if self._disk_bytes > self.max_bytes:
+            self._evict()
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        # (mtime, size, path) of every finished entry in the directory
+        assert self.directory is not None
+        found = []
+        for folder in os.scandir(self.directory):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, stat.st_size, entry.path))
+        return found
+
+    def _evict(self) -> None:
+        # oldest first, down to 3/4 of the limit so the next few writes
+        # don't each rescan the directory
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 3 // 4
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+        self._disk_bytes = total
+
+
+__all__ = ["ParseCache"]
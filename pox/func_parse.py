@@ -1,16 +1,50 @@
-from colorama import Fore, Style
-from dataclasses import dataclass
-from typing import List, Dict, Any, Union, Tuple, Sequence
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Union, Tuple, Sequence, Iterable, Optional
 
 from pox.token_types import NUMBER, PLUS, OPEN_PAREN, CLOSE_PAREN, STAR, FUN, IDENTIFIER, COMMA, OPEN_BRACE, CLOSE_BRACE, PRINT, SEMICOLON, TokenType, RETURN
-from pox.tokenizer import Token, Tuple, TypeVar, Generic, Callable
-from operator import add, mul
+from pox.token_types import (
+    TOKEN_TYPES, MINUS, SLASH, BANG, BANG_EQUAL, EQUAL_EQUAL, GREATER, GREATER_EQUAL, LESS, LESS_EQUAL, AND, OR, BINAND, BINOR, XOR
+)
+from pox.tokenizer import Token, TokenStream, TokenBuffer, Tuple, TypeVar, Generic, Callable
+from pox.symbols import SymbolTable
+from pox.lines import LineIndex, render
+from operator import add, mul, sub, truediv, neg, not_, eq, ne, lt, le, gt, ge, and_, or_, xor
 
 T = TypeVar('T')
+R = TypeVar('R')
 
+# bump whenever the trees built for the same source change shape, stored
+# trees from older versions are then never read back
+PARSER_VERSION = 2
 
-class Src:
-    src = ''
+
+@dataclass
+class Session:
+    # everything one parse knows about its input. each parse runs in its
+    # own, so threads and asyncio tasks can parse at the same time without
+    # seeing each other's source in their errors.
+    src: str = ''
+    path: Optional[str] = None
+    # left None with src set, built from src if an error needs it
+    lines: Optional[LineIndex] = None
+    tokens: Optional[TokenStream] = None
+    diagnostics: List[str] = field(default_factory=list)
+    # a pox.hashcons.NodeFactory to share identical subtrees, each
+    # top-level statement is interned as soon as it is parsed
+    nodes: Any = None
+    # if set, filled in with id(statement) -> offset of its first character
+    # for every statement parsed, to map compiled code back to the source
+    positions: Optional[Dict[int, int]] = None
+
+    def read_lines(self, first: int, last: int) -> List[str]:
+        assert self.lines is not None
+        if self.path is not None:
+            return self.lines.file_lines(self.path, first, last)
+        return self.lines.source_lines(self.src, first, last)
+
+
+_session: ContextVar[Session] = ContextVar('pox_session')
 
 
 # why even have an AST class at this point?
@@ -37,6 +71,12 @@ class Binary(AST):
     right: AST
 
 
+@dataclass(frozen=True)
+class Unary(AST):
+    operator: Callable[[float], float]
+    right: AST
+
+
 @dataclass(frozen=True)
 class Literal(AST, Generic[T]):
     val: T
@@ -45,6 +85,8 @@ class Literal(AST, Generic[T]):
 @dataclass(frozen=True)
 class Identifier(AST):
     symbol: str
+    # SymbolTable ids ride along but don't take part in equality
+    symbol_id: Optional[int] = field(default=None, compare=False)
 
 
 @dataclass(frozen=True)
@@ -63,12 +105,22 @@ class Function(AST):
     name: str
     parameters: Sequence[str]
     body: Block
+    name_id: Optional[int] = field(default=None, compare=False)
+    parameter_ids: Sequence[Optional[int]] = field(default=(), compare=False)
 
 
 @dataclass(frozen=True)
 class FunctionApply(AST):
     f_name: str
     arg_names: Tuple[str]
+    f_id: Optional[int] = field(default=None, compare=False)
+    arg_ids: Tuple[Optional[int], ...] = field(default=(), compare=False)
+
+
+@dataclass(frozen=True)
+class Call(AST):
+    callee: AST
+    arguments: Tuple[AST, ...]
 
 
 @dataclass(frozen=True)
@@ -84,7 +136,7 @@ class Value(AST, Generic[T]):
 
 
 
-Expr = Union[Binary, Literal, Grouping, Function, FunctionApply, Identifier]
+Expr = Union[Binary, Unary, Literal, Grouping, Function, FunctionApply, Call, Identifier]
 Statement = Union[FunctionApply, Print]  # Var, Function
 
 @dataclass(frozen=True)
@@ -92,10 +144,48 @@ class Return(AST):
     expr: Expr
 
 
-def check(tokens: Sequence[Token], i: int, n: int, expected: Sequence[TokenType]) -> None:
+def logical_and(left: Any, right: Any) -> Any:
+    return left and right
+
+
+def logical_or(left: Any, right: Any) -> Any:
+    return left or right
+
+
+# binding power and operator for every binary operator, loosest first
+BINARY_OPERATORS: Dict[TokenType, Tuple[int, Callable[[Any, Any], Any]]] = {
+    OR: (1, logical_or),
+    AND: (2, logical_and),
+    EQUAL_EQUAL: (3, eq),
+    BANG_EQUAL: (3, ne),
+    LESS: (4, lt),
+    LESS_EQUAL: (4, le),
+    GREATER: (4, gt),
+    GREATER_EQUAL: (4, ge),
+    BINOR: (5, or_),
+    XOR: (6, xor),
+    BINAND: (7, and_),
+    PLUS: (8, add),
+    MINUS: (8, sub),
+    STAR: (9, mul),
+    SLASH: (9, truediv),
+}
+
+UNARY_OPERATORS: Dict[TokenType, Callable[[Any], Any]] = {
+    MINUS: neg,
+    BANG: not_,
+}
+
+# the same tables indexed by token type code, so the parser does a list
+# lookup per token instead of hashing token types
+_binary_operators = [BINARY_OPERATORS.get(t) for t in TOKEN_TYPES]
+_unary_operators = [UNARY_OPERATORS.get(t) for t in TOKEN_TYPES]
+
+
+def check(tokens: TokenStream, i: int, n: int, expected: Sequence[TokenType]) -> None:
     for j in range(n):
         k = i + j
-        if k > len(tokens):
+        if not tokens.has(k):
             raise RuntimeError(f"Out of bounds! i: {i}, j: {j} -- ")
 
         token = tokens[k]
@@ -105,223 +195,201 @@ def check(tokens: Sequence[Token], i: int, n: int, expected: Sequence[TokenType]
             panic(tokens, k, msg)
 
 
-def panic(tokens: Sequence[Token], i: int, msg: str) -> None:
-    src = Src.src
+def panic(tokens: TokenStream, i: int, msg: str) -> None:
+    # only needed once something has gone wrong
+    from colorama import Fore, Style
+    if not tokens.has(i):
+        raise RuntimeError(f"{msg} at the end of the input")
     color = Fore.LIGHTRED_EX
-    try:
-        token = tokens[i]
-        start = token.char
-        end = token.char + len(token.lexeme)
-        print(src[:start], end='')
-        err = src[start:end]
-        print(f"{color}{err}{Style.RESET_ALL}", end='')
-        print(src[end:])
-    except Exception:
-        raise
-    msg += f'\n{color}Look for this above{Style.RESET_ALL}'
+    token = tokens[i]
+    start = token.char
+    end = token.char + len(token.lexeme)
+    session = _session.get(None)
+    if session is not None and session.lines is None and session.src:
+        session.lines = LineIndex.from_source(session.src)
+    if session is not None and session.lines is not None:
+        context = render(session.lines, session.read_lines, start, end, highlight=lambda s: f"{color}{s}{Style.RESET_ALL}")
+        msg += f'\n{context}'
+        session.diagnostics.append(msg)
     raise RuntimeError(msg)
 
 
-def _stmt(tokens: Sequence[Token], i: int) -> Tuple[Any, int]:
-    if tokens[i].token_type is PRINT:
-        stmt, j = _print(tokens, i)
-        assert tokens[j].token_type is SEMICOLON, (j, tokens[j])
-    elif tokens[i].token_type is FUN:
-        stmt, j = _function(tokens, i)
-        # assert tokens[j].token_type is SEMICOLON, (j, tokens[j])
-    elif tokens[i].token_type is RETURN:
-        stmt, j = _return(tokens, i)
-        return stmt, j
-    else:
-        stmt, j = _expression(tokens, i)
-        assert tokens[j].token_type is SEMICOLON, (j, tokens[j])
-    return stmt, j + 1
+def calls(callee: Expr, argument_lists: Sequence[Tuple[Expr, ...]]) -> Expr:
+    # f(a)(b) calls what f(a) returns
+    for arguments in argument_lists:
+        callee = Call(callee, arguments)
+    return callee
+
 
+def parsed_statement(tokens: TokenStream, i: int, node: AST) -> None:
+    session = _session.get(None)
+    if session is not None and session.positions is not None:
+        session.positions[id(node)] = tokens[i].char
 
-def _return(tokens: Sequence[Token], i: int) -> Tuple[Return, int]:
-    assert tokens[i].token_type is RETURN
-    expr, j = _expression(tokens, i + 1)
-    assert tokens[j].token_type is SEMICOLON
-    return Return(expr), j + 1
 
+def expected(tokens: TokenStream, i: int, token_type: TokenType) -> None:
+    # what the generated parser calls when a token doesn't match, the same
+    # message as check's
+    if not tokens.has(i):
+        raise RuntimeError(f"Expected {token_type} at the end of the input")
+    panic(tokens, i, f"Expected {token_type}\nCharacter: {tokens[i].char}")
 
-def _program(tokens: Sequence[Token], i: int) -> Tuple[Program, int]:
+
+def _program(tokens: TokenStream, i: int) -> Tuple[Program, int]:
+    session = _session.get(None)
+    nodes = session.nodes if session is not None else None
     statements: List[Statement] = []
+    # a buffer has its own copy of the rules, which read its kinds array
+    stmt_rule = _stmt_in_buffer if isinstance(tokens, TokenBuffer) else _stmt
     j = i
-    while j < len(tokens):
-        stmt, k = _stmt(tokens, j)
-        statements.append(stmt)
+    while tokens.has(j):
+        stmt, k = stmt_rule(tokens, j)
+        statements.append(stmt if nodes is None else nodes.intern(stmt))
         j = k
+        # nothing looks back past a finished top-level statement
+        tokens.release(j)
+    if nodes is not None:
+        return nodes.make(Program, tuple(statements)), j
     program = Program(tuple(statements))
     return program, j
 
 
-def _print(tokens: Sequence[Token], i: int) -> Tuple[Print, int]:
-    check(tokens, i, 2, (PRINT, OPEN_PAREN,))
-    expr, j = _expression(tokens, i + 2)
-    check(tokens, j, 1, (CLOSE_PAREN,))
-    return Print(expr), j + 1
-
-
-def _expression(tokens: Sequence[Token], i: int) -> Tuple[Expr, int]:
-    return _addition(tokens, i)
-
-
-def _addition(tokens: Sequence[Token], i: int) -> Tuple[Expr, int]:
-    expr, j = _multiplication(tokens, i)
-
-    while j < len(tokens) and tokens[j].token_type is PLUS:
-        operator = tokens[j] # todo ...
-        right, j = _multiplication(tokens, j + 1)
-        expr = Binary(add, left=expr, right=right)
-
-    return expr, j
-
-
-def _multiplication(tokens: Sequence[Token], i: int) -> Tuple[Expr, int]:
-    expr, j = _primary(tokens, i)
-
-    while j < len(tokens) and tokens[j].token_type is STAR:
-        operator = tokens[j] # todo ...
-        right, j = _primary(tokens, j + 1)
-        expr = Binary(mul, left=expr, right=right)
-
-    return expr, j
-
-
-def _primary(tokens: Sequence[Token], i: int) -> Tuple[Expr, int]:
-    token = tokens[i]
-
-    if token.token_type is NUMBER:
-        return Literal(float(token.lexeme)), i + 1
-
-    if token.token_type is IDENTIFIER:
-        return Identifier(symbol=token.lexeme), i + 1
-
-    if token.token_type is OPEN_PAREN:
-        expr, j = _expression(tokens, i + 1)
-        assert tokens[j].token_type is CLOSE_PAREN
-        return Grouping(expr), j + 1
-
-    panic(tokens, i, msg="Fell off the end of _primary")
-
-
-def types(ts: Sequence[Token]):
+def types(ts: Iterable[Token]):
     return tuple(t.token_type for t in ts)
 
 
-def _block(tokens: Sequence[Token], i: int) -> Tuple[Block, int]:
-    assert tokens[i].token_type is OPEN_BRACE
-    j = i + 1
-    statements: List[Statement] = []
-    while j < len(tokens) and tokens[j].token_type is not CLOSE_BRACE:
-        stmt, k = _stmt(tokens, j)
-        statements.append(stmt)
-        j = k
-    assert tokens[j].token_type is CLOSE_BRACE
-    return Block(tuple(statements)), j + 1
-
-
-def _function(tokens: Sequence[Token], i: int) -> Tuple[AST, int]:
-    assert types(tokens[i:i+3]) == (FUN, IDENTIFIER, OPEN_PAREN)
-
-    name = tokens[1].lexeme
-
-    j = i + 3
-    parameters = []
-
-    while j < len(tokens) and tokens[j].token_type is not CLOSE_PAREN:
-        assert tokens[j].token_type is IDENTIFIER
-        parameters.append(tokens[j].lexeme)
-        assert tokens[j + 1].token_type in (COMMA, CLOSE_PAREN)
-        if tokens[j + 1].token_type is COMMA:
-            j += 2
-        else:
-            j += 1
-    assert j < len(tokens)
-    assert tokens[j].token_type is CLOSE_PAREN
-    block, k = _block(tokens, j + 1)
+def _parse(tokens: Union[TokenStream, TokenBuffer, Iterable[Token]]) -> AST:
+    if not isinstance(tokens, (TokenStream, TokenBuffer)):
+        tokens = TokenStream(tokens)
+    ast, _ = _program(tokens, 0)
+    return ast
 
-    if k < len(tokens) and tokens[k].token_type is SEMICOLON:
-        k += 1
 
-    return Function(name=name, parameters=parameters, body=block), k
+def _parser(recursive: bool) -> Callable[[TokenStream], AST]:
+    if recursive:
+        return _parse
+    # the explicit-stack parser has no depth limit
+    from pox.stack_parse import parse
+    return parse
 
 
-def _parse(tokens: Sequence[Token]) -> AST:
-    ast, _ = _program(tokens, 0)
-    return ast
+def _run(session: Session, parse: Callable[[TokenStream], R]) -> R:
+    # parse session.tokens with the session installed for panic
+    token = _session.set(session)
+    try:
+        return parse(session.tokens)
+    finally:
+        _session.reset(token)
+
+
+def lex_and_parse(
+    src: str, symbols: Optional[SymbolTable] = None, recursive: bool = True, session: Optional[Session] = None
+) -> AST:
+    # pass a Session to look at the tokens and diagnostics afterwards
+    from pox.tokenizer import iter_tokens
+    if symbols is None:
+        symbols = SymbolTable()
+    if session is None:
+        session = Session()
+    session.src = src
+    session.path = None
+    session.lines = LineIndex.from_source(src)
+    session.tokens = TokenStream(iter_tokens(src, symbols))
+    return _run(session, _parser(recursive))
+
+
+def parse_file(
+    path: str, symbols: Optional[SymbolTable] = None, recursive: bool = True, session: Optional[Session] = None
+) -> AST:
+    # streams tokens straight out of the file, the source is never held whole
+    from pox.tokenizer import iter_file_tokens
+    if symbols is None:
+        symbols = SymbolTable()
+    if session is None:
+        session = Session()
+    session.src = ''
+    session.path = path
+    session.lines = LineIndex()
+    session.tokens = TokenStream(iter_file_tokens(path, symbols=symbols, lines=session.lines))
+    return _run(session, _parser(recursive))
+
+
+def _node_type(table: Dict[type, Any], node: AST, what: str = "handler") -> type:
+    # the type node is filed under in table, subclasses (e.g. hash-consed
+    # nodes) go under the node type they extend. what the table holds
+    # names it in the error for a node it has nothing for.
+    cls = type(node)
+    if cls not in table:
+        cls = next((t for t in cls.__mro__ if t in table), cls)
+        if cls not in table:
+            raise TypeError(f"no {what} for {node!r}")
+    return cls
+
+
+def _statements(statements: Sequence[AST]) -> List[Dict[str, Any]]:
+    return [to_json(x) for x in statements]
+
+
+_TO_JSON: Dict[type, Callable[[Any], Dict[str, Any]]] = {
+    Binary: lambda ast: {
+        "type": "binary",
+        "op": str(ast.operator),
+        "left": to_json(ast.left),
+        "right": to_json(ast.right),
+    },
+    Unary: lambda ast: {
+        "type": "unary",
+        "op": str(ast.operator),
+        "right": to_json(ast.right),
+    },
+    Literal: lambda ast: {
+        "type": "literal",
+        "val": ast.val,
+    },
+    Grouping: lambda ast: {
+        "type": "grouping",
+        "expr": to_json(ast.expr),
+    },
+    Print: lambda ast: {
+        "type": "print",
+        "expr": to_json(ast.expr),
+    },
+    Block: lambda ast: {
+        "type": "block",
+        "statement": _statements(ast.statements),
+    },
+    Program: lambda ast: {
+        "type": "program",
+        "statement": _statements(ast.statements),
+    },
+    Return: lambda ast: {
+        "type": "return",
+        "expr": to_json(ast.expr),
+    },
+    Function: lambda ast: {
+        "type": "function",
+        "name": ast.name,
+        "parameters": ast.parameters,
+        "body": _statements(ast.body.statements),
+    },
+    Identifier: lambda ast: {
+        "type": "identifier",
+        "symbol": ast.symbol,
+    },
+    Call: lambda ast: {
+        "type": "call",
+        "callee": to_json(ast.callee),
+        "arguments": _statements(ast.arguments),
+    },
+}
 
 
-def lex_and_parse(src: str) -> AST:
-    from pox.tokenizer import tokenize
-    Src.src = src
-    tokens = tokenize(src)
-    ast = _parse(tokens)
-    return ast
+def to_json(ast: AST) -> Dict[str, Any]:
+    # pox.ast_json writes the same documents without building them
+    return _TO_JSON[_node_type(_TO_JSON, ast, "json form")](ast)
 
 
-def to_json(ast: AST) -> Dict[str, Any]:
-    if isinstance(ast, Binary):
-        return {
-            "type": "binary",
-            "op": str(ast.operator),
-            "left": to_json(ast.left),
-            "right": to_json(ast.right),
-        }
-
-    if isinstance(ast, Literal):
-        return {
-            "type": "literal",
-            "val": ast.val,
-        }
-
-    if isinstance(ast, Grouping):
-        return {
-            "type": "grouping",
-            "expr": to_json(ast.expr),
-        }
-
-    if isinstance(ast, Print):
-        return {
-            "type": "print",
-            "expr": to_json(ast.expr),
-        }
-
-    if isinstance(ast, Block):
-        return {
-            "type": "block",
-            "statement": [
-                to_json(x) for x in ast.statements
-            ]
-        }
-
-    if isinstance(ast, Program):
-        return {
-            "type": "program",
-            "statement": [
-                to_json(x) for x in ast.statements
-            ]
-        }
-
-    if isinstance(ast, Return):
-        return {
-            "type": "return",
-            "expr": to_json(ast.expr),
-        }
-
-    if isinstance(ast, Function):
-        return {
-            "type": "function",
-            "name": ast.name,
-            "parameters": ast.parameters,
-            "body": [to_json(x) for x in ast.body.statements],
-        }
-
-    if isinstance(ast, Identifier):
-        return {
-            "type": "identifier",
-            "symbol": ast.symbol,
-        }
-
-    assert False, repr(ast)
+# the statement and expression parsers are generated from the grammar in
+# pox.grammar. they use the nodes, tables and helpers above, so they are
+# imported last.
+from pox._pox_parser import _block, _expression, _primary, _stmt, _stmt_in_buffer  # noqa: E402
@@ -0,0 +1,526 @@
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+
+from pox.token_types import (
+    BANG,
+    CLOSE_BRACE,
+    CLOSE_PAREN,
+    COMMA,
+    FALSE,
+    FUN,
+    IDENTIFIER,
+    MINUS,
+    NULL,
+    NUMBER,
+    OPEN_BRACE,
+    OPEN_PAREN,
+    PRINT,
+    RETURN,
+    SEMICOLON,
+    STRING,
+    TRUE,
+    TokenType,
+)
+
+# A small LL(1) parser generator. A grammar is a list of rules, each a
+# few alternatives of items. Items are token types, the names of other
+# rules, or Opt/Rep groups. Each alternative has an action: a Python
+# expression building its value out of the item values _1, _2, ... Tokens
+# are worth the Token, Opt is None or its items' value, and Rep is a list.
+# An Operators rule parses binary and prefix operators by precedence
+# climbing over tables the target module provides.
+#
+# generate() turns a grammar into the source of a module with one
+# function per rule, `(tokens, i) -> (value, i)`. A rule with several
+# alternatives picks one with a list indexed by the next token's code,
+# built from the FIRST sets of the alternatives. Every function has a
+# twin with an `_in_buffer` suffix for parsing a TokenBuffer, which
+# compares the codes in its kinds array instead of making a token to look
+# at each one. The modules are checked in. Regenerate them with `python -m pox.grammar` after changing a
+# grammar here.
+
+
+class GrammarError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Opt:
+    items: Tuple['Item', ...]
+
+    def __init__(self, *items: 'Item') -> None:
+        object.__setattr__(self, 'items', items)
+
+
+@dataclass(frozen=True)
+class Rep:
+    # zero or more, with sep between them if given
+    items: Tuple['Item', ...]
+    sep: Optional[TokenType] = None
+
+    def __init__(self, *items: 'Item', sep: Optional[TokenType] = None) -> None:
+        object.__setattr__(self, 'items', items)
+        object.__setattr__(self, 'sep', sep)
+
+
+Item = Union[TokenType, str, Opt, Rep]
+
+
+@dataclass(frozen=True)
+class Alt:
+    items: Tuple[Item, ...]
+    action: str
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    alternatives: Tuple[Alt, ...]
+    # message for a token no alternative can start with
+    error: str = "Unexpected token"
+    # a function in the target module called as hook(tokens, i, node)
+    # with every node the rule parses from tokens[i]
+    hook: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Operators:
+    name: str
+    # the rule for the operands, and the tokens whose alternatives in it
+    # are worth inlining into the loop
+    operand: str
+    inline: Tuple[TokenType, ...]
+    # names of lists in the target module indexed by token code: binary
+    # holds (binding power, operator) or None, unary operator or None
+    binary: str
+    unary: str
+    # the token types unary may hold an operator for, for FIRST sets
+    prefix: Tuple[TokenType, ...]
+    # templates over {op}, {left} and {right}
+    binary_action: str
+    unary_action: str
+
+
+@dataclass(frozen=True)
+class Grammar:
+    # the module the generated source is written to
+    module: str
+    # imports for the actions, the operator tables and the two error
+    # functions, expected(tokens, i, token_type) and unexpected(tokens, i, msg)
+    header: str
+    rules: Tuple[Union[Rule, Operators], ...]
+    rule_map: Dict[str, Union[Rule, Operators]] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, 'rule_map', {rule.name: rule for rule in self.rules})
+
+    def first(self, items: Sequence[Item]) -> Tuple[FrozenSet[TokenType], bool]:
+        # FIRST set of a sequence of items, and whether it can be empty
+        first: set = set()
+        for item in items:
+            item_first, nullable = self._first_item(item)
+            first |= item_first
+            if not nullable:
+                return frozenset(first), False
+        return frozenset(first), True
+
+    def _first_item(self, item: Item) -> Tuple[FrozenSet[TokenType], bool]:
+        if isinstance(item, TokenType):
+            return frozenset([item]), False
+        if isinstance(item, str):
+            return self.first_sets()[item], False
+        first, _ = self.first(item.items)
+        return first, True
+
+    def first_sets(self) -> Dict[str, FrozenSet[TokenType]]:
+        # FIRST of every rule, iterated to a fixed point
+        cached = self.__dict__.get('_first_sets')
+        if cached is not None:
+            return cached
+        sets: Dict[str, FrozenSet[TokenType]] = {name: frozenset() for name in self.rule_map}
+        object.__setattr__(self, '_first_sets', sets)
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.rules:
+                if isinstance(rule, Operators):
+                    new = sets[rule.operand] | frozenset(rule.prefix)
+                else:
+                    new = frozenset().union(*(self.first(alt.items)[0] for alt in rule.alternatives))
+                if new != sets[rule.name]:
+                    sets[rule.name] = new
+                    changed = True
+        return sets
+
+    def check(self) -> None:
+        # rejects what this generator can't parse with one token of lookahead
+        for rule in self.rules:
+            if isinstance(rule, Operators):
+                self._known(rule.operand)
+                continue
+            seen: Dict[TokenType, int] = {}
+            for n, alt in enumerate(rule.alternatives):
+                first, nullable = self.first(alt.items)
+                if nullable:
+                    raise GrammarError(f"{rule.name}: alternative {n + 1} can be empty")
+                for token_type in first:
+                    if token_type in seen:
+                        raise GrammarError(
+                            f"{rule.name}: alternatives {seen[token_type] + 1} and {n + 1} can both start with "
+                            f"{token_type.name}"
+                        )
+                    seen[token_type] = n
+                self._check_items(rule.name, alt.items)
+
+    def _check_items(self, name: str, items: Sequence[Item]) -> None:
+        for item in items:
+            if isinstance(item, str):
+                self._known(item)
+            elif isinstance(item, (Opt, Rep)):
+                if self.first(item.items)[1]:
+                    raise GrammarError(f"{name}: an Opt or Rep that can be empty")
+                self._check_items(name, item.items)
+
+    def _known(self, name: str) -> None:
+        if name not in self.rule_map:
+            raise GrammarError(f"no rule named {name}")
+
+
+class _Emitter:
+    def __init__(self, grammar: Grammar) -> None:
+        self.grammar = grammar
+        self.lines: List[str] = []
+        self.tables: List[str] = []
+        self.token_types: set = set()
+        self.sets: Dict[FrozenSet[TokenType], str] = {}
+        # whether the functions being emitted are the TokenBuffer ones
+        self.buffer = False
+
+    @property
+    def suffix(self) -> str:
+        return "_in_buffer" if self.buffer else ""
+
+    def has(self) -> str:
+        return "i < len(kinds)" if self.buffer else "tokens.has(i)"
+
+    def lacks(self) -> str:
+        return "i >= len(kinds)" if self.buffer else "not tokens.has(i)"
+
+    def code(self) -> str:
+        # the code of tokens[i]
+        return "kinds[i]" if self.buffer else "tokens[i].token_type.code"
+
+    def is_(self, token_type: TokenType, negate: bool = False) -> str:
+        name = self.token(token_type)
+        if self.buffer:
+            return f"kinds[i] {'!=' if negate else '=='} {name}.code"
+        return f"tokens[i].token_type {'is not' if negate else 'is'} {name}"
+
+    def header(self, name: str, comment: Optional[str] = None) -> None:
+        self.line(0, f"def {name}{self.suffix}(tokens, i):")
+        if comment is not None:
+            self.line(1, f"# {comment}")
+        if self.buffer:
+            self.line(1, "kinds = tokens.kinds")
+
+    def line(self, depth: int, text: str = '') -> None:
+        self.lines.append('    ' * depth + text if text else '')
+
+    def token(self, token_type: TokenType) -> str:
+        self.token_types.add(token_type.name)
+        return token_type.name
+
+    def starts(self, first: FrozenSet[TokenType]) -> str:
+        # a test for tokens[i] starting one of first
+        if len(first) == 1:
+            return self.is_(next(iter(first)))
+        name = self.sets.get(first)
+        if name is None:
+            name = self.sets[first] = f"_first_{len(self.sets)}"
+            members = ', '.join(f"{self.token(t)}.code" for t in sorted(first, key=lambda t: t.name))
+            self.tables.append(f"{name} = frozenset(({members}))")
+        return f"{self.code()} in {name}"
+
+    def items(self, depth: int, items: Sequence[Item], names: Sequence[str], used: str, known: bool) -> None:
+        # code parsing items into the variables names, those used mentions.
+        # when known, the first item is a token the caller has looked at.
+        for n, (item, name) in enumerate(zip(items, names)):
+            needed = re.search(rf"\b{name}\b", used) is not None
+            if isinstance(item, TokenType):
+                if n > 0 or not known:
+                    self.line(depth, f"if {self.lacks()} or {self.is_(item, negate=True)}:")
+                    self.line(depth + 1, f"expected(tokens, i, {item.name})")
+                if needed:
+                    self.line(depth, f"{name} = tokens[i]")
+                self.line(depth, "i += 1")
+            elif isinstance(item, str):
+                self.line(depth, f"{name if needed else '_'}, i = {item}{self.suffix}(tokens, i)")
+            else:
+                inner = [f"{name}_{k + 1}" for k in range(len(item.items))]
+                value = self.value(inner) if needed else None
+                test = f"{self.has()} and {self.starts(self.grammar.first(item.items)[0])}"
+                if isinstance(item, Opt):
+                    self.opt(depth, item, name, inner, value, test)
+                else:
+                    self.rep(depth, item, name, inner, value, test)
+
+    def opt(self, depth: int, item: Opt, name: str, inner: List[str], value: Optional[str], test: str) -> None:
+        if value is not None:
+            self.line(depth, f"{name} = None")
+        self.line(depth, f"if {test}:")
+        self.items(depth + 1, item.items, inner, value or '', True)
+        if value is not None:
+            self.line(depth + 1, f"{name} = {value}")
+
+    def rep(self, depth: int, item: Rep, name: str, inner: List[str], value: Optional[str], test: str) -> None:
+        if value is not None:
+            self.line(depth, f"{name} = []")
+        if item.sep is None:
+            self.line(depth, f"while {test}:")
+            self.items(depth + 1, item.items, inner, value or '', True)
+            if value is not None:
+                self.line(depth + 1, f"{name}.append({value})")
+            return
+        self.line(depth, f"if {test}:")
+        self.items(depth + 1, item.items, inner, value or '', True)
+        if value is not None:
+            self.line(depth + 1, f"{name}.append({value})")
+        self.line(depth + 1, f"while {self.has()} and {self.is_(item.sep)}:")
+        self.line(depth + 2, "i += 1")
+        self.items(depth + 2, item.items, inner, value or '', False)
+        if value is not None:
+            self.line(depth + 2, f"{name}.append({value})")
+
+    @staticmethod
+    def value(names: Sequence[str]) -> str:
+        return names[0] if len(names) == 1 else f"({', '.join(names)},)"
+
+    def alternative(self, name: str, alt: Alt, known: bool) -> None:
+        self.header(name, ' '.join(_describe(item) for item in alt.items))
+        names = [f"_{k + 1}" for k in range(len(alt.items))]
+        self.items(1, alt.items, names, alt.action, known)
+        self.line(1, f"return {alt.action}, i")
+        self.line(0)
+        self.line(0)
+
+    def rule(self, rule: Rule) -> None:
+        if len(rule.alternatives) == 1 and rule.hook is None:
+            self.alternative(rule.name, rule.alternatives[0], False)
+            return
+
+        table = f"{rule.name}_alternatives{self.suffix}"
+        self.header(rule.name)
+        self.line(1, f"if {self.lacks()}:")
+        self.line(2, f"{rule.name}_error(tokens, i)")
+        if rule.hook is None:
+            self.line(1, f"return {table}[{self.code()}](tokens, i)")
+        else:
+            self.line(1, f"node, j = {table}[{self.code()}](tokens, i)")
+            self.line(1, f"{rule.hook}(tokens, i, node)")
+            self.line(1, "return node, j")
+        self.line(0)
+        self.line(0)
+        if not self.buffer:
+            # the same one does for both
+            self.line(0, f"def {rule.name}_error(tokens, i):")
+            self.line(1, f"unexpected(tokens, i, {rule.error!r})")
+            self.line(0)
+            self.line(0)
+        self.tables.append(f"{table} = [{rule.name}_error] * len(TOKEN_TYPES)")
+        for n, alt in enumerate(rule.alternatives):
+            alternative = f"{rule.name}_{n + 1}"
+            first, _ = self.grammar.first(alt.items)
+            self.alternative(alternative, alt, isinstance(alt.items[0], TokenType))
+            for token_type in sorted(first, key=lambda t: t.name):
+                self.tables.append(f"{table}[{self.token(token_type)}.code] = {alternative}{self.suffix}")
+
+    def operators(self, rule: Operators) -> None:
+        operand = self.grammar.rule_map[rule.operand]
+        assert isinstance(operand, Rule)
+        inline = [alt for alt in operand.alternatives if alt.items[0] in rule.inline]
+
+        binary = rule.binary_action.format(op="pending.pop()[1]", left="operands.pop()", right="expr")
+        unary = rule.unary_action.format(op="operator", right="expr")
+        self.header(rule.name)
+        self.line(1, "# precedence climbing with explicit stacks: operands wait on `operands`")
+        self.line(1, "# until an operator that binds no tighter than the one before them")
+        self.line(1, "# shows up, then the pending operators are folded in, left associative")
+        self.line(1, f"binary = {rule.binary}")
+        self.line(1, f"unary = {rule.unary}")
+        self.line(1, "operands = []")
+        self.line(1, "pending = []")
+        self.line(0)
+        self.line(1, "while True:")
+        self.line(2, f"if {self.lacks()}:")
+        self.line(3, f"unexpected(tokens, i, {operand.error!r})")
+        if self.buffer:
+            self.line(2, "kind = kinds[i]")
+        else:
+            self.line(2, "token = tokens[i]")
+            self.line(2, "token_type = token.token_type")
+        # what the next token is, in the loop
+        current = "kind" if self.buffer else "token_type.code"
+        keyword = "if"
+        for alt in inline:
+            # the loop already holds the first token in `token`, or its
+            # code in `kind` in a buffer
+            action = re.sub(r"\b_1\b", "token", alt.action)
+            names = [f"_{k + 1}" for k in range(len(alt.items))]
+            if self.buffer:
+                self.line(2, f"{keyword} kind == {self.token(alt.items[0])}.code:")
+            else:
+                self.line(2, f"{keyword} token_type is {self.token(alt.items[0])}:")
+            if self.buffer and re.search(r"\btoken\b", action):
+                self.line(3, "token = tokens[i]")
+            self.line(3, "i += 1")
+            self.items(3, alt.items[1:], names[1:], action, False)
+            self.line(3, f"expr = {action}")
+            keyword = "elif"
+        self.line(2, f"{keyword} unary[{current}] is None:")
+        self.line(3, f"expr, i = {rule.operand}{self.suffix}(tokens, i)")
+        self.line(2, "else:")
+        self.line(3, "prefix = []")
+        self.line(3, f"while {self.has()} and unary[{self.code()}] is not None:")
+        self.line(4, f"prefix.append(unary[{self.code()}])")
+        self.line(4, "i += 1")
+        self.line(3, f"expr, i = {rule.operand}{self.suffix}(tokens, i)")
+        self.line(3, "for operator in reversed(prefix):")
+        self.line(4, f"expr = {unary}")
+        self.line(0)
+        self.line(2, f"entry = binary[{self.code()}] if {self.has()} else None")
+        self.line(2, "while pending and (entry is None or pending[-1][0] >= entry[0]):")
+        self.line(3, f"expr = {binary}")
+        self.line(0)
+        self.line(2, "if entry is None:")
+        self.line(3, "return expr, i")
+        self.line(2, "operands.append(expr)")
+        self.line(2, "pending.append(entry)")
+        self.line(2, "i += 1")
+        self.line(0)
+        self.line(0)
+
+
+def _describe(item: Item) -> str:
+    if isinstance(item, TokenType):
+        return item.name
+    if isinstance(item, str):
+        return item
+    inner = ' '.join(_describe(x) for x in item.items)
+    if isinstance(item, Opt):
+        return f"[{inner}]"
+    return f"{{{inner}}}" if item.sep is None else f"{{{inner} / {item.sep.name}}}"
+
+
+def generate(grammar: Grammar) -> str:
+    grammar.check()
+    emitter = _Emitter(grammar)
+    for buffer in (False, True):
+        emitter.buffer = buffer
+        for rule in grammar.rules:
+            if isinstance(rule, Operators):
+                emitter.operators(rule)
+            else:
+                emitter.rule(rule)
+
+    out = [
+        "# generated by pox.grammar, don't edit. change the grammar there and run",
+        "# `python -m pox.grammar` to regenerate this file.",
+        f"from pox.token_types import TOKEN_TYPES, {', '.join(sorted(emitter.token_types))}",
+        grammar.header.strip(),
+        '',
+        '',
+    ]
+    out.extend(emitter.lines)
+    out.extend(emitter.tables)
+    return '\n'.join(out).rstrip('\n') + '\n'
+
+
+POX_PARSER = Grammar(
+    module="pox._pox_parser",
+    header="""
+# imported from the bottom of pox.func_parse, which defines all of this
+from pox.func_parse import Binary, Block, Function, Grouping, Identifier, Literal, Print, Return, Unary
+from pox.func_parse import _binary_operators, _unary_operators, calls, expected, parsed_statement, panic as unexpected
+""",
+    rules=(
+        Rule("_stmt", (
+            Alt((PRINT, OPEN_PAREN, "_expression", CLOSE_PAREN, SEMICOLON), "Print(_3)"),
+            Alt(
+                (FUN, IDENTIFIER, OPEN_PAREN, Rep(IDENTIFIER, sep=COMMA), CLOSE_PAREN, "_block", Opt(SEMICOLON)),
+                "Function(_2.lexeme, [p.lexeme for p in _4], _6, _2.symbol, tuple(p.symbol for p in _4))",
+            ),
+            Alt((RETURN, "_expression", SEMICOLON), "Return(_2)"),
+            Alt(("_expression", SEMICOLON), "_1"),
+        ), error="Expected a statement", hook="parsed_statement"),
+        Rule("_block", (
+            Alt((OPEN_BRACE, Rep("_stmt"), CLOSE_BRACE), "Block(tuple(_2))"),
+        )),
+        Operators(
+            "_expression",
+            operand="_primary",
+            inline=(NUMBER, IDENTIFIER),
+            binary="_binary_operators",
+            unary="_unary_operators",
+            prefix=(MINUS, BANG),
+            binary_action="Binary({op}, {left}, {right})",
+            unary_action="Unary({op}, {right})",
+        ),
+        Rule("_primary", (
+            Alt((NUMBER,), "Literal(float(_1.lexeme))"),
+            Alt(
+                (IDENTIFIER, Rep("_arguments")),
+                "calls(Identifier(_1.lexeme, _1.symbol), _2) if _2 else Identifier(_1.lexeme, _1.symbol)",
+            ),
+            Alt((OPEN_PAREN, "_expression", CLOSE_PAREN), "Grouping(_2)"),
+        ), error="Expected an expression"),
+        Rule("_arguments", (
+            Alt((OPEN_PAREN, Rep("_expression", sep=COMMA), CLOSE_PAREN), "tuple(_2)"),
+        )),
+    ),
+)
+
+EXPRESSION_PARSER = Grammar(
+    module="pox._expression_parser",
+    header="""
+from pox import token_types as TT
+# imported from the bottom of pox.mutable_parse, which defines all of this
+from pox.mutable_parse import Binary, Grouping, Literal, Unary
+from pox.mutable_parse import _binary_operators, _unary_operators, expected, unexpected
+""",
+    rules=(
+        Operators(
+            "expression",
+            operand="primary",
+            inline=(NUMBER,),
+            binary="_binary_operators",
+            unary="_unary_operators",
+            prefix=(BANG, MINUS),
+            binary_action="Binary({left}, {op}, {right})",
+            unary_action="Unary({op}, {right})",
+        ),
+        Rule("primary", (
+            Alt((FALSE,), "Literal(TT.FALSE)"),
+            Alt((TRUE,), "Literal(TT.TRUE)"),
+            Alt((NULL,), "Literal(TT.NULL)"),
+            Alt((NUMBER,), "Literal(float(_1.lexeme))"),
+            Alt((STRING,), "Literal(_1.lexeme)"),
+            Alt((OPEN_PAREN, "expression", CLOSE_PAREN), "Grouping(_2)"),
+        ), error="Expect expression"),
+    ),
+)
+
+GRAMMARS = (POX_PARSER, EXPRESSION_PARSER)
+
+
+def path(grammar: Grammar) -> str:
+    import os
+    return os.path.join(os.path.dirname(__file__), grammar.module.rsplit('.', 1)[-1] + '.py')
+
+
+if __name__ == "__main__":
+    for grammar in GRAMMARS:
+        with open(path(grammar), 'w') as f:
+            f.write(generate(grammar))
+        print(f"wrote {path(grammar)}", file=sys.stderr)
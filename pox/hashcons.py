@@ -0,0 +1,111 @@
+from dataclasses import fields
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+from pox.func_parse import AST
+
+N = TypeVar('N', bound=AST)
+
+
+class _Consed:
+    # mixed into a subclass of each node type. nodes made by one factory
+    # are equal exactly when they are the same object, and their hash is
+    # worked out once from their children's cached hashes. comparisons
+    # against anything else fall back to comparing fields.
+    __slots__ = ()
+    _base: Type[AST]
+    _compare: Tuple[str, ...]
+    _hash: int
+
+    def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+        if isinstance(other, _Consed):
+            if other._base is not self._base or other._hash != self._hash:
+                return False
+        elif type(other) is not self._base:
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self._compare)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+
+# node type -> (its consed subclass, field names, positions of compared fields)
+_shapes: Dict[type, Tuple[type, Tuple[str, ...], Tuple[int, ...]]] = {}
+
+
+def _shape(cls: type) -> Tuple[type, Tuple[str, ...], Tuple[int, ...]]:
+    shape = _shapes.get(cls)
+    if shape is None:
+        all_fields = fields(cls)
+        namespace = {
+            '__slots__': ('_hash',),
+            '_base': cls,
+            '_compare': tuple(f.name for f in all_fields if f.compare),
+        }
+        consed = type(cls.__name__, (_Consed, cls), namespace)
+        compared = tuple(n for n, f in enumerate(all_fields) if f.compare)
+        shape = _shapes[cls] = _shapes[consed] = (consed, tuple(f.name for f in all_fields), compared)
+    return shape
+
+
+def _freeze(value: Any) -> Any:
+    # lists (Function.parameters) can't go in a key or a hash
+    return tuple(value) if type(value) is list else value
+
+
+class NodeFactory:
+    # hash-consing for one compilation: every structurally identical node
+    # is built once and shared. values in a key are compared like dict
+    # keys, so Literal(1.0) and Literal(1) are the same node.
+    def __init__(self) -> None:
+        self.nodes: Dict[Tuple[Any, ...], AST] = {}
+
+    def make(self, cls: Type[N], *args: Any) -> N:
+        # args are the node's fields in order, children already made here
+        key = (cls, *map(_freeze, args))
+        node = self.nodes.get(key)
+        if node is None:
+            consed, _, compared = _shape(cls)
+            node = consed(*args)
+            # the same hash a plain frozen dataclass would have
+            object.__setattr__(node, '_hash', hash(tuple(key[n + 1] for n in compared)))
+            self.nodes[key] = node
+        return node  # type: ignore
+
+    def intern(self, tree: N) -> N:
+        # rebuilds tree out of shared nodes, bottom up and without
+        # recursion so arbitrarily deep trees are fine
+        made: Dict[int, AST] = {}
+        # (node, None) on the way down, (node, its field values) on the way up
+        stack: List[Tuple[AST, Optional[List[Any]]]] = [(tree, None)]
+        while stack:
+            node, values = stack.pop()
+            if values is None:
+                if id(node) in made:
+                    continue
+                values = [getattr(node, name) for name in _shape(type(node))[1]]
+                stack.append((node, values))
+                for value in values:
+                    if isinstance(value, AST):
+                        stack.append((value, None))
+                    elif type(value) is tuple:
+                        stack.extend((x, None) for x in value if isinstance(x, AST))
+                continue
+            args = [
+                made[id(v)] if isinstance(v, AST)
+                else tuple(made[id(x)] if isinstance(x, AST) else x for x in v) if type(v) is tuple
+                else v
+                for v in values
+            ]
+            made[id(node)] = self.make(_shape(type(node))[0]._base, *args)
+        return made[id(tree)]  # type: ignore
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f"NodeFactory({len(self.nodes)} nodes)"
+
+
+__all__ = ["NodeFactory"]
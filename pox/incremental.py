@@ -0,0 +1,125 @@
+from typing import List, Optional
+
+from pox.func_parse import Program, Session, Statement, _run, _stmt
+from pox.symbols import SymbolTable
+from pox.tokenizer import EditableTokens, Edit, iter_tokens, relex
+
+# Keeps a parse up to date as its source is edited. After an edit the
+# tokens are relexed around it, then only the top-level statements the
+# changed tokens fall in are parsed again; every other statement is the
+# same object as before, so anything keyed on node identity stays valid.
+#
+# A top-level statement only looks at its own tokens and the one after
+# it (fun's optional ';'), so once a fresh parse ends where an old
+# statement started, past the changed tokens, the old statements from
+# there on would parse the same again and are kept.
+#
+# Like the tokens' offsets, the statements' token indices after the last
+# edit lag behind by a shared amount, only caught up when an edit needs
+# them, so an edit doesn't touch every statement after it.
+
+
+class IncrementalParse:
+    def __init__(self, src: str, symbols: Optional[SymbolTable] = None) -> None:
+        self.symbols = symbols
+        self.src = src
+        self.tokens = EditableTokens(iter_tokens(src, symbols))
+        # index of the first token of each top-level statement, less lag
+        # from the cut-th on
+        self.starts: List[int] = []
+        self._cut = 0
+        self._lag = 0
+        self.statements: List[Statement] = []
+        # how many statements the last parse or edit parsed
+        self.reparsed = 0
+        self.program: Optional[Program] = None
+        self._reparse(0, 0, 0)
+
+    def edit(self, edit: Edit) -> Program:
+        # applies edit to the source and returns the new program. raises
+        # like lex_and_parse if the new source doesn't parse; the next
+        # edit then parses the whole source again.
+        src = edit.apply(self.src)
+        count = len(self.tokens)
+        lo, hi = relex(self.tokens, src, edit, comments=False, symbols=self.symbols)
+        self.src = src
+        if self.program is None:
+            self.starts, self.statements = [], []
+            self._cut = self._lag = 0
+            self._reparse(0, 0, 0)
+            return self.program
+
+        shift = len(self.tokens) - count
+        # the statement holding the token before the edit might have ended
+        # differently, e.g. an inserted ';' after a fun's closing brace
+        first = max(self._statement_at(lo - 1), 0)
+        self._reparse(first, hi, shift)
+        return self.program
+
+    def _start(self, k: int) -> int:
+        return self.starts[k] + self._lag if k >= self._cut else self.starts[k]
+
+    def _statement_at(self, i: int) -> int:
+        # index of the last statement starting at or before token i
+        lo, hi = 0, len(self.starts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._start(mid) <= i:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def _move_cut(self, k: int) -> None:
+        starts, lag = self.starts, self._lag
+        for n in range(self._cut, k):
+            starts[n] += lag
+        for n in range(k, self._cut):
+            starts[n] -= lag
+        self._cut = k
+
+    def _reparse(self, first: int, hi: int, shift: int) -> None:
+        # parses statements from the first-th on until they line up with
+        # an old statement starting at or after token hi
+        old_count = len(self.starts)
+        start = self._start(first) if self.starts else 0
+        starts: List[int] = []
+        statements: List[Statement] = []
+        tokens = self.tokens
+        # no LineIndex, indexing the whole source on every edit would cost
+        # more than the parse; panic builds one if the edit doesn't parse
+        session = Session(src=self.src, tokens=tokens)
+
+        def parse(tokens: EditableTokens) -> int:
+            # the index of the first old statement that is kept
+            j = start
+            k = first
+            while tokens.has(j):
+                if j >= hi:
+                    while k < old_count and self._start(k) + shift < j:
+                        k += 1
+                    if k < old_count and self._start(k) + shift == j:
+                        return k
+                stmt, j_next = _stmt(tokens, j)
+                starts.append(j)
+                statements.append(stmt)
+                j = j_next
+            return old_count
+
+        try:
+            kept = _run(session, parse)
+        except Exception:
+            self.program = None
+            raise
+        self.reparsed = len(statements)
+        # the kept statements lag behind by shift more, the fresh ones are
+        # exact
+        self._move_cut(kept)
+        self.starts[first:kept] = starts
+        self.statements[first:kept] = statements
+        self._cut = first + len(starts)
+        self._lag += shift
+        self.program = Program(tuple(self.statements))
+
+
+__all__ = ["IncrementalParse"]
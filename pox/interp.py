@@ -0,0 +1,357 @@
+import sys
+from operator import add, mul, sub, truediv
+from types import FunctionType
+from typing import IO, Any, Callable, Dict, Optional, Sequence
+
+from pox.func_parse import (
+    AST,
+    Binary,
+    Block,
+    Call,
+    Function,
+    FunctionApply,
+    Grouping,
+    Identifier,
+    Literal,
+    Print,
+    Program,
+    Return,
+    Unary,
+    Value,
+    Var,
+    _node_type,
+    lex_and_parse,
+    logical_and,
+    logical_or,
+)
+
+# Runs pox trees. Every node is compiled once into a Python closure that
+# takes the environment to run in, so running a program is only calls
+# between closures: the dispatch on node type happens at compile time.
+#
+# Statements return _NEXT to carry on, or the value of a return that
+# unwinds the enclosing function. Names are looked up through a chain of
+# environments, one per call, that starts at the environment the function
+# was defined in.
+
+Code = Callable[['Environment'], Any]
+
+_NEXT = object()
+
+
+class InterpretError(RuntimeError):
+    pass
+
+
+# what an operator raises for values a program gives it, e.g. adding a
+# function to a number. only caught around the operators themselves, a
+# TypeError anywhere else is a bug here.
+_OPERAND_ERRORS = (TypeError, ZeroDivisionError)
+
+
+class Environment:
+    __slots__ = ("values", "enclosing")
+
+    def __init__(self, values: Optional[Dict[str, Any]] = None, enclosing: Optional['Environment'] = None) -> None:
+        self.values = values if values is not None else {}
+        self.enclosing = enclosing
+
+    def lookup(self, name: str) -> Any:
+        env: Optional[Environment] = self
+        while env is not None:
+            values = env.values
+            if name in values:
+                return values[name]
+            env = env.enclosing
+        raise InterpretError(f"Undefined name {name}")
+
+    def __repr__(self):
+        return f"Environment({sorted(self.values)})"
+
+
+class PoxFunction:
+    __slots__ = ("name", "parameters", "body", "closure")
+
+    def __init__(self, name: str, parameters: Sequence[str], body: Code, closure: Environment) -> None:
+        self.name = name
+        self.parameters = tuple(parameters)
+        self.body = body
+        self.closure = closure
+
+    def __call__(self, *arguments: Any) -> Any:
+        if len(arguments) != len(self.parameters):
+            raise InterpretError(f"{self.name} takes {len(self.parameters)} arguments, not {len(arguments)}")
+        result = self.body(Environment(dict(zip(self.parameters, arguments)), self.closure))
+        return None if result is _NEXT else result
+
+    def __repr__(self):
+        return f"<fn {self.name}>"
+
+
+def show(value: Any) -> str:
+    # how print writes a value
+    if value is True or value is False:
+        return "true" if value else "false"
+    if value is None:
+        return "nil"
+    if type(value) is float and value.is_integer():
+        return str(int(value))
+    if type(value) is FunctionType:
+        # a function pox.pycompile made
+        return f"<fn {value.__name__}>"
+    return str(value)
+
+
+class Compiler:
+    def __init__(self, out: Optional[IO[str]] = None) -> None:
+        self.out = out
+
+    def compile(self, node: AST) -> Code:
+        # node as a statement
+        return _STATEMENTS[_node_type(_STATEMENTS, node)](self, node)
+
+    def expression(self, node: AST) -> Code:
+        return _EXPRESSIONS[_node_type(_EXPRESSIONS, node)](self, node)
+
+    def _statements(self, statements: Sequence[AST]) -> Code:
+        code = tuple(self.compile(stmt) for stmt in statements)
+        if len(code) == 1:
+            return code[0]
+
+        def run(env: Environment) -> Any:
+            for stmt in code:
+                result = stmt(env)
+                if result is not _NEXT:
+                    return result
+            return _NEXT
+        return run
+
+    def _print(self, node: Print) -> Code:
+        expr = self.expression(node.expr)
+        out = self.out
+
+        def run(env: Environment) -> Any:
+            # sys.stdout is looked up per print, so redirecting it works
+            (out or sys.stdout).write(show(expr(env)) + "\n")
+            return _NEXT
+        return run
+
+    def _return(self, node: Return) -> Code:
+        # the value goes back up through the enclosing blocks
+        return self.expression(node.expr)
+
+    def _function(self, node: Function) -> Code:
+        name = node.name
+        parameters = node.parameters
+        body = self._statements(node.body.statements)
+
+        def run(env: Environment) -> Any:
+            env.values[name] = PoxFunction(name, parameters, body, env)
+            return _NEXT
+        return run
+
+    def _var(self, node: Var) -> Code:
+        name = node.symbol
+        referent = self.expression(node.referent)
+
+        def run(env: Environment) -> Any:
+            env.values[name] = referent(env)
+            return _NEXT
+        return run
+
+    def _expression_statement(self, expr: Code) -> Code:
+        def run(env: Environment) -> Any:
+            expr(env)
+            return _NEXT
+        return run
+
+    def _binary(self, node: Binary) -> Code:
+        op = node.operator
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        # and/or only run their right side when they need it
+        if op is logical_and:
+            return lambda env: left(env) and right(env)
+        if op is logical_or:
+            return lambda env: left(env) or right(env)
+        # the operands are worked out before the try, so only the
+        # operator's own errors are the program's
+        if isinstance(node.right, (Literal, Value)):
+            val = node.right.val
+            if op is add:
+                def add_constant(env: Environment) -> Any:
+                    a = left(env)
+                    try:
+                        return a + val
+                    except _OPERAND_ERRORS as e:
+                        raise InterpretError(str(e)) from e
+                return add_constant
+            if op is sub:
+                def sub_constant(env: Environment) -> Any:
+                    a = left(env)
+                    try:
+                        return a - val
+                    except _OPERAND_ERRORS as e:
+                        raise InterpretError(str(e)) from e
+                return sub_constant
+            if op is mul:
+                def mul_constant(env: Environment) -> Any:
+                    a = left(env)
+                    try:
+                        return a * val
+                    except _OPERAND_ERRORS as e:
+                        raise InterpretError(str(e)) from e
+                return mul_constant
+
+            def apply_constant(env: Environment) -> Any:
+                a = left(env)
+                try:
+                    return op(a, val)
+                except _OPERAND_ERRORS as e:
+                    raise InterpretError(str(e)) from e
+            return apply_constant
+        if op is add:
+            def add_(env: Environment) -> Any:
+                a = left(env)
+                b = right(env)
+                try:
+                    return a + b
+                except _OPERAND_ERRORS as e:
+                    raise InterpretError(str(e)) from e
+            return add_
+        if op is sub:
+            def sub_(env: Environment) -> Any:
+                a = left(env)
+                b = right(env)
+                try:
+                    return a - b
+                except _OPERAND_ERRORS as e:
+                    raise InterpretError(str(e)) from e
+            return sub_
+        if op is mul:
+            def mul_(env: Environment) -> Any:
+                a = left(env)
+                b = right(env)
+                try:
+                    return a * b
+                except _OPERAND_ERRORS as e:
+                    raise InterpretError(str(e)) from e
+            return mul_
+        if op is truediv:
+            def truediv_(env: Environment) -> Any:
+                a = left(env)
+                b = right(env)
+                try:
+                    return a / b
+                except _OPERAND_ERRORS as e:
+                    raise InterpretError(str(e)) from e
+            return truediv_
+
+        def apply(env: Environment) -> Any:
+            a = left(env)
+            b = right(env)
+            try:
+                return op(a, b)
+            except _OPERAND_ERRORS as e:
+                raise InterpretError(str(e)) from e
+        return apply
+
+    def _unary(self, node: Unary) -> Code:
+        op = node.operator
+        right = self.expression(node.right)
+
+        def run(env: Environment) -> Any:
+            a = right(env)
+            try:
+                return op(a)
+            except _OPERAND_ERRORS as e:
+                raise InterpretError(str(e)) from e
+        return run
+
+    def _literal(self, node: Any) -> Code:
+        val = node.val
+        return lambda env: val
+
+    def _identifier(self, node: Identifier) -> Code:
+        name = node.symbol
+
+        def run(env: Environment) -> Any:
+            # inlined Environment.lookup
+            while env is not None:
+                values = env.values
+                if name in values:
+                    return values[name]
+                env = env.enclosing
+            raise InterpretError(f"Undefined name {name}")
+        return run
+
+    def _call(self, callee: Code, arguments: Sequence[Code]) -> Code:
+        arguments = tuple(arguments)
+
+        def run(env: Environment) -> Any:
+            f = callee(env)
+            if type(f) is not PoxFunction:
+                raise InterpretError(f"Can't call {show(f)}")
+            parameters = f.parameters
+            if len(parameters) != len(arguments):
+                raise InterpretError(f"{f.name} takes {len(parameters)} arguments, not {len(arguments)}")
+            values = {name: argument(env) for name, argument in zip(parameters, arguments)}
+            result = f.body(Environment(values, f.closure))
+            return None if result is _NEXT else result
+        return run
+
+
+def _statement(compile: Callable[[Compiler, Any], Code]) -> Callable[[Compiler, Any], Code]:
+    # an expression used as a statement
+    return lambda compiler, node: compiler._expression_statement(compile(compiler, node))
+
+
+_EXPRESSIONS: Dict[type, Callable[[Compiler, Any], Code]] = {
+    Binary: Compiler._binary,
+    Unary: Compiler._unary,
+    Literal: Compiler._literal,
+    Value: Compiler._literal,
+    Grouping: lambda compiler, node: compiler.expression(node.expr),
+    Identifier: Compiler._identifier,
+    Call: lambda compiler, node: compiler._call(
+        compiler.expression(node.callee), [compiler.expression(a) for a in node.arguments]
+    ),
+    FunctionApply: lambda compiler, node: compiler._call(
+        compiler.expression(Identifier(node.f_name)), [compiler.expression(Identifier(a)) for a in node.arg_names]
+    ),
+}
+
+_STATEMENTS: Dict[type, Callable[[Compiler, Any], Code]] = {
+    Program: lambda compiler, node: compiler._statements(node.statements),
+    Block: lambda compiler, node: compiler._statements(node.statements),
+    Print: Compiler._print,
+    Return: Compiler._return,
+    Function: Compiler._function,
+    Var: Compiler._var,
+    **{t: _statement(f) for t, f in _EXPRESSIONS.items()},
+}
+
+
+def compile(program: AST, out: Optional[IO[str]] = None) -> Callable[[Optional[Environment]], Environment]:
+    # program compiled once, as a function running it in an environment,
+    # fresh by default, and returning that environment. print writes to
+    # out, or to sys.stdout.
+    code = Compiler(out).compile(program)
+
+    def run(env: Optional[Environment] = None) -> Environment:
+        if env is None:
+            env = Environment()
+        code(env)
+        return env
+    return run
+
+
+def run(program: AST, out: Optional[IO[str]] = None) -> Environment:
+    return compile(program, out)()
+
+
+def run_source(src: str, out: Optional[IO[str]] = None) -> Environment:
+    return run(lex_and_parse(src), out)
+
+
+__all__ = ["Compiler", "Environment", "InterpretError", "PoxFunction", "compile", "run", "run_source", "show"]
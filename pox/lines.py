@@ -0,0 +1,104 @@
+from array import array
+from bisect import bisect_right
+from typing import Callable, List, Optional, Tuple
+
+
+class LineIndex:
+    # character offset where every line starts, filled in as the source is
+    # lexed. for files the byte offsets are kept too, so a few lines can be
+    # read back without decoding everything in front of them.
+    def __init__(self) -> None:
+        self.starts = array('Q', [0])
+        self.byte_starts = array('Q', [0])
+
+    @classmethod
+    def from_source(cls, src: str) -> 'LineIndex':
+        index = cls()
+        index.feed(src, 0)
+        return index
+
+    def feed(self, text: str, base: int, data: Optional[bytes] = None, byte_base: int = 0) -> None:
+        starts = self.starts
+        find = text.find
+        i = find('\n')
+        while i != -1:
+            starts.append(base + i + 1)
+            i = find('\n', i + 1)
+
+        if data is not None:
+            byte_starts = self.byte_starts
+            find = data.find
+            i = find(b'\n')
+            while i != -1:
+                byte_starts.append(byte_base + i + 1)
+                i = find(b'\n', i + 1)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def line(self, offset: int) -> int:
+        # 0-based line containing offset
+        return bisect_right(self.starts, offset) - 1
+
+    def locate(self, offset: int) -> Tuple[int, int]:
+        # 1-based (line, column) for humans
+        line = self.line(offset)
+        return line + 1, offset - self.starts[line] + 1
+
+    def source_lines(self, src: str, first: int, last: int) -> List[str]:
+        starts = self.starts
+        lines = []
+        for n in range(first, last + 1):
+            end = starts[n + 1] - 1 if n + 1 < len(starts) else src.find('\n', starts[n])
+            lines.append(src[starts[n]:end if end != -1 else len(src)])
+        return lines
+
+    def file_lines(self, path: str, first: int, last: int, limit: int = 1 << 16) -> List[str]:
+        # lines past what has been indexed so far are read up to `limit` bytes
+        byte_starts = self.byte_starts
+        with open(path, 'rb') as f:
+            f.seek(byte_starts[first])
+            if last + 1 < len(byte_starts):
+                data = f.read(byte_starts[last + 1] - byte_starts[first] - 1)
+            else:
+                data = f.read(limit)
+        return data.decode('utf-8', 'replace').split('\n')[:last - first + 1]
+
+
+def render(
+    index: LineIndex,
+    read_lines: Callable[[int, int], List[str]],
+    start: int,
+    end: int,
+    context: int = 2,
+    width: int = 120,
+    highlight: Callable[[str], str] = lambda s: s,
+) -> str:
+    # a few numbered lines either side of [start, end), with the offending
+    # text highlighted and underlined. wide lines are cut down to `width`
+    # columns around the error.
+    line = index.line(start)
+    first = max(0, line - context)
+    last = min(len(index) - 1, line + context)
+    lines = read_lines(first, last)
+    last = first + len(lines) - 1
+
+    column = start - index.starts[line]
+    # tokens spanning several lines are only marked up to the line's end
+    length = max(1, min(end - start, len(lines[line - first]) - column, width))
+    left = max(0, column - width // 2)
+    gutter = len(str(last + 1))
+
+    out = [f"{' ' * gutter}--> line {line + 1}, column {column + 1}"]
+    for n, text in enumerate(lines, first):
+        clipped = text[left:left + width]
+        if n == line:
+            col = column - left
+            clipped = clipped[:col] + highlight(clipped[col:col + length]) + clipped[col + length:]
+        out.append(f"{n + 1:>{gutter}} | {clipped}")
+        if n == line:
+            out.append(f"{' ' * gutter} | {' ' * (column - left)}{'^' * length}")
+    return '\n'.join(out)
+
+
+__all__ = ["LineIndex", "render"]
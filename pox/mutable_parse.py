@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-from typing import Generic, TypeVar, Set, List
+from typing import AbstractSet, Dict, Generic, TypeVar, Set, List, Iterable, Tuple
 
-from pox.tokenizer import Token
+from pox.tokenizer import Token, TokenStream, TokenBuffer
 from pox import token_types as TT
 
 
@@ -32,32 +32,70 @@ class Grouping(AST):
     expr: AST
 
 
-class Parser:
-    def __init__(self, tokens: List[Token]) -> None:
-        self.tokens = tokens
-        self.current = 0
+# binding power of every binary operator, loosest first, and the lexeme
+# the tree gets for it
+BINARY_OPERATORS: Dict[TT.TokenType, Tuple[int, str]] = {
+    TT.BANG_EQUAL: (1, '!='),
+    TT.EQUAL_EQUAL: (1, '=='),
+    TT.GREATER: (2, '>'),
+    TT.GREATER_EQUAL: (2, '>='),
+    TT.LESS: (2, '<'),
+    TT.LESS_EQUAL: (2, '<='),
+    TT.MINUS: (3, '-'),
+    TT.PLUS: (3, '+'),
+    TT.SLASH: (4, '/'),
+    TT.STAR: (4, '*'),
+}
+
+UNARY_OPERATORS: Dict[TT.TokenType, str] = {
+    TT.BANG: '!',
+    TT.MINUS: '-',
+}
+
+_binary_operators = [BINARY_OPERATORS.get(t) for t in TT.TOKEN_TYPES]
+_unary_operators = [UNARY_OPERATORS.get(t) for t in TT.TOKEN_TYPES]
+
+_MESSAGES = {TT.CLOSE_PAREN: "Expect ')' after expression"}
 
-    def expression(self):
-        return self.equality()
 
-    def equality(self):
-        expr = self.comparison()
+def expected(tokens: TokenStream, i: int, token_type: TT.TokenType) -> None:
+    raise RuntimeError(_MESSAGES.get(token_type, f"Expect {token_type.name}"))
 
-        while self.match({TT.BANG_EQUAL, TT.EQUAL_EQUAL}):
-            operator = self.previous()
-            right = self.comparison()
-            expr = Binary(left=expr, op=operator.lexeme, right=right)
 
+def unexpected(tokens: TokenStream, i: int, msg: str) -> None:
+    raise RuntimeError(msg)
+
+
+class Parser:
+    # the rules themselves are generated from pox.grammar.EXPRESSION_PARSER,
+    # see pox._expression_parser. the parser only keeps the position.
+    def __init__(self, tokens: Iterable[Token]) -> None:
+        if not isinstance(tokens, (TokenStream, TokenBuffer)):
+            tokens = TokenStream(tokens)
+        self.tokens = tokens
+        self.current = 0
+        # a buffer has its own copy of the rules, which read its kinds array
+        self._in_buffer = isinstance(tokens, TokenBuffer)
+
+    def expression(self) -> AST:
+        rule = _rules.expression_in_buffer if self._in_buffer else _rules.expression
+        expr, self.current = rule(self.tokens, self.current)
         return expr
 
+    def primary(self) -> AST:
+        rule = _rules.primary_in_buffer if self._in_buffer else _rules.primary
+        expr, self.current = rule(self.tokens, self.current)
+        return expr
 
-    def match(self, token_types: Set[TT.TokenType]) -> bool:
-        for token_type in token_types:
-            if self.check(token_type):
-                self.advance()
-                return True
+    def match(self, token_types: AbstractSet[TT.TokenType]) -> bool:
+        if self.check_any(token_types):
+            self.advance()
+            return True
         return False
 
+    def check_any(self, token_types: AbstractSet[TT.TokenType]) -> bool:
+        return (not self.is_at_end()) and self.peek().token_type in token_types
+
     def check(self, token_type: TT.TokenType) -> bool:
         return (not self.is_at_end()) and (self.peek().token_type == token_type)
 
@@ -73,67 +111,30 @@ class Parser:
         return self.tokens[self.current - 1]
 
     def is_at_end(self) -> bool:
-        return self.current >= len(self.tokens)
-
-    def comparison(self):
-        expr = self.addition()
-        while self.match({TT.GREATER, TT.GREATER_EQUAL, TT.LESS, TT.LESS_EQUAL}):
-            operator = self.previous()
-            right = self.addition()
-            expr = Binary(expr, operator.lexeme, right)
-        return expr
-
-    def addition(self):
-        expr = self.multiplication()
-        while self.match({TT.MINUS, TT.PLUS}):
-            operator = self.previous()
-            right = self.multiplication()
-            expr = Binary(expr, operator.lexeme, right)
-        return expr
-
-    def multiplication(self):
-        expr = self.unary()
-        while self.match({TT.SLASH, TT.STAR}):
-            operator = self.previous()
-            right = self.unary()
-            expr = Binary(expr, operator.lexeme, right)
-        return expr
-
-    def unary(self):
-        if self.match({TT.BANG, TT.MINUS}):
-            operator = self.previous()
-            right = self.unary()
-            return Unary(operator.lexeme, right)
-        else:
-            return self.primary()
-
-    def primary(self):
-        if self.match({TT.FALSE}): return Literal(TT.FALSE)
-        if self.match({TT.TRUE}): return Literal(TT.TRUE)
-        if self.match({TT.NULL}): return Literal(TT.NULL)
-        if self.match({TT.NUMBER}): return Literal(float(self.previous().lexeme))
-        if self.match({TT.STRING}): return Literal(self.previous().lexeme)
-        if self.match({TT.OPEN_PAREN}):
-            expr = self.expression()
-            self.consume(TT.CLOSE_PAREN, "Expect ')' after expression")
-            return Grouping(expr)
+        return not self.tokens.has(self.current)
 
     def consume(self, token_type: TT.TokenType, msg: str):
         if not self.match({token_type}):
             raise RuntimeError(msg)
 
-    def parse(self):
+    def parse(self) -> AST:
         return self.expression()
 
 
-from pox.tokenizer import tokenize
+# generated from the grammar in pox.grammar, after everything it uses. as a
+# module rather than its functions, so this also runs as a script.
+from pox import _expression_parser as _rules  # noqa: E402
+
+
+if __name__ == "__main__":
+    from pox.tokenizer import tokenize
 
-src = "42 * (7 + 3)"
+    src = "42 * (7 + 3)"
 
-tokens = tokenize(src)
+    tokens = tokenize(src)
 
-parser = Parser(tokens)
+    parser = Parser(tokens)
 
-ast = parser.parse()
+    ast = parser.parse()
 
-print(repr(ast))
+    print(repr(ast))
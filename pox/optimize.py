@@ -0,0 +1,180 @@
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Callable, List, Sequence, Tuple
+
+from pox.func_parse import (
+    AST,
+    Binary,
+    Block,
+    Call,
+    Function,
+    FunctionApply,
+    Grouping,
+    Identifier,
+    Literal,
+    Print,
+    Program,
+    Return,
+    Unary,
+    Value,
+    Var,
+    _node_type,
+    logical_and,
+    logical_or,
+)
+
+# Passes that rewrite pox trees into cheaper trees that do the same thing.
+# Each pass takes a tree and the PassStats to count its changes in, and
+# returns the new tree; nodes it doesn't change are reused, not copied.
+# Rewritten nodes are plain nodes, even in a tree from a NodeFactory.
+
+_TYPES = {t: t for t in (
+    Program, Block, Function, FunctionApply, Print, Return, Binary, Unary, Grouping, Identifier, Literal, Var, Value, Call,
+)}
+
+
+@dataclass
+class PassStats:
+    name: str
+    # nodes the pass replaced or removed
+    changes: int = 0
+    nodes_before: int = 0
+    nodes_after: int = 0
+    seconds: float = 0.0
+
+
+def _children(node: AST) -> List[AST]:
+    children = []
+    for f in fields(node):
+        value = getattr(node, f.name)
+        if isinstance(value, AST):
+            children.append(value)
+        elif type(value) is tuple:
+            children.extend(v for v in value if isinstance(v, AST))
+    return children
+
+
+def count(node: AST) -> int:
+    # nodes in a tree, shared subtrees counted every time they appear
+    return 1 + sum(count(child) for child in _children(node))
+
+
+def _map(node: AST, f: Callable[[AST], AST]) -> AST:
+    # node with f applied to each child, or node itself if f changed none
+    changed = False
+    values = {}
+    for field in fields(node):
+        value = getattr(node, field.name)
+        if isinstance(value, AST):
+            new = f(value)
+            changed |= new is not value
+            value = new
+        elif type(value) is tuple and value and isinstance(value[0], AST):
+            new = tuple(map(f, value))
+            changed |= any(a is not b for a, b in zip(new, value))
+            value = new
+        values[field.name] = value
+    if not changed:
+        return node
+    return _node_type(_TYPES, node)(**values)
+
+
+def _constant(node: AST) -> bool:
+    return isinstance(node, (Literal, Value)) and type(node.val) is float
+
+
+def fold(node: AST, stats: PassStats) -> AST:
+    # evaluates operators whose operands are known. only results that are
+    # floats are kept, which is all a literal holds when it comes from the
+    # parser; anything that would raise is left to raise when it runs.
+    node = _map(node, lambda child: fold(child, stats))
+    if isinstance(node, Binary):
+        left, right, op = node.left, node.right, node.operator
+        if _constant(left) and (op is logical_and or op is logical_or):
+            # the right side only runs if the left side lets it
+            stats.changes += 1
+            return right if bool(left.val) == (op is logical_and) else left
+        if _constant(left) and _constant(right):
+            return _result(node, stats, op, left.val, right.val)
+    elif isinstance(node, Unary) and _constant(node.right):
+        return _result(node, stats, node.operator, node.right.val)
+    elif isinstance(node, Grouping) and _constant(node.expr):
+        stats.changes += 1
+        return node.expr
+    return node
+
+
+def _result(node: AST, stats: PassStats, op: Callable[..., Any], *operands: float) -> AST:
+    try:
+        val = op(*operands)
+    except (ArithmeticError, TypeError):
+        return node
+    if type(val) is not float:
+        return node
+    stats.changes += 1
+    return Literal(val)
+
+
+def ungroup(node: AST, stats: PassStats) -> AST:
+    # the tree already says what binds to what, the parentheses are gone
+    while isinstance(node, Grouping):
+        stats.changes += 1
+        node = node.expr
+    return _map(node, lambda child: ungroup(child, stats))
+
+
+def _returns(stmt: AST) -> bool:
+    # whether running stmt always ends in a return
+    if isinstance(stmt, Return):
+        return True
+    if isinstance(stmt, Block):
+        return any(_returns(s) for s in stmt.statements)
+    return False
+
+
+def dead_code(node: AST, stats: PassStats) -> AST:
+    # drops the statements after a return in the same block
+    if isinstance(node, (Program, Block)):
+        statements = node.statements
+        for n, stmt in enumerate(statements):
+            if _returns(stmt):
+                stats.changes += sum(count(s) for s in statements[n + 1:])
+                statements = statements[:n + 1]
+                break
+        kept = tuple(dead_code(stmt, stats) for stmt in statements)
+        if len(kept) == len(node.statements) and all(a is b for a, b in zip(kept, node.statements)):
+            return node
+        return _node_type(_TYPES, node)(kept)
+    if isinstance(node, Function):
+        return _map(node, lambda child: dead_code(child, stats))
+    # expressions hold no statements
+    return node
+
+
+Pass = Callable[[AST, PassStats], AST]
+
+PASSES: Tuple[Tuple[str, Pass], ...] = (("fold", fold), ("ungroup", ungroup), ("dead_code", dead_code))
+
+
+def optimize(program: AST, passes: Sequence[Tuple[str, Pass]] = PASSES) -> Tuple[AST, List[PassStats]]:
+    # runs passes over program in order, returns the result and each pass's stats
+    report = []
+    size = count(program)
+    for name, run in passes:
+        stats = PassStats(name, nodes_before=size)
+        start = time.perf_counter()
+        program = run(program, stats)
+        stats.seconds = time.perf_counter() - start
+        size = stats.nodes_after = count(program)
+        report.append(stats)
+    return program, report
+
+
+def summary(report: Sequence[PassStats]) -> str:
+    return "\n".join(
+        f"{s.name:<12} {s.changes:>6} changes {s.nodes_before:>8} -> {s.nodes_after:<8} nodes {s.seconds * 1e3:8.2f}ms"
+        for s in report
+    )
+
+
+__all__ = ["PASSES", "PassStats", "count", "dead_code", "fold", "optimize", "summary", "ungroup"]
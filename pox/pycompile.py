@@ -0,0 +1,369 @@
+import ast
+import linecache
+from collections import OrderedDict
+from hashlib import sha256
+from operator import add, and_, eq, ge, gt, le, lt, mul, ne, neg, not_, or_, sub, truediv, xor
+from types import CodeType
+from typing import IO, Any, Callable, Dict, List, Optional, Sequence, Set
+
+from pox.func_parse import (
+    AST,
+    PARSER_VERSION,
+    Binary,
+    Block,
+    Call,
+    Function,
+    FunctionApply,
+    Grouping,
+    Identifier,
+    Literal,
+    Print,
+    Program,
+    Return,
+    Session,
+    Unary,
+    Value,
+    Var,
+    _node_type,
+    lex_and_parse,
+    logical_and,
+    logical_or,
+)
+from pox.interp import _OPERAND_ERRORS, InterpretError, show
+from pox.lines import LineIndex
+
+# Lowers pox trees to Python's own ast and compiles them with compile(),
+# so pox functions become real Python functions running as CPython
+# bytecode. The program becomes a function too, __pox_main__, with the
+# names it defines declared global, so a top-level return works the way
+# it does in pox.interp. Statements carry the line they came from when
+# their positions are known, which tracebacks then show.
+#
+# A name a pox function defines is only there once its statement has run;
+# before that, pox.interp finds the name in the enclosing scopes. Python
+# would make it local to the whole function, so where a use might run
+# before the definition, the function's binding gets a name of its own,
+# starts out as __pox_unbound__ and the use falls back to the next
+# binding outwards while it still is.
+
+_BINARY = {
+    add: ast.Add, sub: ast.Sub, mul: ast.Mult, truediv: ast.Div, and_: ast.BitAnd, or_: ast.BitOr, xor: ast.BitXor,
+}
+_COMPARE = {eq: ast.Eq, ne: ast.NotEq, lt: ast.Lt, le: ast.LtE, gt: ast.Gt, ge: ast.GtE}
+_UNARY = {neg: ast.USub, not_: ast.Not}
+
+_MAIN = '__pox_main__'
+_PRINT = '__pox_print__'
+_UNBOUND = '__pox_unbound__'
+
+# pox identifiers Python's ast can't name
+_RESERVED = {'None', 'True', 'False', _MAIN, _PRINT, _UNBOUND}
+
+
+def _name(name: str) -> str:
+    # no pox identifier has a '$' in it, so this can't clash
+    return name + '$' if name in _RESERVED else name
+
+
+def _pox_name(name: str) -> str:
+    # the pox name behind a Python one
+    return name.split('$', 1)[0]
+
+
+def _defined(statements: Sequence[AST]) -> List[str]:
+    # names a list of statements binds, in order
+    names = []
+    for stmt in statements:
+        if isinstance(stmt, Function):
+            names.append(_name(stmt.name))
+        elif isinstance(stmt, Var):
+            names.append(_name(stmt.symbol))
+    return list(dict.fromkeys(names))
+
+
+class _Scope:
+    # a pox function being lowered. names are Python names, as _name makes
+    # them; nodes holds every ast node naming one of the function's own
+    # bindings, so it can be renamed once the whole function is lowered.
+    def __init__(self, depth: int, parameters: Sequence[str], statements: Sequence[AST]) -> None:
+        self.depth = depth
+        self.parameters = {_name(p) for p in parameters}
+        self.defined = set(_defined(statements)) - self.parameters
+        # defined names whose statements have been lowered
+        self.bound: Set[str] = set()
+        # defined names some use might find not there yet
+        self.unbound: Set[str] = set()
+        self.nodes: Dict[str, List[Any]] = {}
+
+    def name(self, name: str, ctx: ast.expr_context) -> ast.Name:
+        node = ast.Name(name, ctx)
+        self.nodes.setdefault(name, []).append(node)
+        return node
+
+    def rename(self, body: List[ast.stmt]) -> None:
+        # gives the bindings in unbound names of their own in body
+        for name in sorted(self.unbound):
+            new = f"{name}${self.depth}"
+            for node in self.nodes[name]:
+                if isinstance(node, ast.FunctionDef):
+                    node.name = new
+                else:
+                    node.id = new
+            body.insert(0, ast.Assign([ast.Name(new, ast.Store())], ast.Name(_UNBOUND, ast.Load())))
+        for n in reversed(range(len(body))):
+            stmt = body[n]
+            if isinstance(stmt, ast.FunctionDef) and '$' in stmt.name:
+                # what show prints for it
+                attribute = ast.Attribute(ast.Name(stmt.name, ast.Load()), '__name__', ast.Store())
+                body.insert(n + 1, ast.Assign([attribute], ast.Constant(_pox_name(stmt.name))))
+
+
+class _Lowering:
+    def __init__(self, positions: Optional[Dict[int, int]], lines: Optional[LineIndex]) -> None:
+        self.positions = positions
+        self.lines = lines
+        self.line = 1
+        # the functions around what is being lowered, innermost last; the
+        # program's names are globals and need none
+        self.scopes: List[_Scope] = []
+
+    def statements(self, statements: Sequence[AST]) -> List[ast.stmt]:
+        return [self.statement(stmt) for stmt in statements] or [ast.Pass()]
+
+    def statement(self, node: AST) -> ast.stmt:
+        line = self.line
+        if self.positions is not None and self.lines is not None:
+            offset = self.positions.get(id(node))
+            if offset is not None:
+                line = self.lines.line(offset) + 1
+        self.line = line
+        stmt = _STATEMENTS[_node_type(_STATEMENTS, node)](self, node)
+        stmt.lineno = stmt.end_lineno = line
+        stmt.col_offset = stmt.end_col_offset = 0
+        return stmt
+
+    def expression(self, node: AST) -> ast.expr:
+        return _EXPRESSIONS[_node_type(_EXPRESSIONS, node)](self, node)
+
+    def load(self, name: str) -> ast.expr:
+        # the innermost binding of name that is there when this runs
+        name = _name(name)
+        expr: ast.expr = ast.Name(name, ast.Load())
+        maybe = []
+        for scope in reversed(self.scopes):
+            if name in scope.parameters:
+                break
+            if name in scope.defined:
+                if name in scope.bound:
+                    expr = scope.name(name, ast.Load())
+                    break
+                scope.unbound.add(name)
+                maybe.append(scope)
+        for scope in reversed(maybe):
+            there = ast.Compare(scope.name(name, ast.Load()), [ast.IsNot()], [ast.Name(_UNBOUND, ast.Load())])
+            expr = ast.IfExp(there, scope.name(name, ast.Load()), expr)
+        return expr
+
+    def store(self, name: str) -> ast.Name:
+        # name as a target; the binding is there from the next statement
+        name = _name(name)
+        if not self.scopes or name not in self.scopes[-1].defined:
+            return ast.Name(name, ast.Store())
+        scope = self.scopes[-1]
+        scope.bound.add(name)
+        return scope.name(name, ast.Store())
+
+    def assign(self, node: Var) -> ast.stmt:
+        value = self.expression(node.referent)
+        return ast.Assign([self.store(node.symbol)], value)
+
+    def define(self, node: Function) -> ast.FunctionDef:
+        # the function's name is there before its body can run
+        target = self.store(node.name)
+        scope = _Scope(len(self.scopes) + 1, node.parameters, node.body.statements)
+        self.scopes.append(scope)
+        try:
+            f = self.function(target.id, node.parameters, node.body.statements)
+        finally:
+            self.scopes.pop()
+        scope.rename(f.body)
+        if self.scopes:
+            # rename the def itself, not the name store made for it
+            nodes = self.scopes[-1].nodes.get(target.id, [])
+            nodes[:] = [f if n is target else n for n in nodes]
+        return f
+
+    def function(self, name: str, parameters: Sequence[str], statements: Sequence[AST]) -> ast.FunctionDef:
+        body = self.statements(statements)
+        return ast.FunctionDef(
+            name=name,
+            args=ast.arguments(
+                posonlyargs=[], args=[ast.arg(_name(p)) for p in parameters], kwonlyargs=[], kw_defaults=[], defaults=[]
+            ),
+            body=body,
+            decorator_list=[],
+            returns=None,
+            type_comment=None,
+        )
+
+    def binary(self, node: Binary) -> ast.expr:
+        op = node.operator
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        if op is logical_and or op is logical_or:
+            return ast.BoolOp(ast.And() if op is logical_and else ast.Or(), [left, right])
+        if op in _COMPARE:
+            # never chained, (a < b) < c stays as it was written
+            return ast.Compare(left, [_COMPARE[op]()], [right])
+        if op in _BINARY:
+            return ast.BinOp(left, _BINARY[op](), right)
+        raise TypeError(f"no Python operator for {op!r}")
+
+    def unary(self, node: Unary) -> ast.expr:
+        if node.operator not in _UNARY:
+            raise TypeError(f"no Python operator for {node.operator!r}")
+        return ast.UnaryOp(_UNARY[node.operator](), self.expression(node.right))
+
+
+_EXPRESSIONS: Dict[type, Callable[[_Lowering, Any], ast.expr]] = {
+    Binary: _Lowering.binary,
+    Unary: _Lowering.unary,
+    Literal: lambda low, node: ast.Constant(node.val),
+    Value: lambda low, node: ast.Constant(node.val),
+    Grouping: lambda low, node: low.expression(node.expr),
+    Identifier: lambda low, node: low.load(node.symbol),
+    Call: lambda low, node: ast.Call(low.expression(node.callee), [low.expression(a) for a in node.arguments], []),
+    FunctionApply: lambda low, node: ast.Call(low.load(node.f_name), [low.load(a) for a in node.arg_names], []),
+}
+
+_STATEMENTS: Dict[type, Callable[[_Lowering, Any], ast.stmt]] = {
+    **{t: (lambda low, node: ast.Expr(low.expression(node))) for t in _EXPRESSIONS},
+    Print: lambda low, node: ast.Expr(ast.Call(ast.Name(_PRINT, ast.Load()), [low.expression(node.expr)], [])),
+    Return: lambda low, node: ast.Return(low.expression(node.expr)),
+    Function: _Lowering.define,
+    Var: _Lowering.assign,
+}
+
+
+def lower(
+    program: AST, positions: Optional[Dict[int, int]] = None, lines: Optional[LineIndex] = None
+) -> ast.Module:
+    # the Python module for program. positions and lines, as a parse with
+    # Session(positions={}) leaves them, give statements their pox lines.
+    statements = program.statements if isinstance(program, (Program, Block)) else (program,)
+    low = _Lowering(positions, lines)
+    main = low.function(_MAIN, (), statements)
+    defined = _defined(statements)
+    if defined:
+        main.body.insert(0, ast.Global(defined))
+    module = ast.Module([main], type_ignores=[])
+    return ast.fix_missing_locations(module)
+
+
+# what a function's binding holds before its statement has run
+_unbound = object()
+
+
+def _codes(code: CodeType) -> Set[CodeType]:
+    # code and the code of every function defined in it
+    codes = {code}
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            codes |= _codes(const)
+    return codes
+
+
+def _raised_in(e: BaseException, codes: Set[CodeType]) -> bool:
+    # whether the innermost frame e went through runs one of codes. an
+    # operator or a call that fails in C leaves no frame of its own, so
+    # that is the frame of the pox code using it.
+    tb = e.__traceback__
+    if tb is None:
+        return False
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    return tb.tb_frame.f_code in codes
+
+
+class PyProgram:
+    # a pox program as a Python code object, ready to run any number of times
+    def __init__(self, code: CodeType, filename: str) -> None:
+        self.code = code
+        self.filename = filename
+
+    def run(self, env: Optional[Dict[str, Any]] = None, out: Optional[IO[str]] = None) -> Dict[str, Any]:
+        # runs the program with env's names defined, a fresh namespace by
+        # default, and returns the namespace. print writes to out, or to
+        # sys.stdout.
+        import sys
+        namespace: Dict[str, Any] = {'__builtins__': {}}
+        if env is not None:
+            namespace.update({_name(k): v for k, v in env.items()})
+
+        def print_(value: Any) -> None:
+            (out or sys.stdout).write(show(value) + "\n")
+
+        namespace[_PRINT] = print_
+        namespace[_UNBOUND] = _unbound
+        exec(self.code, namespace)
+        try:
+            namespace[_MAIN]()
+        except NameError as e:
+            # only globals can be missing, the lowering keeps every local
+            # bound before it is used
+            name = getattr(e, 'name', None)
+            raise InterpretError(f"Undefined name {_pox_name(name)}" if name else str(e)) from e
+        except _OPERAND_ERRORS as e:
+            # e.g. adding a function to a number, or calling one with the
+            # wrong number of arguments. only what fails in the program's
+            # own operators and calls is its fault, a TypeError from print
+            # or anything else of ours is a bug here.
+            if not _raised_in(e, _codes(self.code)):
+                raise
+            raise InterpretError(str(e)) from e
+        for name in ('__builtins__', _PRINT, _UNBOUND, _MAIN):
+            del namespace[name]
+        return namespace
+
+    def __repr__(self):
+        return f"PyProgram({self.filename!r})"
+
+
+def compile_program(
+    program: AST,
+    filename: str = '<pox>',
+    positions: Optional[Dict[int, int]] = None,
+    lines: Optional[LineIndex] = None,
+) -> PyProgram:
+    return PyProgram(compile(lower(program, positions, lines), filename, 'exec'), filename)
+
+
+# compiled programs by a hash of their source, least recently used first
+_cache: 'OrderedDict[str, PyProgram]' = OrderedDict()
+MAX_CACHED = 128
+
+
+def compile_source(src: str, filename: str = '<pox>') -> PyProgram:
+    # parses and compiles src, or returns what the same source compiled to
+    # before. tracebacks show the pox source even when it isn't a file.
+    digest = sha256(f"pox {PARSER_VERSION} {filename}\0".encode())
+    digest.update(src.encode('utf-8', 'surrogatepass'))
+    key = digest.hexdigest()
+    compiled = _cache.get(key)
+    if compiled is not None:
+        _cache.move_to_end(key)
+    else:
+        session = Session(positions={})
+        program = lex_and_parse(src, session=session)
+        compiled = compile_program(program, filename, session.positions, session.lines)
+        _cache[key] = compiled
+        if len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    if filename.startswith('<'):
+        # what linecache would have read from a real file. another source
+        # compiled under the same name since may have replaced it.
+        linecache.cache[filename] = (len(src), None, src.splitlines(True), filename)
+    return compiled
+
+
+__all__ = ["PyProgram", "compile_program", "compile_source", "lower"]
@@ -0,0 +1,211 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from pox.func_parse import (
+    AST,
+    Binary,
+    Block,
+    Call,
+    Function,
+    FunctionApply,
+    Grouping,
+    Identifier,
+    Literal,
+    Print,
+    Program,
+    Return,
+    Unary,
+    Value,
+    Var,
+    _node_type,
+)
+
+# Works out, before anything runs, where each name in a program lives, so
+# an executor can keep each call's variables in a list instead of a dict.
+#
+# A scope is the program or one function. Its slots are its parameters,
+# then every name it defines, in the order they first appear; blocks don't
+# make scopes of their own, as in pox.interp. A name's address is a pair
+# (depth, slot): depth counts scopes outwards from the one the name is
+# used in, 0 is that scope itself.
+#
+# A function's slot for a name it defines is empty until the definition
+# has run, and until then pox.interp finds the name further out. A use
+# that runs before the definition in the same function gets the outer
+# address. A use in a nested function defined before it can run either
+# side of the definition: it gets the function's slot, and its fallbacks
+# are the addresses to try, in order, while that slot is still empty.
+#
+# The results are kept in a Resolution by id() of the nodes, the tree
+# itself stays as the parser made it.
+
+Address = Tuple[int, int]
+
+
+class ResolveError(RuntimeError):
+    def __init__(self, errors: Sequence[str]) -> None:
+        super().__init__("\n".join(errors))
+        self.errors = list(errors)
+
+
+class Resolution:
+    def __init__(self, program: AST) -> None:
+        # the ids below are only good while the tree is alive
+        self.program = program
+        # id(Identifier) -> address, id(FunctionApply) -> one address per
+        # name, the function's first
+        self.addresses: Dict[int, Any] = {}
+        # id(Program or Function) -> the names of its slots
+        self.slots: Dict[int, Tuple[str, ...]] = {}
+        # id(Identifier) -> addresses, id(FunctionApply) -> addresses per
+        # name, for uses whose slot might still be empty when they run
+        self.fallbacks: Dict[int, Any] = {}
+
+    def address(self, node: AST) -> Any:
+        return self.addresses[id(node)]
+
+    def frame(self, scope: AST) -> Tuple[str, ...]:
+        return self.slots[id(scope)]
+
+    def fallback(self, node: AST) -> Any:
+        # () for an Identifier, or a tuple of them for a FunctionApply, if
+        # the address is always filled when node runs
+        return self.fallbacks.get(id(node), ())
+
+
+def _defines(statements: Iterable[AST]) -> List[str]:
+    # names assigned directly in statements, including inside blocks
+    names = []
+    for stmt in statements:
+        if isinstance(stmt, Function):
+            names.append(stmt.name)
+        elif isinstance(stmt, Var):
+            names.append(stmt.symbol)
+        elif isinstance(stmt, Block):
+            names.extend(_defines(stmt.statements))
+    return names
+
+
+class _Scope:
+    __slots__ = ("name", "slots", "bound")
+
+    def __init__(self, name: str, slots: Dict[str, int], bound: Set[str]) -> None:
+        self.name = name
+        self.slots = slots
+        # names whose slots are filled by the statements visited so far
+        self.bound = bound
+
+
+class _Resolver:
+    def __init__(self, resolution: Resolution) -> None:
+        self.resolution = resolution
+        # innermost scope last
+        self.scopes: List[_Scope] = []
+        self.errors: List[str] = []
+
+    def scope(
+        self, node: AST, name: str, parameters: Sequence[str], statements: Sequence[AST], program: bool = False
+    ) -> None:
+        slots: Dict[str, int] = {}
+        for p in parameters:
+            if p in slots:
+                self.errors.append(f"{name} has two parameters named {p}")
+            slots.setdefault(p, len(slots))
+        for defined in _defines(statements):
+            slots.setdefault(defined, len(slots))
+        self.resolution.slots[id(node)] = tuple(slots)
+        # the program's names have nowhere further out to be found, a use
+        # before the definition is an error whichever slot it reads
+        self.scopes.append(_Scope(name, slots, set(slots) if program else set(parameters)))
+        for stmt in statements:
+            self.visit(stmt)
+        self.scopes.pop()
+
+    def lookup(self, name: str) -> Tuple[Optional[Address], Tuple[Address, ...]]:
+        # the address of name where it is used, and its fallbacks
+        found: List[Address] = []
+        innermost = len(self.scopes) - 1
+        for depth, scope in enumerate(reversed(self.scopes)):
+            slot = scope.slots.get(name)
+            if slot is None:
+                continue
+            if name in scope.bound:
+                found.append((depth, slot))
+                break
+            # only a nested function can run once the slot is filled
+            if depth > 0:
+                found.append((depth, slot))
+        if not found:
+            self.errors.append(f"Undefined name {name} in {self.scopes[innermost].name}")
+            return None, ()
+        return found[0], tuple(found[1:])
+
+    def bind(self, name: str) -> None:
+        self.scopes[-1].bound.add(name)
+
+    def record(self, node: AST, address: Any) -> None:
+        addresses = self.resolution.addresses
+        seen = addresses.setdefault(id(node), address)
+        if seen != address:
+            # one node in two places, as a NodeFactory shares them
+            self.errors.append(f"{node!r} is shared between scopes where it means different things")
+
+    def visit(self, node: AST) -> None:
+        _VISITS[_node_type(_VISITS, node)](self, node)
+
+    def identifier(self, node: Identifier) -> None:
+        address, fallbacks = self.lookup(node.symbol)
+        if address is not None:
+            self.record(node, address)
+            if fallbacks:
+                self.resolution.fallbacks[id(node)] = fallbacks
+
+    def apply(self, node: FunctionApply) -> None:
+        found = [self.lookup(name) for name in (node.f_name, *node.arg_names)]
+        addresses = tuple(address for address, _ in found)
+        if None not in addresses:
+            self.record(node, addresses)
+            if any(fallbacks for _, fallbacks in found):
+                self.resolution.fallbacks[id(node)] = tuple(fallbacks for _, fallbacks in found)
+
+    def function(self, node: Function) -> None:
+        # the name is filled in before the body can run
+        self.bind(node.name)
+        self.scope(node, node.name, node.parameters, node.body.statements)
+
+    def var(self, node: Var) -> None:
+        self.visit(node.referent)
+        self.bind(node.symbol)
+
+
+_VISITS: Dict[type, Any] = {
+    Program: lambda r, node: r.scope(node, '<program>', (), node.statements, program=True),
+    Block: lambda r, node: [r.visit(stmt) for stmt in node.statements],
+    Function: _Resolver.function,
+    Print: lambda r, node: r.visit(node.expr),
+    Return: lambda r, node: r.visit(node.expr),
+    Grouping: lambda r, node: r.visit(node.expr),
+    Var: _Resolver.var,
+    Binary: lambda r, node: (r.visit(node.left), r.visit(node.right)),
+    Unary: lambda r, node: r.visit(node.right),
+    Call: lambda r, node: [r.visit(child) for child in (node.callee, *node.arguments)],
+    Identifier: _Resolver.identifier,
+    FunctionApply: _Resolver.apply,
+    Literal: lambda r, node: None,
+    Value: lambda r, node: None,
+}
+
+
+def resolve(program: AST, predefined: Sequence[str] = ()) -> Resolution:
+    # addresses for every name in program. predefined names are the first
+    # slots of the program's scope, for environments that start out with
+    # values in them. raises ResolveError listing every undefined name.
+    resolution = Resolution(program)
+    resolver = _Resolver(resolution)
+    statements = program.statements if isinstance(program, (Program, Block)) else (program,)
+    resolver.scope(program, '<program>', predefined, statements, program=True)
+    if resolver.errors:
+        raise ResolveError(list(dict.fromkeys(resolver.errors)))
+    return resolution
+
+
+__all__ = ["Address", "Resolution", "ResolveError", "resolve"]
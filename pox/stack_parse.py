@@ -0,0 +1,315 @@
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+from pox.func_parse import (
+    AST,
+    Binary,
+    Block,
+    Call,
+    Expr,
+    Function,
+    Grouping,
+    Identifier,
+    Literal,
+    Print,
+    Program,
+    Return,
+    Statement,
+    Unary,
+    _binary_operators,
+    _unary_operators,
+    _session,
+    expected,
+    panic,
+    parsed_statement,
+)
+from pox.token_types import (
+    CLOSE_BRACE,
+    CLOSE_PAREN,
+    COMMA,
+    FUN,
+    IDENTIFIER,
+    NUMBER,
+    OPEN_BRACE,
+    OPEN_PAREN,
+    PRINT,
+    RETURN,
+    SEMICOLON,
+)
+from pox.tokenizer import Token, TokenBuffer, TokenStream
+
+# The same grammar as pox.func_parse, but every construct that nests keeps
+# its state in a frame on an explicit stack instead of in a Python call, so
+# there is no depth limit. The trees are identical to the recursive parser's.
+
+
+class _Body:
+    # statements of the program or of a function block
+    __slots__ = ("statements", "block")
+
+    def __init__(self, block: bool) -> None:
+        self.statements: List[Statement] = []
+        self.block = block
+
+
+class _Expr:
+    # an expression being climbed, see func_parse._expression. `group` is
+    # set for the inside of parentheses and `argument` for a call argument,
+    # `prefix` holds the unary operators waiting on a parenthesised operand
+    # or a call and `ready` that operand once done.
+    __slots__ = ("operands", "pending", "prefix", "ready", "group", "argument")
+
+    def __init__(self, group: bool = False, argument: bool = False) -> None:
+        self.operands: List[Expr] = []
+        self.pending: List[Tuple[int, Callable[[Any, Any], Any]]] = []
+        self.prefix: List[Callable[[Any], Any]] = []
+        self.ready: Optional[Expr] = None
+        self.group = group
+        self.argument = argument
+
+
+class _Call:
+    # a call waiting on its arguments
+    __slots__ = ("callee", "arguments")
+
+    def __init__(self, callee: Expr) -> None:
+        self.callee = callee
+        self.arguments: List[Expr] = []
+
+
+class _Stmt:
+    # a statement waiting on its expression or, for functions, its block.
+    # start is the index of its first token.
+    __slots__ = ("kind", "start", "name", "parameters", "name_id", "parameter_ids")
+
+    def __init__(
+        self, kind: Any, start: int, name: str = "", parameters: Any = None, name_id: Any = None, parameter_ids: Any = ()
+    ):
+        self.kind = kind
+        self.start = start
+        self.name = name
+        self.parameters = parameters
+        self.name_id = name_id
+        self.parameter_ids = parameter_ids
+
+
+def _starts_expression(tokens: TokenStream, i: int) -> bool:
+    if not tokens.has(i):
+        return False
+    token_type = tokens[i].token_type
+    return token_type in (NUMBER, IDENTIFIER, OPEN_PAREN) or _unary_operators[token_type.code] is not None
+
+
+def _starts_statement(tokens: TokenStream, i: int) -> bool:
+    return _starts_expression(tokens, i) or (tokens.has(i) and tokens[i].token_type in (PRINT, FUN, RETURN))
+
+
+def _climb(tokens: TokenStream, i: int, frame: _Expr) -> Tuple[int, Union[Expr, _Call, None]]:
+    # runs the expression in frame until it is complete, or until an
+    # operand opens a parenthesis, in which case it returns None and the
+    # caller pushes a frame for the inside, or a call, which it returns
+    # for the caller to push
+    binary = _binary_operators
+    unary = _unary_operators
+    operands = frame.operands
+    pending = frame.pending
+    prefix = frame.prefix
+    expr = frame.ready
+    frame.ready = None
+
+    while True:
+        if expr is None:
+            while tokens.has(i) and unary[tokens[i].token_type.code] is not None:
+                prefix.append(unary[tokens[i].token_type.code])
+                i += 1
+            if not tokens.has(i):
+                panic(tokens, i, msg="Expected an expression")
+            token = tokens[i]
+            token_type = token.token_type
+
+            if token_type is NUMBER:
+                expr = Literal(float(token.lexeme))
+            elif token_type is IDENTIFIER:
+                expr = Identifier(symbol=token.lexeme, symbol_id=token.symbol)
+                if tokens.has(i + 1) and tokens[i + 1].token_type is OPEN_PAREN:
+                    return i + 2, _Call(expr)
+            elif token_type is OPEN_PAREN:
+                return i + 1, None
+            else:
+                panic(tokens, i, msg="Expected an expression")
+            i += 1
+
+        if prefix:
+            for operator in reversed(prefix):
+                expr = Unary(operator, expr)
+            prefix.clear()
+
+        entry = binary[tokens[i].token_type.code] if tokens.has(i) else None
+        while pending and (entry is None or pending[-1][0] >= entry[0]):
+            expr = Binary(pending.pop()[1], operands.pop(), expr)
+
+        if entry is None:
+            return i, expr
+        operands.append(expr)
+        pending.append(entry)
+        i += 1
+        expr = None
+
+
+def _call_done(tokens: TokenStream, i: int, stack: List[Any]) -> int:
+    # the call on top of the stack has all its arguments once tokens[i]
+    # closes them. it is the operand of the expression below it, unless
+    # another argument list follows and calls what it returns.
+    call = stack[-1]
+    if not tokens.has(i) or tokens[i].token_type is not CLOSE_PAREN:
+        expected(tokens, i, CLOSE_PAREN)
+    expr = Call(call.callee, tuple(call.arguments))
+    i += 1
+    if tokens.has(i) and tokens[i].token_type is OPEN_PAREN:
+        stack[-1] = _Call(expr)
+        return _arguments(tokens, i + 1, stack)
+    stack.pop()
+    stack[-1].ready = expr
+    return i
+
+
+def _arguments(tokens: TokenStream, i: int, stack: List[Any]) -> int:
+    # the start of the arguments of the call on top of the stack
+    if not _starts_expression(tokens, i):
+        return _call_done(tokens, i, stack)
+    stack.append(_Expr(argument=True))
+    return i
+
+
+def _expect(tokens: TokenStream, i: int, token_type: Any) -> int:
+    if not tokens.has(i) or tokens[i].token_type is not token_type:
+        expected(tokens, i, token_type)
+    return i + 1
+
+
+def _function_header(tokens: TokenStream, i: int) -> Tuple[_Stmt, int]:
+    # tokens[i] is the fun; the same checks, in the same order, as the
+    # generated parser makes
+    j = _expect(tokens, i + 1, IDENTIFIER)
+    name = tokens[i + 1]
+    j = _expect(tokens, j, OPEN_PAREN)
+    parameters = []
+    parameter_ids = []
+
+    if tokens.has(j) and tokens[j].token_type is IDENTIFIER:
+        parameters.append(tokens[j].lexeme)
+        parameter_ids.append(tokens[j].symbol)
+        j += 1
+        while tokens.has(j) and tokens[j].token_type is COMMA:
+            j = _expect(tokens, j + 1, IDENTIFIER)
+            parameters.append(tokens[j - 1].lexeme)
+            parameter_ids.append(tokens[j - 1].symbol)
+    j = _expect(tokens, j, CLOSE_PAREN)
+    j = _expect(tokens, j, OPEN_BRACE)
+
+    frame = _Stmt(FUN, i, name.lexeme, parameters, name.symbol, tuple(parameter_ids))
+    return frame, j
+
+
+def parse(tokens: Union[TokenStream, TokenBuffer, Iterable[Token]]) -> Program:
+    if not isinstance(tokens, (TokenStream, TokenBuffer)):
+        tokens = TokenStream(tokens)
+
+    session = _session.get(None)
+    nodes = session.nodes if session is not None else None
+    program = _Body(block=False)
+    stack: List[Any] = [program]
+    i = 0
+
+    while True:
+        top = stack[-1]
+        frame_type = type(top)
+
+        if frame_type is _Expr:
+            i, expr = _climb(tokens, i, top)
+            if expr is None:
+                stack.append(_Expr(group=True))
+                continue
+            if type(expr) is _Call:
+                stack.append(expr)
+                i = _arguments(tokens, i, stack)
+                continue
+            stack.pop()
+            if top.argument:
+                stack[-1].arguments.append(expr)
+                if tokens.has(i) and tokens[i].token_type is COMMA:
+                    stack.append(_Expr(argument=True))
+                    i += 1
+                else:
+                    i = _call_done(tokens, i, stack)
+                continue
+            if top.group:
+                i = _expect(tokens, i, CLOSE_PAREN)
+                stack[-1].ready = Grouping(expr)
+                continue
+
+            # a whole expression finishes the statement waiting on it
+            frame = stack.pop()
+            kind = frame.kind
+            start = frame.start
+            if kind is PRINT:
+                i = _expect(tokens, i, CLOSE_PAREN)
+                stmt: AST = Print(expr)
+            elif kind is RETURN:
+                stmt = Return(expr)
+            else:
+                stmt = expr
+            i = _expect(tokens, i, SEMICOLON)
+
+        elif top.block and not _starts_statement(tokens, i):
+            # the end of a block finishes the function it belongs to
+            stack.pop()
+            i = _expect(tokens, i, CLOSE_BRACE)
+            header = stack.pop()
+            start = header.start
+            block = Block(tuple(top.statements))
+            stmt = Function(
+                name=header.name,
+                parameters=header.parameters,
+                body=block,
+                name_id=header.name_id,
+                parameter_ids=header.parameter_ids,
+            )
+            if tokens.has(i) and tokens[i].token_type is SEMICOLON:
+                i += 1
+
+        elif not top.block and not tokens.has(i):
+            if nodes is not None:
+                return nodes.make(Program, tuple(program.statements))
+            return Program(tuple(program.statements))
+
+        else:
+            # the start of a statement
+            if not _starts_statement(tokens, i):
+                panic(tokens, i, msg="Expected a statement")
+            token_type = tokens[i].token_type
+            if token_type is PRINT:
+                stack.append(_Stmt(PRINT, i))
+                i = _expect(tokens, i + 1, OPEN_PAREN)
+            elif token_type is FUN:
+                header, i = _function_header(tokens, i)
+                stack.append(header)
+                stack.append(_Body(block=True))
+                continue
+            elif token_type is RETURN:
+                stack.append(_Stmt(RETURN, i))
+                i += 1
+            else:
+                stack.append(_Stmt(None, i))
+            stack.append(_Expr(group=False))
+            continue
+
+        parsed_statement(tokens, start, stmt)
+        body = stack[-1]
+        if body is program:
+            body.statements.append(stmt if nodes is None else nodes.intern(stmt))
+            tokens.release(i)
+        else:
+            body.statements.append(stmt)
+
+
+__all__ = ["parse"]
@@ -0,0 +1,32 @@
+from typing import Dict, List
+
+
+class SymbolTable:
+    # one per compilation: every distinct identifier is stored once and
+    # gets a dense integer id, so later passes can index lists by symbol
+    # instead of hashing names again
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, name: str) -> int:
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    def name(self, symbol: int) -> str:
+        return self.names[symbol]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def __repr__(self):
+        return f"SymbolTable({len(self.names)} symbols)"
+
+
+__all__ = ["SymbolTable"]
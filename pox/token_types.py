@@ -1,10 +1,15 @@
-from dataclasses import dataclass
-from typing import Type
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Type, Tuple
+
+_codes = count()
 
 
 @dataclass(frozen=True)
 class TokenType:
     name: str
+    # dense small int identifying the type, see TOKEN_TYPES
+    code: int = field(default_factory=lambda: next(_codes), compare=False, repr=False)
 
 
 TT: Type[TokenType] = TokenType
@@ -68,3 +73,7 @@ WHITESPACE = TT("WHITESPACE")
 
 LINE_COMMENT = TT("LINE_COMMENT")
 MULTI_LINE_COMMENT = TT("MULTI_LINE_COMMENT")
+
+TOKEN_TYPES: Tuple[TokenType, ...] = tuple(
+    sorted((v for v in list(globals().values()) if isinstance(v, TokenType)), key=lambda t: t.code)
+)
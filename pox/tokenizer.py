@@ -1,9 +1,15 @@
-from dataclasses import dataclass
+import codecs
+import mmap
+import os
+import re
+from array import array
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from string import ascii_letters, digits
 from typing import *
 
 from pox.token_types import *
+from pox.symbols import SymbolTable
+from pox.lines import LineIndex
 
 def peek(src: str, i: int) -> Optional[str]:
     if i < len(src):
@@ -14,186 +20,493 @@ class Token:
     token_type: TokenType
     char: int
     lexeme: str
+    # SymbolTable id of an IDENTIFIER, when lexed with a table
+    symbol: Optional[int] = field(default=None, compare=False)
 
     def __repr__(self):
         return f"{self.token_type.name}(char={self.char}, lexeme={self.lexeme})"
 
 
-def _fixed_length(src: str, i: int) -> Optional[Token]:
-    token_types = {
-        "(": OPEN_PAREN,
-        ")": CLOSE_PAREN,
-        "{": OPEN_BRACE,
-        "}": CLOSE_BRACE,
-        "[": OPEN_BRACKET,
-        "]": CLOSE_BRACKET,
-        ":": COLON,
-        "@": AT,
-        ",": COMMA,
-        ".": DOT,
-        "?": QUESTION,
-        ";": SEMICOLON,
-        "-": MINUS,
-        "+": PLUS,
-        "/": SLASH,
-        "*": STAR,
-
-        # the more restrictive has to come first!!
-        "!=": BANG_EQUAL,
-        "!": BANG,
-
-        # the more restrictive has to come first!!
-        "==": EQUAL_EQUAL,
-        "=": EQUAL,
-
-        # the more restrictive has to come first!!
-        ">=": GREATER_EQUAL,
-        ">": GREATER,
-
-        # the more restrictive has to come first!!
-        "<=": LESS_EQUAL,
-        "<": LESS,
-
-        "and": AND,
-        # the more restrictive has to come first!!
-        "&&": AND,
-        "&": BINAND,
-
-        "class": CLASS,
-        "else": ELSE,
-        "false": FALSE,
-        "fun": FUN,
-        "for": FOR,
-        "if": IF,
-        "null": NULL,
-
-        "or": OR,
-        # the more restrictive has to come first!!
-        "||": OR,
-        "|": BINOR,
-
-        "^": XOR,
-        "print": PRINT,
-        "return": RETURN,
-        "super": SUPER,
-        "this": THIS,
-        "true": TRUE,
-        "var": VAR,
-        "while": WHILE,
-    }
-    for lexeme, token_type in token_types.items():
-        if src[i:i + len(lexeme)] == lexeme:
-            return Token(token_type=token_type, char=i, lexeme=lexeme)
-
-
-def _number(src: str, i: int) -> Optional[Token]:
-    if src[i].isdigit():
-        j = i + 1
-        while j < len(src) and src[j].isdigit():
-            j += 1
-
-        # do we have a decimal? if yes, keep counting
-        if j < len(src) and src[j] == ".":
-            j += 1
-            while j < len(src) and src[j].isdigit():
-                j += 1
-
-        return Token(token_type=NUMBER, char=i, lexeme=src[i:j])
-
-
-def _string(src: str, i: int) -> Optional[Token]:
-    if src[i] in ('\'', '\"'):
-        quote = src[i]
-
-        j = i + 1
-        while j < len(src):
-            if src[j] == quote:
-                return Token(token_type=STRING, char=i, lexeme=src[i : j + 1])
-            if src[j] == "\\":
-                j += 2
-            else:
-                j += 1
-
-
-def _identifier(src: str, i: int) -> Optional[Token]:
-    if src[i] in ("_" + ascii_letters):
-        j = i + 1
-        while j < len(src) and src[j] in ("_" + ascii_letters + digits):
-            j += 1
-        return Token(token_type=IDENTIFIER, char=i, lexeme=src[i : j])
+_punctuation: Dict[str, TokenType] = {
+    "(": OPEN_PAREN,
+    ")": CLOSE_PAREN,
+    "{": OPEN_BRACE,
+    "}": CLOSE_BRACE,
+    "[": OPEN_BRACKET,
+    "]": CLOSE_BRACKET,
+    ":": COLON,
+    "@": AT,
+    ",": COMMA,
+    ".": DOT,
+    "?": QUESTION,
+    ";": SEMICOLON,
+    "-": MINUS,
+    "+": PLUS,
+    "/": SLASH,
+    "*": STAR,
+    "!=": BANG_EQUAL,
+    "!": BANG,
+    "==": EQUAL_EQUAL,
+    "=": EQUAL,
+    ">=": GREATER_EQUAL,
+    ">": GREATER,
+    "<=": LESS_EQUAL,
+    "<": LESS,
+    "&&": AND,
+    "&": BINAND,
+    "||": OR,
+    "|": BINOR,
+    "^": XOR,
+}
+
+# keywords are only recognised once a whole word has been scanned,
+# so `format` is an identifier rather than FOR + `mat`
+_keywords: Dict[str, TokenType] = {
+    "and": AND,
+    "class": CLASS,
+    "else": ELSE,
+    "false": FALSE,
+    "fun": FUN,
+    "for": FOR,
+    "if": IF,
+    "null": NULL,
+    "or": OR,
+    "print": PRINT,
+    "return": RETURN,
+    "super": SUPER,
+    "this": THIS,
+    "true": TRUE,
+    "var": VAR,
+    "while": WHILE,
+}
+
+# leading whitespace is folded into every match, and the group that
+# captured tells us what kind of token we found
+_WORD, _NUMBER, _LINE_COMMENT, _MULTI_LINE_COMMENT, _PUNCTUATION, _STRING = range(1, 7)
+
+# comments have to be tried before punctuation, so that `//` isn't two slashes
+_master = re.compile(
+    r"\s*(?:"
+    r"([_A-Za-z][_A-Za-z0-9]*)"
+    r"|(\d+(?:\.\d*)?)"
+    r"|(//(?:\\[\s\S]?|[^\n\\])*\n?)"
+    r"|(/\*)"
+    r"|(" + "|".join(re.escape(p) for p in _punctuation if len(p) == 2)
+    + "|[" + "".join(re.escape(p) for p in _punctuation if len(p) == 1) + "])"
+    r"|(\"(?:\\[\s\S]|[^\"\\])*\"|'(?:\\[\s\S]|[^'\\])*')"
+    r")"
+)
+_whitespace = re.compile(r"\s*")
 
+# token types that don't need a lookup on the lexeme
+_fixed_kinds: Dict[int, TokenType] = {
+    _LINE_COMMENT: LINE_COMMENT,
+    _NUMBER: NUMBER,
+    _STRING: STRING,
+}
 
-def _whitespace(src: str, i: int) -> Optional[Token]:
-    if src[i].isspace():
-        j = i + 1
-        while j < len(src) and src[j].isspace():
-            j += 1
-        return Token(token_type=WHITESPACE, char=i, lexeme=src[i:j])
+# nested comments can't be expressed as a regex, so the body of a /* */
+# comment is scanned by jumping between escapes, openers and closers
+_comment_event = re.compile(r"\\[\s\S]?|/\*|\*/")
 
 
-def _line_comment(src: str, i: int) -> Optional[Token]:
-    if src[i:i+2] == '//':
-        j = i + 1
-        while j < len(src) and src[j] != '\n':
-            if src[j] == '\\':
-                j += 2
-            else:
-                j += 1
-        return Token(token_type=LINE_COMMENT, char=i, lexeme=src[i:j + 1])
-
-
-def _multi_line_comment(src: str, i: int) -> Optional[Token]:
-    if src[i:i+2] == '/*':
-        depth = 1
-        j = i + 1
-        while depth > 0 and j < len(src):
-            if src[j] == '\\':
-                j += 2
-            elif src[j:j+2] == '/*':
-                depth += 1
-                j += 2
-            elif src[j:j+2] == '*/':
-                depth -= 1
-                j += 2
-            else:
-                j += 1
-        return Token(token_type=MULTI_LINE_COMMENT, char=i, lexeme=src[i:j])
-
-
-_tokenizers: Sequence[Callable[[str, int], Optional[Token]]] = (
-    _line_comment,
-    _multi_line_comment,
-    _fixed_length,
-    _number,
-    _string,
-    _identifier,
-    _whitespace,
-)
+def _multi_line_comment_end(src: str, i: int) -> int:
+    depth = 1
+    # starts on the `*` of the opener, so `/*/` closes itself
+    j = i + 1
+    search = _comment_event.search
+    while depth > 0:
+        m = search(src, j)
+        if m is None:
+            return len(src)
+        event = m.group()
+        if event == "/*":
+            depth += 1
+        elif event == "*/":
+            depth -= 1
+        j = m.end()
+    return j
 
 
-def _next_token(src: str, i: int) -> Optional[Token]:
-    for f in _tokenizers:
-        token: Optional[Token] = f(src, i)
-        if token:
-            return token
+T = TypeVar('T')
 
 
 class LexError(RuntimeError):
-    pass
-
-
-def tokenize(src: str) -> List[Token]:
-    i = 0
-    tokens = []
-
-    while i < len(src):
-        token = _next_token(src, i)
-        if token is None:
-            raise LexError(f"wat? failed to parse at char {i}")
-        tokens.append(token)
-        i += len(token.lexeme)
+    def __init__(self, msg: str, char: int = -1) -> None:
+        super().__init__(msg)
+        self.char = char
+
+
+def _scan(
+    src: str, comments: bool, make: Callable[[TokenType, int, str], T] = Token, i: int = 0
+) -> Iterator[T]:
+    punctuation = _punctuation
+    keywords = _keywords
+    fixed_kinds = _fixed_kinds
+
+    while True:
+        m = None
+        # a fresh scanner is only needed after hand-scanning a nested comment
+        for m in iter(_master.scanner(src, i).match, None):
+            kind = m.lastindex
+            lexeme = m.group(kind)
+            start = m.end() - len(lexeme)
+            if kind == _WORD:
+                yield make(keywords.get(lexeme, IDENTIFIER), start, lexeme)
+            elif kind == _PUNCTUATION:
+                yield make(punctuation[lexeme], start, lexeme)
+            elif kind == _MULTI_LINE_COMMENT:
+                i = _multi_line_comment_end(src, start)
+                if comments:
+                    yield make(MULTI_LINE_COMMENT, start, src[start:i])
+                break
+            elif kind != _LINE_COMMENT or comments:
+                yield make(fixed_kinds[kind], start, lexeme)
+        else:
+            break
+
+    # the scanner stops at the first position nothing matches, which is
+    # fine if all that is left is whitespace
+    end = m.end() if m is not None else i
+    i = _whitespace.match(src, end).end()
+    if i < len(src):
+        raise LexError(f"wat? failed to parse at char {i}", i)
+
+
+def _maker(symbols: Optional[SymbolTable]) -> Callable[[TokenType, int, str], Token]:
+    if symbols is None:
+        return Token
+
+    names = symbols.names
+    intern = symbols.intern
+
+    def make(token_type: TokenType, start: int, lexeme: str) -> Token:
+        if token_type is IDENTIFIER:
+            # keep the table's copy of the name, not the freshly sliced one
+            symbol = intern(lexeme)
+            return Token(token_type, start, names[symbol], symbol)
+        return Token(token_type, start, lexeme)
+
+    return make
+
+
+def tokenize(src: str, symbols: Optional[SymbolTable] = None) -> List[Token]:
+    return list(_scan(src, True, _maker(symbols)))
+
+
+def iter_tokens(src: str, symbols: Optional[SymbolTable] = None) -> Iterator[Token]:
+    # lazily yields only the tokens a parser cares about
+    return _scan(src, False, _maker(symbols))
+
+
+def iter_file_tokens(
+    path: str,
+    comments: bool = False,
+    chunk_size: int = 1 << 20,
+    symbols: Optional[SymbolTable] = None,
+    lines: Optional[LineIndex] = None,
+) -> Iterator[Token]:
+    # like iter_tokens(open(path).read()), but the file is memory mapped and
+    # decoded a chunk at a time, so only a chunk plus the longest token is
+    # ever held as text. offsets are absolute character positions.
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            decode = codecs.getincrementaldecoder('utf-8')().decode
+            make = _maker(symbols)
+            pending = ''
+            base = 0
+
+            for offset in range(0, size, chunk_size):
+                final = offset + chunk_size >= size
+                data = mm[offset:offset + chunk_size]
+                fresh = decode(data, final)
+                if lines is not None:
+                    lines.feed(fresh, base + len(pending), data, offset)
+                text = pending + fresh
+                done = 0
+                try:
+                    for token in _scan(text, comments, make):
+                        end = token.char + len(token.lexeme)
+                        # anything running into the end of the chunk might
+                        # continue in the next one, so scan it again then
+                        if end == len(text) and not final:
+                            break
+                        done = end
+                        token.char += base
+                        yield token
+                except LexError as e:
+                    # a string is the only token that fails to match at all
+                    # when it is cut short, everything else is a real error
+                    if final or text[e.char] not in ('\'', '"'):
+                        raise LexError(f"wat? failed to parse at char {base + e.char}", base + e.char) from None
+                pending = text[done:]
+                base += done
+
+
+class TokenStream:
+    # lookahead buffer over a token iterator, indexed by absolute token
+    # position like a list. everything before a released position is
+    # dropped, so memory is bounded by how far back the parser looks.
+    def __init__(self, tokens: Iterable[Token]) -> None:
+        self._buffer: List[Token] = []
+        self._offset = 0
+        # a list is already in memory, index it directly and never release
+        self._owned = not isinstance(tokens, list)
+        if self._owned:
+            self._tokens = iter(tokens)
+        else:
+            self._tokens = iter(())
+            self._buffer = tokens
+
+    def _fill(self, k: int) -> bool:
+        buffer = self._buffer
+        for token in self._tokens:
+            buffer.append(token)
+            if len(buffer) > k:
+                return True
+        return False
+
+    def has(self, i: int) -> bool:
+        k = i - self._offset
+        return k < len(self._buffer) or self._fill(k)
+
+    def __getitem__(self, i: int) -> Token:
+        k = i - self._offset
+        if 0 <= k < len(self._buffer) or (k >= 0 and self._fill(k)):
+            return self._buffer[k]
+        if k < 0:
+            raise IndexError(f"token {i} was already released")
+        raise IndexError(f"token {i} is past the end of the stream")
+
+    def release(self, i: int) -> None:
+        k = min(i - self._offset, len(self._buffer))
+        if k > 0 and self._owned:
+            del self._buffer[:k]
+            self._offset += k
+
+
+def _span(token_type: TokenType, start: int, lexeme: str) -> Tuple[int, int, int]:
+    return token_type.code, start, start + len(lexeme)
+
+
+class TokenBuffer:
+    # columnar storage for a whole token sequence: one byte of token type
+    # code and two offsets per token, and with a SymbolTable the id of each
+    # IDENTIFIER (-1 for other tokens), interned as it is lexed. lexemes
+    # are only sliced out of src when somebody reads them.
+    def __init__(self, src: str, symbols: Optional[SymbolTable] = None) -> None:
+        self.src = src
+        self.symbols = symbols
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.symbol_ids: Optional[array] = None if symbols is None else array('i')
+
+    @classmethod
+    def from_source(cls, src: str, comments: bool = False, symbols: Optional[SymbolTable] = None) -> 'TokenBuffer':
+        buffer = cls(src, symbols)
+        kinds, starts, ends = buffer.kinds, buffer.starts, buffer.ends
+        for kind, start, end in _scan(src, comments, _span):
+            kinds.append(kind)
+            starts.append(start)
+            ends.append(end)
+        if symbols is not None:
+            intern = symbols.intern
+            identifier = IDENTIFIER.code
+            buffer.symbol_ids.extend(
+                intern(src[start:end]) if kind == identifier else -1
+                for kind, start, end in zip(kinds, starts, ends)
+            )
+        return buffer
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, i: int) -> 'TokenView':
+        if not 0 <= i < len(self.kinds):
+            raise IndexError(f"token {i} is past the end of the buffer")
+        return TokenView(self, i)
+
+    def __iter__(self) -> Iterator['TokenView']:
+        return (TokenView(self, i) for i in range(len(self.kinds)))
+
+    def kind(self, i: int) -> int:
+        return self.kinds[i]
+
+    def lexeme(self, i: int) -> str:
+        return self.src[self.starts[i]:self.ends[i]]
+
+    # the TokenStream interface, so parsers can read a buffer directly
+    def has(self, i: int) -> bool:
+        return i < len(self.kinds)
+
+    def release(self, i: int) -> None:
+        pass
+
+
+class TokenView:
+    # quacks like a Token, backed by one row of a TokenBuffer
+    __slots__ = ("buffer", "index")
+
+    def __init__(self, buffer: TokenBuffer, index: int) -> None:
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def kind(self) -> int:
+        return self.buffer.kinds[self.index]
+
+    @property
+    def token_type(self) -> TokenType:
+        return TOKEN_TYPES[self.buffer.kinds[self.index]]
+
+    @property
+    def char(self) -> int:
+        return self.buffer.starts[self.index]
+
+    @property
+    def lexeme(self) -> str:
+        return self.buffer.lexeme(self.index)
+
+    @property
+    def symbol(self) -> Optional[int]:
+        ids = self.buffer.symbol_ids
+        if ids is None or ids[self.index] < 0:
+            return None
+        return ids[self.index]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (Token, TokenView)):
+            return (self.token_type, self.char, self.lexeme) == (other.token_type, other.char, other.lexeme)
+        return NotImplemented
 
-    return [t for t in tokens if t.token_type is not WHITESPACE ]
+    def __repr__(self):
+        return f"{self.token_type.name}(char={self.char}, lexeme={self.lexeme})"
 
 
-__all__ = ["tokenize", "Token"]
+@dataclass(frozen=True)
+class Edit:
+    offset: int
+    deleted: int
+    inserted: str
+
+    def apply(self, src: str) -> str:
+        return src[:self.offset] + self.inserted + src[self.offset + self.deleted:]
+
+
+class EditableTokens:
+    # the tokens of a source that is being edited, as a gap buffer: the
+    # tokens before the gap in a list in order, those after it in another
+    # list in reverse, with offsets that are `shift` behind the source.
+    # an edit moves the gap to itself and only touches the tokens it
+    # passes, so edits close to each other cost the same in any size of
+    # file. reading a token past the gap moves the gap past it, so what
+    # the parser sees always has its real offset. indexes like a list and
+    # has TokenStream's has and release, so the parsers can read it.
+    def __init__(self, tokens: Iterable[Token] = ()) -> None:
+        self._before: List[Token] = list(tokens)
+        self._after: List[Token] = []
+        self._shift = 0
+
+    def __len__(self) -> int:
+        return len(self._before) + len(self._after)
+
+    def _move(self, i: int) -> None:
+        # puts the gap before token i
+        before, after, shift = self._before, self._after, self._shift
+        while len(before) > i:
+            token = before.pop()
+            token.char -= shift
+            after.append(token)
+        while len(before) < i and after:
+            token = after.pop()
+            token.char += shift
+            before.append(token)
+
+    def __getitem__(self, i: int) -> Token:
+        if i >= len(self._before):
+            if not 0 <= i < len(self):
+                raise IndexError(f"token {i} is past the end")
+            self._move(i + 1)
+        return self._before[i]
+
+    def __iter__(self) -> Iterator[Token]:
+        self._move(len(self))
+        return iter(self._before)
+
+    def has(self, i: int) -> bool:
+        return i < len(self)
+
+    def release(self, i: int) -> None:
+        # an edit can reach back anywhere, nothing is dropped
+        pass
+
+    def _end(self, i: int) -> int:
+        # where token i ends, without moving the gap
+        before = self._before
+        if i < len(before):
+            token = before[i]
+            return token.char + len(token.lexeme)
+        token = self._after[len(self) - 1 - i]
+        return token.char + self._shift + len(token.lexeme)
+
+    def _first_reaching(self, offset: int) -> int:
+        # index of the first token whose end is at or after offset
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._end(mid) < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _replace(self, lo: int, hi: int, fresh: List[Token], delta: int) -> None:
+        # tokens lo to hi become fresh, the ones after them move by delta
+        self._move(hi)
+        del self._before[lo:]
+        self._before += fresh
+        self._shift += delta
+
+
+def relex(
+    tokens: EditableTokens, src: str, edit: Edit, comments: bool = True, symbols: Optional[SymbolTable] = None
+) -> Tuple[int, int]:
+    # updates tokens in place after `edit` turned the old source into src.
+    # returns the range of indices that were re-scanned, everything else
+    # is the old Token objects, the ones after the edit moved by its size.
+    delta = len(edit.inserted) - edit.deleted
+    edited_end = edit.offset + len(edit.inserted)
+
+    # a token's match depends on its text and the character right after it,
+    # so only tokens ending strictly before the edit are known to survive
+    lo = tokens._first_reaching(edit.offset)
+    start = tokens._end(lo - 1) if lo > 0 else 0
+
+    fresh: List[Token] = []
+    k = lo
+    count = len(tokens)
+    for token in _scan(src, comments, _maker(symbols), start):
+        if token.char >= edited_end:
+            # past the edit the source is the old one shifted by delta, so
+            # once we start a token where the old scan started one, the
+            # rest of the old tokens are still right
+            old_char = token.char - delta
+            while k < count and tokens[k].char < old_char:
+                k += 1
+            if k < count and tokens[k].char == old_char:
+                break
+        fresh.append(token)
+    else:
+        k = count
+
+    tokens._replace(lo, k, fresh, delta)
+    return lo, lo + len(fresh)
+
+
+__all__ = ["tokenize", "iter_tokens", "Token", "TokenStream", "TokenBuffer", "TokenView", "Edit", "EditableTokens", "relex", "iter_file_tokens"]
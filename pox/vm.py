@@ -0,0 +1,198 @@
+import sys
+from typing import IO, Any, Dict, List, Optional
+
+from pox.bytecode import (
+    ADD,
+    BINARY,
+    CALL,
+    CONST,
+    DIV,
+    EQ,
+    FUNCTION,
+    GE,
+    GT,
+    JUMP_IF_FALSE_OR_POP,
+    JUMP_IF_TRUE_OR_POP,
+    LE,
+    LOAD,
+    LT,
+    MUL,
+    NE,
+    NEG,
+    NOT,
+    OPCODES,
+    OPERATORS,
+    POP,
+    PRINT,
+    RETURN,
+    STORE,
+    SUB,
+    CodeObject,
+)
+from pox.interp import _OPERAND_ERRORS, Environment, InterpretError, show
+
+# Runs pox.bytecode CodeObjects. One loop runs every frame: a call saves
+# the caller's state on a list of frames instead of recursing in Python,
+# so a pox call costs no Python stack. Values live on a single stack.
+# Environments and errors are pox.interp's, the two back ends agree on
+# what a program does.
+
+_OPERATOR_OPCODES = frozenset((ADD, SUB, MUL, DIV, EQ, NE, LT, LE, GT, GE, NEG, NOT, BINARY))
+
+
+class VMFunction:
+    __slots__ = ("code", "closure")
+
+    def __init__(self, code: CodeObject, closure: Environment) -> None:
+        self.code = code
+        self.closure = closure
+
+    def __repr__(self):
+        return f"<fn {self.code.name}>"
+
+
+def run(
+    code: CodeObject,
+    env: Optional[Environment] = None,
+    out: Optional[IO[str]] = None,
+    counts: Optional[List[int]] = None,
+) -> Environment:
+    # runs code in env, a fresh environment by default, and returns it.
+    # print writes to out, or to sys.stdout. if counts is given, each
+    # instruction adds one to counts[opcode].
+    if env is None:
+        env = Environment()
+    _execute(code, env, out or sys.stdout, counts)
+    return env
+
+
+def profile(code: CodeObject, env: Optional[Environment] = None, out: Optional[IO[str]] = None) -> Dict[str, int]:
+    # runs code and returns how many times each instruction ran, most first
+    counts = [0] * len(OPCODES)
+    run(code, env, out, counts)
+    ranked = sorted(range(len(OPCODES)), key=lambda op: -counts[op])
+    return {OPCODES[op]: counts[op] for op in ranked if counts[op]}
+
+
+def _execute(code: CodeObject, env: Environment, out: IO[str], counts: Optional[List[int]]) -> Any:
+    # the branches are in rough order of how often they run
+    stack: List[Any] = []
+    push = stack.append
+    pop = stack.pop
+    # (instructions, constants, names, position, environment) of callers
+    frames: List[Any] = []
+    instructions = code.ops
+    constants = code.constants
+    names = code.names
+    pc = 0
+
+    # for the except below, should the first fetch fail
+    op = CONST
+    try:
+        while True:
+            op = instructions[pc]
+            arg = instructions[pc + 1]
+            pc += 2
+            if counts is not None:
+                counts[op] += 1
+
+            if op == LOAD:
+                name = names[arg]
+                scope: Optional[Environment] = env
+                while scope is not None:
+                    values = scope.values
+                    if name in values:
+                        push(values[name])
+                        break
+                    scope = scope.enclosing
+                else:
+                    raise InterpretError(f"Undefined name {name}")
+            elif op == CONST:
+                push(constants[arg])
+            elif op == ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+            elif op == SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif op == MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == LT:
+                right = pop()
+                stack[-1] = stack[-1] < right
+            elif op == CALL:
+                f = stack[-arg - 1]
+                if type(f) is not VMFunction:
+                    raise InterpretError(f"Can't call {show(f)}")
+                callee = f.code
+                parameters = callee.parameters
+                if len(parameters) != arg:
+                    raise InterpretError(f"{callee.name} takes {len(parameters)} arguments, not {arg}")
+                values = dict(zip(parameters, stack[len(stack) - arg:])) if arg else {}
+                del stack[len(stack) - arg - 1:]
+                frames.append((instructions, constants, names, pc, env))
+                instructions = callee.ops
+                constants = callee.constants
+                names = callee.names
+                pc = 0
+                env = Environment(values, f.closure)
+            elif op == RETURN:
+                if not frames:
+                    return pop()
+                instructions, constants, names, pc, env = frames.pop()
+            elif op == JUMP_IF_FALSE_OR_POP:
+                if stack[-1]:
+                    pop()
+                else:
+                    pc = arg
+            elif op == JUMP_IF_TRUE_OR_POP:
+                if stack[-1]:
+                    pc = arg
+                else:
+                    pop()
+            elif op == POP:
+                pop()
+            elif op == DIV:
+                right = pop()
+                stack[-1] = stack[-1] / right
+            elif op == EQ:
+                right = pop()
+                stack[-1] = stack[-1] == right
+            elif op == NE:
+                right = pop()
+                stack[-1] = stack[-1] != right
+            elif op == LE:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+            elif op == GT:
+                right = pop()
+                stack[-1] = stack[-1] > right
+            elif op == GE:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+            elif op == NEG:
+                stack[-1] = -stack[-1]
+            elif op == NOT:
+                stack[-1] = not stack[-1]
+            elif op == BINARY:
+                right = pop()
+                stack[-1] = OPERATORS[arg](stack[-1], right)
+            elif op == STORE:
+                env.values[names[arg]] = pop()
+            elif op == FUNCTION:
+                push(VMFunction(constants[arg], env))
+            elif op == PRINT:
+                out.write(show(pop()) + "\n")
+            else:
+                raise InterpretError(f"bad opcode {op} at {pc - 2}")
+    except _OPERAND_ERRORS as e:
+        # e.g. adding a function to a number. only an operator working on
+        # the values a program gave it is the program's fault, a TypeError
+        # in any other instruction is a bug here.
+        if op not in _OPERATOR_OPCODES:
+            raise
+        raise InterpretError(str(e)) from e
+
+
+__all__ = ["VMFunction", "profile", "run"]
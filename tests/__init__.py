@@ -7,6 +7,9 @@ import hypothesis
 
 
 from rho.ast import AST
+from pox import func_parse as pox
+from pox.interp import show
+from pox.resolver import resolve
 
 hypothesis.settings.register_profile(
     "dev", max_examples=10, verbosity=hypothesis.Verbosity.verbose
@@ -65,3 +68,148 @@ def run(program: AST, _input: Any) -> str:
         program.eval()
         out.seek(0)
         return out.read()
+
+
+# pox programs and what they print, which every back end runs in
+# tests/test_back_ends.py
+PROGRAMS = [
+    (
+        "print(1 + 2 * 3); print(1 / 4); print(-(2 - 5)); print(!(1 < 2)); print(1 == 1 && 2); print(0 || 3 > 1);",
+        "7\n0.25\n3\nfalse\n2\ntrue\n",
+    ),
+    (
+        """
+        fun adder(x) {
+          fun add(y) { return x + y; }
+          return add;
+        }
+        fun twice(f, x) { return f(f(x)); }
+        print(twice(adder(10), 1));
+        print(adder);
+        """,
+        "21\n<fn adder>\n",
+    ),
+    ("fun f(n) { return n; print(n); } fun g() { 1; } print(f(3)); print(g());", "3\nnil\n"),
+    ("fun fib(n) { return n < 2 && 1 || fib(n - 1) + fib(n - 2); } print(fib(15));", "987\n"),
+    ("fun None(True) { return True; } print(None(2)); return 1; print(3);", "2\n"),
+    # f sees the x from where it was defined, not from where it is called
+    (
+        "fun outer(x) { fun f() { return x; } return f; } fun call(f, x) { return f(); } print(call(outer(1), 2));",
+        "1\n",
+    ),
+    # a use before a local definition finds the name outside
+    ("fun f() { return 1; } fun g() { print(f()); fun f() { return 2; } } g();", "1\n"),
+    (
+        "fun g() { return 1; } fun f() { print(g()); fun g() { return 2; } print(g()); return 0; } print(f());",
+        "1\n2\n0\n",
+    ),
+    (
+        """
+        fun f() { return 1; }
+        fun g() {
+          fun h() { return f(); }
+          print(h());
+          fun f() { return 2; }
+          print(h());
+          print(f);
+        }
+        g();
+        """,
+        "1\n2\n<fn f>\n",
+    ),
+    ("fun g(f) { print(f); fun f() { return 2; } print(f()); } g(3);", "3\n2\n"),
+    (
+        """
+        fun f(n) {
+          fun even(n) { return n < 1 || odd(n - 1); }
+          fun odd(n) { return !(n < 1) && even(n - 1); }
+          return even(n);
+        }
+        print(f(7)); print(f(8));
+        """,
+        "false\ntrue\n",
+    ),
+]
+
+
+_EMPTY = object()
+
+
+class _Returned(Exception):
+    pass
+
+
+class _Closure:
+    def __init__(self, node: pox.Function, frames: Tuple[List[Any], ...]) -> None:
+        self.node = node
+        self.frames = frames
+
+    def __str__(self):
+        return f"<fn {self.node.name}>"
+
+
+def run_with_slots(program: pox.Program) -> str:
+    # a small engine that keeps every scope's names in a list, as
+    # pox.resolver lays them out, to check its addresses against what the
+    # other back ends do. returns what the program prints.
+    resolution = resolve(program)
+    out = io.StringIO()
+
+    def read(frames, address, fallbacks):
+        for depth, slot in (address, *fallbacks):
+            value = frames[depth][slot]
+            if value is not _EMPTY:
+                return value
+        raise AssertionError("read an empty slot")
+
+    def call(f, arguments):
+        frame = [_EMPTY] * len(resolution.frame(f.node))
+        frame[:len(arguments)] = arguments
+        try:
+            run(f.node.body.statements, f.node, (frame, *f.frames))
+        except _Returned as r:
+            return r.args[0]
+
+    def run(statements, scope, frames):
+        slots = resolution.frame(scope)
+        for stmt in statements:
+            if isinstance(stmt, pox.Function):
+                frames[0][slots.index(stmt.name)] = _Closure(stmt, frames)
+            elif isinstance(stmt, pox.Var):
+                frames[0][slots.index(stmt.symbol)] = value(stmt.referent, frames)
+            elif isinstance(stmt, pox.Print):
+                out.write(show(value(stmt.expr, frames)) + "\n")
+            elif isinstance(stmt, pox.Return):
+                raise _Returned(value(stmt.expr, frames))
+            else:
+                value(stmt, frames)
+
+    def value(node, frames):
+        if isinstance(node, (pox.Literal, pox.Value)):
+            return node.val
+        if isinstance(node, pox.Grouping):
+            return value(node.expr, frames)
+        if isinstance(node, pox.Identifier):
+            return read(frames, resolution.address(node), resolution.fallback(node))
+        if isinstance(node, pox.FunctionApply):
+            fallbacks = resolution.fallback(node) or ((),) * len(resolution.address(node))
+            f, *arguments = (read(frames, a, b) for a, b in zip(resolution.address(node), fallbacks))
+            return call(f, arguments)
+        if isinstance(node, pox.Call):
+            return call(value(node.callee, frames), [value(a, frames) for a in node.arguments])
+        if isinstance(node, pox.Unary):
+            return node.operator(value(node.right, frames))
+        if isinstance(node, pox.Binary):
+            left = value(node.left, frames)
+            if node.operator is pox.logical_and:
+                return left and value(node.right, frames)
+            if node.operator is pox.logical_or:
+                return left or value(node.right, frames)
+            return node.operator(left, value(node.right, frames))
+        raise TypeError(node)
+
+    try:
+        run(program.statements, program, ([_EMPTY] * len(resolution.frame(program)),))
+    except _Returned:
+        pass
+    return out.getvalue()
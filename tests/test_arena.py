@@ -0,0 +1,117 @@
+from operator import add
+
+import pytest
+
+from pox.arena import AstArena, KINDS
+from pox.func_parse import (
+    Binary,
+    FunctionApply,
+    Identifier,
+    Literal,
+    Program,
+    Session,
+    Value,
+    Var,
+    lex_and_parse,
+    to_json,
+)
+from pox.hashcons import NodeFactory
+from pox.symbols import SymbolTable
+
+SRC = """
+fun f(x, y) {
+  fun g(z) { return -z; };
+  return x * (y + 1) || !y;
+}
+print(f(1, g(2)));
+1 + 2;
+"""
+
+
+def test_round_trips_through_programs():
+    program = lex_and_parse(SRC)
+    arena = AstArena.from_source(SRC)
+    assert arena.to_program() == program
+    assert AstArena.from_program(program).to_program() == program
+    assert arena.to_json() == to_json(program)
+    assert AstArena.from_source("").to_program() == Program(())
+
+
+def test_symbol_ids_match_the_parser():
+    symbols = SymbolTable()
+    arena = AstArena.from_source(SRC, symbols)
+    function = arena.to_program().statements[0]
+    assert symbols.names[:4] == ["f", "x", "y", "g"]
+    assert function.name_id == 0 and function.parameter_ids == (1, 2)
+    assert function.body.statements[1].expr.right.right.symbol_id == 2
+
+
+def test_nodes_not_made_by_the_parser():
+    program = Program((FunctionApply("f", ("a", "b")), Var("v", Literal(2.0))))
+    assert AstArena.from_program(program).to_program() == program
+    values = Program((Value(True), Value("s"), Value(None), Value(3)))
+    loaded = AstArena.from_program(values).to_program()
+    assert loaded == values
+    assert [type(stmt.val) for stmt in loaded.statements] == [bool, str, type(None), int]
+
+
+def test_to_json_raises_for_nodes_without_a_json_form():
+    program = Program((FunctionApply("f", ("a",)),))
+    with pytest.raises(TypeError):
+        to_json(program)
+    with pytest.raises(TypeError, match="no handler for FunctionApply"):
+        AstArena.from_program(program).to_json()
+
+
+def test_cursor_and_walk():
+    arena = AstArena.from_source("print(1 + x);")
+    root = arena[arena.root]
+    assert root.node_type.__name__ == "Program"
+    [statement] = root.children
+    binary = statement.children[0]
+    assert binary.node_type is Binary and arena.operator(binary.index) is add
+    left, right = binary.children
+    assert arena.value(left.index) == 1.0 and arena.name(right.index) == "x"
+
+    names = [KINDS[arena.kind(n)].__name__ for n in arena.walk()]
+    assert names == ["Program", "Print", "Binary", "Literal", "Identifier"]
+    # children are stored before parents
+    assert all(c < n for n in range(len(arena)) for c in arena.children(n))
+
+
+def test_fold():
+    arena = AstArena.from_source(SRC)
+    count = arena.fold({t: lambda arena, n, children: 1 + sum(children) for t in KINDS})
+    assert count == len(arena)
+    identifiers = arena.fold({
+        **{t: lambda arena, n, children: sum(children, []) for t in KINDS},
+        Identifier: lambda arena, n, children: [arena.name(n)],
+    })
+    assert identifiers == ["z", "x", "y", "y", "f", "g"]
+
+
+def test_fold_only_visits_the_subtree_under_root():
+    arena = AstArena.from_source(SRC)
+    statement = arena.children(arena.root)[0]
+    # a later tree with no json form doesn't get in the way
+    arena.add(Program((FunctionApply("f", ("a",)),)))
+    first = lex_and_parse(SRC).statements[0]
+    assert arena.to_program(statement) == first
+    assert arena.to_json(statement) == to_json(first)
+    seen = []
+    arena.fold({t: lambda arena, n, children: seen.append(n) for t in KINDS}, statement)
+    assert seen == sorted(arena.walk(statement))
+
+
+def test_shared_subtrees_are_stored_once():
+    src = "print((x + 1) * (x + 1));"
+    plain = AstArena.from_program(lex_and_parse(src))
+    shared = AstArena.from_program(lex_and_parse(src, session=Session(nodes=NodeFactory())))
+    assert len(shared) == len(plain) - 4
+    assert shared.to_program() == plain.to_program()
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / "src.pox"
+    path.write_text(SRC)
+    assert AstArena.from_file(str(path)).to_program() == lex_and_parse(SRC)
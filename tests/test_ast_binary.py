@@ -0,0 +1,123 @@
+import mmap
+
+import pytest
+
+from pox import ast_binary
+from pox.ast_binary import FormatError, dumps, load, loads
+from pox.ast_json import dumps as json_dumps
+from pox.func_parse import FunctionApply, Grouping, Identifier, Literal, Program, Value, Var, lex_and_parse
+from pox.symbols import SymbolTable
+from rho.ast import BASIC_PROGRAM, BASIC_PROGRAM_WITH_EVENS, no_evens
+
+SRC = """
+fun f(x, y) {
+  fun g(z) { return -z; };
+  return x * (y + 1.5) || !y && x != 2;
+}
+print(f(1, g(2)()));
+1 + 2 ^ 3 < 4;
+"""
+
+
+def test_round_trip_keeps_symbol_ids():
+    parsed_symbols = SymbolTable()
+    ast = lex_and_parse(SRC, parsed_symbols)
+    symbols = SymbolTable()
+    loaded = loads(dumps(ast), symbols)
+    assert loaded == ast
+    assert symbols.names == parsed_symbols.names
+    function = loaded.statements[0]
+    assert (function.name_id, function.parameter_ids) == (0, (1, 2))
+    assert function.body.statements[1].expr.left.left.symbol_id == 1
+
+
+def test_rho_trees():
+    for tree in (BASIC_PROGRAM, BASIC_PROGRAM_WITH_EVENS, no_evens(BASIC_PROGRAM_WITH_EVENS)):
+        assert loads(dumps(tree)) == tree
+
+
+@pytest.mark.parametrize("val", [0.0, -2.5, 1e300, 0, 127, 128, -1, 2 ** 70, -(2 ** 70), True, False, None, "ünï"])
+def test_values(val):
+    loaded = loads(dumps(Program((Literal(val), Value(val)))))
+    assert [type(x.val) for x in loaded.statements] == [type(val)] * 2
+    assert loaded == Program((Literal(val), Value(val)))
+
+
+def test_nodes_not_made_by_the_parser():
+    tree = Program((FunctionApply("f", ("a", "b")), Var("v", Identifier("a"))))
+    symbols = SymbolTable()
+    loaded = loads(dumps(tree), symbols)
+    assert loaded == tree
+    assert loaded.statements[0].arg_ids == (1, 2) and loaded.statements[1].referent.symbol_id == 1
+
+
+def test_reads_from_a_memoryview(tmp_path):
+    path = tmp_path / "ast.bin"
+    ast = lex_and_parse(SRC)
+    with open(path, 'wb') as f:
+        ast_binary.dump(ast, f)
+    with open(path, 'rb') as f:
+        assert load(f) == ast
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            view = memoryview(m)
+            assert loads(view) == ast
+            view.release()
+
+
+def test_deep_trees():
+    depth = 5000
+    tree = Identifier("x")
+    for _ in range(depth):
+        tree = Grouping(tree)
+    loaded = loads(dumps(tree))
+    for _ in range(depth):
+        assert type(loaded) is Grouping
+        loaded = loaded.expr
+    assert loaded == Identifier("x")
+
+
+def test_smaller_than_json():
+    ast = lex_and_parse(SRC * 20)
+    assert len(dumps(ast)) * 8 < len(json_dumps(ast))
+
+
+def test_bad_input():
+    data = dumps(lex_and_parse(SRC))
+    with pytest.raises(FormatError, match="not a pox AST"):
+        loads(b"nope" + data[4:])
+    with pytest.raises(FormatError, match="version"):
+        loads(data[:4] + bytes([ast_binary.VERSION + 1]) + data[5:])
+    with pytest.raises(FormatError, match="damaged"):
+        loads(data[:-3])
+
+
+def test_loads_leaves_the_collector_alone_by_default(monkeypatch):
+    import gc
+
+    def disable():
+        raise AssertionError("collector paused")
+
+    monkeypatch.setattr(gc, "disable", disable)
+    data = dumps(lex_and_parse(SRC))
+    assert loads(data) == lex_and_parse(SRC)
+
+
+def test_loads_leaves_the_collector_as_it_found_it():
+    import gc
+    import threading
+
+    data = dumps(lex_and_parse("fun f(x) { return x + 1; } print(f(2));"))
+    assert gc.isenabled()
+    gc.disable()
+    try:
+        loads(data, pause_gc=True)
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+    threads = [threading.Thread(target=lambda: [loads(data, pause_gc=True) for _ in range(200)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert gc.isenabled()
@@ -0,0 +1,75 @@
+import io
+import json
+
+import pytest
+
+from pox.ast_json import dump, dumps, from_json, load, loads
+from pox.func_parse import Grouping, Identifier, Literal, Program, Print, Session, lex_and_parse, to_json
+from pox.hashcons import NodeFactory
+from pox.symbols import SymbolTable
+
+SRC = """
+fun f(x, y) {
+  fun g(z) { return -z; };
+  return x * (y + 1.5) || !y && x != 2;
+}
+print(f(1, g(2)));
+1 + 2 ^ 3 < 4;
+"""
+
+
+def test_dump_writes_what_json_would():
+    ast = lex_and_parse(SRC)
+    assert dumps(ast) == json.dumps(to_json(ast))
+    assert dumps(Program(())) == json.dumps(to_json(Program(())))
+
+    out = io.StringIO()
+    dump(ast, out, buffer_size=16)
+    assert out.getvalue() == dumps(ast)
+
+    consed = lex_and_parse(SRC, session=Session(nodes=NodeFactory()))
+    assert dumps(consed) == dumps(ast)
+
+
+def test_load_inverts_dump():
+    ast = lex_and_parse(SRC)
+    text = dumps(ast)
+    assert loads(text) == ast
+    assert load(io.StringIO(text)) == ast
+    assert from_json(to_json(ast)) == ast
+    assert from_json(json.loads(text)) == ast
+
+
+def test_load_records_symbol_ids():
+    symbols = SymbolTable()
+    ast = loads(dumps(lex_and_parse(SRC)), symbols)
+    function = ast.statements[0]
+    assert symbols.name(function.name_id) == "f"
+    assert [symbols.name(p) for p in function.parameter_ids] == ["x", "y"]
+
+
+def test_deep_trees():
+    depth = 5000
+    ast = Identifier("x")
+    doc = {"type": "identifier", "symbol": "x"}
+    for _ in range(depth):
+        ast = Grouping(ast)
+        doc = {"type": "grouping", "expr": doc}
+    assert dumps(ast).count("grouping") == depth
+    loaded = from_json(doc)
+    for _ in range(depth):
+        assert type(loaded) is Grouping
+        loaded = loaded.expr
+    assert loaded == Identifier("x")
+
+
+def test_literals_keep_their_json_type():
+    assert from_json({"type": "literal", "val": 1}) == Literal(1)
+    assert dumps(Print(Literal(True))) == json.dumps(to_json(Print(Literal(True))))
+
+
+def test_bad_documents():
+    with pytest.raises(ValueError, match="not a pox node"):
+        loads('{"type": "nonsense"}')
+    with pytest.raises(ValueError, match="unknown operator"):
+        loads('{"type": "unary", "op": "<built-in function abs>", "right": {"type": "literal", "val": 1}}')
@@ -0,0 +1,48 @@
+import io
+
+import pytest
+
+from pox.bytecode import compile
+from pox.func_parse import lex_and_parse
+from pox.interp import run_source
+from pox.pycompile import compile_source
+from pox.vm import run
+from tests import PROGRAMS, run_with_slots
+
+
+def interp(src, out):
+    run_source(src, out)
+
+
+def vm(src, out):
+    run(compile(lex_and_parse(src)), out=out)
+
+
+def pycompile(src, out):
+    compile_source(src).run(out=out)
+
+
+def slots(src, out):
+    out.write(run_with_slots(lex_and_parse(src)))
+
+
+BACK_ENDS = [interp, vm, pycompile]
+
+
+@pytest.mark.parametrize("back_end", BACK_ENDS + [slots], ids=lambda f: f.__name__)
+@pytest.mark.parametrize("src, expected", PROGRAMS)
+def test_programs(back_end, src, expected):
+    out = io.StringIO()
+    back_end(src, out)
+    assert out.getvalue() == expected
+
+
+class BrokenOut:
+    def write(self, s):
+        raise TypeError("not the program's fault")
+
+
+@pytest.mark.parametrize("back_end", BACK_ENDS, ids=lambda f: f.__name__)
+def test_errors_of_our_own_are_not_the_programs(back_end):
+    with pytest.raises(TypeError, match="not the program's fault"):
+        back_end("print(1 + 2);", BrokenOut())
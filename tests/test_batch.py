@@ -0,0 +1,80 @@
+from pox.batch import parse_many
+from pox.func_parse import lex_and_parse
+
+GOOD = "fun f(x, y) { return x * (y + 1); }\nprint(f);\n"
+BAD = "print(1);\nprint(3 * 4 x);\n"
+
+
+def write(tmp_path, sources):
+    paths = []
+    for n, src in enumerate(sources):
+        path = tmp_path / f"{n}.pox"
+        path.write_text(src)
+        paths.append(str(path))
+    return paths
+
+
+def test_parse_many_in_process(tmp_path):
+    paths = write(tmp_path, [GOOD, BAD])
+    good, bad = parse_many(paths, workers=1)
+
+    assert good.ok and good.path == paths[0]
+    assert good.program == lex_and_parse(GOOD)
+    assert good.symbols.names == ["f", "x", "y"]
+    assert good.program.statements[0].parameter_ids == (1, 2)
+
+    assert not bad.ok and bad.program is None
+    assert bad.error.startswith("RuntimeError: Expected")
+    assert "line 2, column 13" in bad.error
+
+
+def test_parse_many_with_a_pool(tmp_path):
+    sources = [GOOD, BAD, "", "print('$);"] * 3
+    results = parse_many(write(tmp_path, sources), workers=2)
+
+    assert [r.ok for r in results] == [True, False, True, False] * 3
+    assert results[4].program == lex_and_parse(GOOD)
+    assert results[3].error.startswith("LexError")
+
+
+def test_statement_starts():
+    from pox.batch import statement_starts
+
+    src = 'fun f(x) { return (x); } print("})"); fun g() { /* { */ return 2; } // c\n; g(); '
+    starts = statement_starts(src)
+    assert [src[n:].split()[0] for n in starts] == ["fun", "print(\"})\");", "fun", "g();"]
+    assert statement_starts("") == []
+
+
+def test_parse_split():
+    from pox.batch import parse_split
+    from pox.symbols import SymbolTable
+
+    src = "".join(f"fun f{n}(x) {{ return x * {n} + y{n % 7}; }}\nprint(f{n}(z));\n" for n in range(300))
+    serial_symbols, split_symbols = SymbolTable(), SymbolTable()
+    serial = lex_and_parse(src, serial_symbols)
+    split = parse_split(src, split_symbols, workers=2, chunks=5)
+
+    assert split == serial
+    assert split_symbols.names == serial_symbols.names
+    assert [s.name_id for s in split.statements[::2]] == [s.name_id for s in serial.statements[::2]]
+
+
+def test_parse_split_errors():
+    import pytest
+    from pox.batch import parse_split
+
+    src = GOOD * 50 + BAD
+    with pytest.raises(RuntimeError, match="line 102, column 13"):
+        parse_split(src, workers=2, chunks=4)
+
+
+def test_parse_split_serial_skips_the_scan(monkeypatch):
+    from pox import batch
+
+    def scan(src):
+        raise AssertionError("scanned for statement starts")
+
+    monkeypatch.setattr(batch, "statement_starts", scan)
+    assert batch.parse_split(GOOD, workers=1) == lex_and_parse(GOOD)
+    assert batch.parse_split(GOOD, workers=4, chunks=1) == lex_and_parse(GOOD)
@@ -0,0 +1,97 @@
+import io
+
+import pytest
+
+from pox.ast_binary import FormatError
+from pox.bytecode import CodeObject, compile, disassemble, dumps, loads
+from pox.func_parse import Print, Program, Value, lex_and_parse
+from pox.interp import Environment, InterpretError
+from pox.vm import VMFunction, profile, run
+from tests import PROGRAMS
+
+
+def vm_output(src):
+    out = io.StringIO()
+    run(compile(lex_and_parse(src)), out=out)
+    return out.getvalue()
+
+
+def test_disassemble():
+    code = compile(lex_and_parse("fun f(x) { return x && 2; } print(f(1));"))
+    assert disassemble(code).split("\n") == [
+        "<program>():",
+        "     0 FUNCTION              0 (<code f, 6 instructions>)",
+        "     2 STORE                 0 (f)",
+        "     4 LOAD                  0 (f)",
+        "     6 CONST                 1 (1.0)",
+        "     8 CALL                  1",
+        "    10 PRINT",
+        "    12 CONST                 2 (None)",
+        "    14 RETURN",
+        "",
+        "f(x):",
+        "     0 LOAD                  0 (x)",
+        "     2 JUMP_IF_FALSE_OR_POP  6",
+        "     4 CONST                 0 (2.0)",
+        "     6 RETURN",
+        "     8 CONST                 1 (None)",
+        "    10 RETURN",
+    ]
+
+
+def test_constants_are_shared_by_type():
+    code = compile(lex_and_parse("print(1 + 1); print(1 == 1);"))
+    assert code.constants == [1.0, None]
+
+
+def test_profile_counts_instructions():
+    code = compile(lex_and_parse("fun f(n) { return n < 1 || f(n - 1); } f(3);"))
+    counts = profile(code)
+    assert counts["CALL"] == 4
+    assert counts["RETURN"] == 5
+    assert list(counts)[0] == "LOAD"
+
+
+def test_serialised_form_round_trips():
+    src, expected = PROGRAMS[1]
+    code = compile(lex_and_parse(src))
+    loaded = loads(dumps(code))
+    assert loaded == code
+    out = io.StringIO()
+    run(loaded, out=out)
+    assert out.getvalue() == expected
+
+    with pytest.raises(FormatError):
+        loads(b"nope")
+    with pytest.raises(FormatError):
+        loads(dumps(code)[:-3])
+
+
+def test_int_constants_round_trip():
+    program = Program((Print(Value(3)), Print(Value(-2 ** 70)), Print(Value(0.5)), Print(Value(True))))
+    code = compile(program)
+    loaded = loads(dumps(code))
+    assert loaded == code
+    assert [type(c) for c in loaded.constants[:3]] == [int, int, float]
+    out = io.StringIO()
+    run(loaded, out=out)
+    assert out.getvalue() == "3\n-1180591620717411303424\n0.5\ntrue\n"
+
+
+def test_environment_and_errors():
+    env = run(compile(lex_and_parse("fun f(x) { return x * k; }")), Environment({"k": 2.0}))
+    assert isinstance(env.values["f"], VMFunction)
+    with pytest.raises(InterpretError, match="Undefined name y"):
+        vm_output("print(y);")
+    with pytest.raises(InterpretError, match="f takes 1 arguments, not 2"):
+        vm_output("fun f(a) { return a; } f(1, 2);")
+    with pytest.raises(InterpretError, match="Can't call 1"):
+        vm_output("fun f(a) { return a; } f(1)(2);")
+    with pytest.raises(InterpretError, match="division by zero"):
+        vm_output("print(1 / 0);")
+
+
+def test_deep_recursion_uses_no_python_stack():
+    src = "fun down(n) { return n < 1 || down(n - 1); } print(down(20000));"
+    assert vm_output(src) == "true\n"
+    assert isinstance(compile(lex_and_parse(src)), CodeObject)
@@ -0,0 +1,88 @@
+import os
+
+import pox.cache
+from pox.cache import ParseCache
+from pox.func_parse import lex_and_parse
+from pox.symbols import SymbolTable
+
+SRC = "fun f(x, y) { return x * (y + 1); }\nprint(f);\n"
+
+
+def entries(directory):
+    return [os.path.join(d, f) for d, _, files in os.walk(directory) for f in files]
+
+
+def test_memory_tier():
+    cache = ParseCache(max_entries=2)
+    program = cache.parse(SRC)
+    assert program == lex_and_parse(SRC)
+    assert cache.parse(SRC) is program
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.parse("print(1);")
+    cache.parse("print(2);")
+    cache.parse(SRC)
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_disk_tier_is_shared(tmp_path):
+    ParseCache(str(tmp_path)).parse(SRC)
+    assert len(entries(tmp_path)) == 1
+
+    cache = ParseCache(str(tmp_path))
+    assert cache.parse(SRC) == lex_and_parse(SRC)
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert not [p for p in entries(tmp_path) if os.path.basename(p).startswith('.tmp-')]
+
+
+def test_symbol_ids_follow_the_callers_table(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    cache.parse(SRC)
+
+    symbols = SymbolTable()
+    symbols.intern("y")
+    symbols.intern("unrelated")
+    program = cache.parse(SRC, symbols)
+    function = program.statements[0]
+    assert symbols.names == ["y", "unrelated", "f", "x"]
+    assert function.name_id == 2 and function.parameter_ids == (3, 0)
+    assert function.body.statements[0].expr.left.symbol_id == 3
+
+
+def test_damaged_entries_are_parsed_again(tmp_path):
+    ParseCache(str(tmp_path)).parse(SRC)
+    [path] = entries(tmp_path)
+    with open(path, 'wb') as f:
+        f.write(b"not a tree")
+
+    cache = ParseCache(str(tmp_path))
+    assert cache.parse(SRC) == lex_and_parse(SRC)
+    assert cache.misses == 1
+    assert ParseCache(str(tmp_path)).parse(SRC) == lex_and_parse(SRC)
+
+
+def test_parser_version_is_part_of_the_key(tmp_path, monkeypatch):
+    ParseCache(str(tmp_path)).parse(SRC)
+    monkeypatch.setattr(pox.cache, "PARSER_VERSION", -1)
+    cache = ParseCache(str(tmp_path))
+    cache.parse(SRC)
+    assert cache.misses == 1
+    assert len(entries(tmp_path)) == 2
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = ParseCache(str(tmp_path), max_entries=0)
+    cache.parse("print(0);")
+    size = os.path.getsize(entries(tmp_path)[0])
+    cache.max_bytes = size * 4
+
+    for n in range(1, 4):
+        cache.parse(f"print({n});")
+        path = cache._path(cache.key(f"print({n});"))
+        os.utime(path, (n, n))
+    os.utime(cache._path(cache.key("print(0);")), (10, 10))
+    cache.parse("print(4);")
+
+    remaining = {os.path.basename(p) for p in entries(tmp_path)}
+    kept = [n for n in range(5) if cache.key(f"print({n});")[2:] in remaining]
+    assert kept == [0, 3, 4]
@@ -0,0 +1,111 @@
+import pytest
+
+from pox import func_parse, mutable_parse
+from pox.grammar import EXPRESSION_PARSER, GRAMMARS, POX_PARSER, Alt, Grammar, GrammarError, Opt, Rule, generate, path
+from pox.mutable_parse import Binary, Grouping, Literal, Parser, Unary
+from pox.token_types import (
+    BANG,
+    FUN,
+    IDENTIFIER,
+    MINUS,
+    NUMBER,
+    OPEN_PAREN,
+    PRINT,
+    RETURN,
+    SEMICOLON,
+    TRUE,
+)
+from pox.tokenizer import TokenBuffer, iter_tokens
+
+
+@pytest.mark.parametrize("grammar", GRAMMARS, ids=lambda g: g.module)
+def test_generated_parsers_are_up_to_date(grammar):
+    with open(path(grammar)) as f:
+        assert f.read() == generate(grammar), "run python -m pox.grammar"
+
+
+def test_first_sets():
+    first = POX_PARSER.first_sets()
+    expression = {NUMBER, IDENTIFIER, OPEN_PAREN, MINUS, BANG}
+    assert first["_primary"] == {NUMBER, IDENTIFIER, OPEN_PAREN}
+    assert first["_expression"] == expression
+    assert first["_stmt"] == expression | {PRINT, FUN, RETURN}
+
+
+def test_operator_prefixes_match_the_tables():
+    assert set(POX_PARSER.rule_map["_expression"].prefix) == set(func_parse.UNARY_OPERATORS)
+    assert set(EXPRESSION_PARSER.rule_map["expression"].prefix) == set(mutable_parse.UNARY_OPERATORS)
+
+
+def test_conflicting_alternatives():
+    grammar = Grammar("x", "", (
+        Rule("a", (Alt((NUMBER, SEMICOLON), "_1"), Alt(("b",), "_1"))),
+        Rule("b", (Alt((Opt(TRUE), NUMBER), "_2"),)),
+    ))
+    with pytest.raises(GrammarError, match="alternatives 1 and 2 can both start with NUMBER"):
+        grammar.check()
+
+
+def test_empty_alternative():
+    grammar = Grammar("x", "", (Rule("a", (Alt((Opt(TRUE),), "_1"),)),))
+    with pytest.raises(GrammarError, match="can be empty"):
+        grammar.check()
+
+
+def test_unknown_rule():
+    grammar = Grammar("x", "", (Rule("a", (Alt((NUMBER, "b"), "_1"),)),))
+    with pytest.raises(GrammarError, match="no rule named b"):
+        grammar.check()
+
+
+def parse(src):
+    return Parser(iter_tokens(src)).parse()
+
+
+def test_mutable_parser():
+    assert parse("42 * (7 + 3)") == Binary(
+        Literal(42.0), '*', Grouping(Binary(Literal(7.0), '+', Literal(3.0)))
+    )
+    assert parse("1 - 2 - 3") == Binary(Binary(Literal(1.0), '-', Literal(2.0)), '-', Literal(3.0))
+    assert parse("!true == -1 < 2") == Binary(
+        Unary('!', Literal(TRUE)), '==', Binary(Unary('-', Literal(1.0)), '<', Literal(2.0))
+    )
+    assert parse('"s" != null') == Binary(Literal('"s"'), '!=', Literal(mutable_parse.TT.NULL))
+
+
+@pytest.mark.parametrize("src", ["42 * (7 + 3)", "!true == -1 < 2", "(1"])
+def test_mutable_parser_reads_a_buffer_like_a_stream(src):
+    def outcome(tokens):
+        try:
+            return Parser(tokens).parse()
+        except RuntimeError as e:
+            return str(e)
+    assert outcome(TokenBuffer.from_source(src)) == outcome(iter_tokens(src))
+
+
+def test_mutable_parser_errors():
+    with pytest.raises(RuntimeError, match="Expect '\\)' after expression"):
+        parse("(1")
+    with pytest.raises(RuntimeError, match="Expect expression"):
+        parse("1 + ;")
+
+
+def test_parse_errors_name_the_expected_token():
+    with pytest.raises(RuntimeError, match="Expected .*IDENTIFIER"):
+        func_parse.lex_and_parse("fun f(a,) { return a; }")
+    with pytest.raises(RuntimeError, match="Expected .*SEMICOLON.* at the end of the input"):
+        func_parse.lex_and_parse("print(1)")
+    with pytest.raises(RuntimeError, match="Expected a statement"):
+        func_parse.lex_and_parse("{ 1; }")
+
+
+@pytest.mark.parametrize("src", ["print(", "1 +", "-", "print(1 + -", "f(1,"])
+def test_parse_errors_at_the_end_of_the_input(src):
+    with pytest.raises(RuntimeError, match="Expected an expression at the end of the input"):
+        func_parse.lex_and_parse(src)
+
+
+@pytest.mark.parametrize("src", ["1 +", "-", "(", "!"])
+def test_mutable_parser_errors_at_the_end_of_the_input(src):
+    with pytest.raises(RuntimeError, match="Expect expression"):
+        parse(src)
@@ -0,0 +1,63 @@
+from pox import ast_binary
+from pox.func_parse import Binary, Grouping, Identifier, Literal, Session, lex_and_parse
+from pox.hashcons import NodeFactory
+from operator import add, mul
+
+SRC = """
+fun f(x, y) { return (x + 1) * (x + 1); };
+print((x + 1) * 2);
+print((x + 1) * 2);
+"""
+
+
+def test_identical_subtrees_are_shared():
+    nodes = NodeFactory()
+    ast = lex_and_parse(SRC, session=Session(nodes=nodes))
+    function, first, second = ast.statements
+    product = function.body.statements[0].expr
+    assert product.left is product.right
+    assert first is second
+    assert first.expr.left is product.left
+
+
+def test_equality_and_hash_match_plain_nodes():
+    nodes = NodeFactory()
+    ast = lex_and_parse(SRC, session=Session(nodes=nodes))
+    plain = lex_and_parse(SRC)
+    assert ast == plain and plain == ast
+    assert ast == nodes.intern(plain)
+    assert ast != lex_and_parse("print(1);", session=Session(nodes=nodes))
+
+    x = Binary(add, Identifier("x"), Literal(1.0))
+    assert hash(nodes.intern(x)) == hash(x)
+    assert nodes.intern(x) == x and nodes.intern(x) is nodes.intern(x)
+    assert nodes.intern(x) != Grouping(x)
+    assert {x: 1}[nodes.intern(x)] == 1
+
+
+def test_separate_factories_compare_by_structure():
+    x = Binary(mul, Identifier("x"), Identifier("y"))
+    assert NodeFactory().intern(x) == NodeFactory().intern(x)
+
+
+def test_stack_parser_interns_too():
+    nodes = NodeFactory()
+    ast = lex_and_parse(SRC, recursive=False, session=Session(nodes=nodes))
+    assert ast.statements[1] is ast.statements[2]
+    assert ast == lex_and_parse(SRC)
+
+
+def test_deep_trees():
+    depth = 5000
+    expr = Identifier("x")
+    for _ in range(depth):
+        expr = Grouping(expr)
+    interned = NodeFactory().intern(expr)
+    for _ in range(depth):
+        interned = interned.expr
+    assert interned == Identifier("x")
+
+
+def test_consed_trees_serialize_as_plain_nodes():
+    ast = lex_and_parse(SRC, session=Session(nodes=NodeFactory()))
+    assert ast_binary.dumps(ast) == ast_binary.dumps(lex_and_parse(SRC))
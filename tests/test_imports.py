@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+import pox
+
+# microseconds `import pox` may take, best of a few runs
+IMPORT_BUDGET = 20_000
+
+
+def run(code):
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+
+
+def loaded(code):
+    out = run(code + "; import sys; print(sorted(m for m in sys.modules if m.startswith(('pox', 'colorama'))))")
+    return eval(out.stdout.splitlines()[-1])
+
+
+def test_import_pox_loads_nothing_else():
+    assert loaded("import pox") == ["pox"]
+    assert "colorama" not in loaded("import pox.func_parse")
+    assert "colorama" in loaded("import pox\ntry: pox.lex_and_parse('print(1 x);')\nexcept RuntimeError: pass")
+
+
+def test_no_work_at_import_time():
+    assert run("import pox.mutable_parse").stdout == ""
+
+
+def test_import_budget():
+    def cost():
+        # "import time: self | cumulative | name"
+        for line in run("import pox").stderr.splitlines():
+            if line.split("|")[-1].strip() == "pox":
+                return int(line.split("|")[1])
+        raise AssertionError("no timing for pox")
+
+    assert min(cost() for _ in range(3)) < IMPORT_BUDGET
+
+
+def test_lazy_attributes():
+    assert pox.lex_and_parse("print(1);") == pox.func_parse.lex_and_parse("print(1);")
+    assert pox.SymbolTable is pox.symbols.SymbolTable
+    assert "ParseCache" in dir(pox)
+    with pytest.raises(AttributeError):
+        pox.nothing_here
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from pox.func_parse import lex_and_parse
+from pox.incremental import IncrementalParse
+from pox.tokenizer import Edit
+
+SRC = """fun f(x) { return x + 1; }
+fun g(y) { return f(y) * 2; }
+print(f(1));
+print(g(2));
+"""
+
+
+def edited(src, old, new):
+    return Edit(src.index(old), len(old), new)
+
+
+def test_only_the_edited_statement_is_parsed_again():
+    parse = IncrementalParse(SRC)
+    before = parse.program.statements
+    assert parse.reparsed == 4
+
+    program = parse.edit(edited(SRC, "f(y) * 2", "f(y) * 3"))
+
+    assert parse.reparsed == 1
+    assert program == lex_and_parse(parse.src)
+    assert [a is b for a, b in zip(before, program.statements)] == [True, False, True, True]
+
+
+def test_edits_that_change_statement_boundaries():
+    parse = IncrementalParse(SRC)
+    # joins the two prints into one statement
+    program = parse.edit(edited(SRC, "print(f(1));\nprint(", "print(f(1) + "))
+    assert program == lex_and_parse(parse.src)
+    assert len(program.statements) == 3
+    # an inserted ';' after a fun's brace belongs to the fun
+    src = parse.src
+    program = parse.edit(Edit(src.index("}") + 1, 0, ";"))
+    assert program == lex_and_parse(parse.src)
+    assert parse.reparsed == 1
+
+
+def test_a_failed_edit_is_recovered_from():
+    parse = IncrementalParse(SRC)
+    with pytest.raises(RuntimeError) as info:
+        parse.edit(edited(SRC, "print(f(1));", "print(f(1)"))
+    assert parse.program is None
+    # the error shows the source around it, as a full parse's does
+    with pytest.raises(RuntimeError) as full:
+        lex_and_parse(parse.src)
+    assert str(info.value) == str(full.value)
+    assert "line 4, column 1" in str(info.value)
+    src = parse.src
+    program = parse.edit(Edit(src.index("\nprint(g"), 0, ");"))
+    assert program == lex_and_parse(parse.src)
+
+
+def test_random_edits_match_a_full_parse():
+    rng = random.Random(0)
+    pieces = ["1", "x", " + ", ";", "(", ")", "print(2);", "}", "{", "fun h() { return 3; }", ""]
+    parse = IncrementalParse(SRC)
+    for _ in range(300):
+        src = parse.src
+        offset = rng.randrange(len(src) + 1)
+        edit = Edit(offset, min(rng.randrange(4), len(src) - offset), rng.choice(pieces))
+        try:
+            expected = lex_and_parse(edit.apply(src))
+        except Exception:
+            expected = None
+        try:
+            program = parse.edit(edit)
+        except Exception:
+            program = None
+        assert program == expected
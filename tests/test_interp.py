@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+from pox.func_parse import Block, Call, Function, FunctionApply, Identifier, Literal, Print, Program, Return, Var
+from pox.hashcons import NodeFactory
+from pox.func_parse import Session, lex_and_parse
+from pox.interp import Environment, InterpretError, PoxFunction, compile, run, run_source
+
+
+def test_errors():
+    with pytest.raises(InterpretError, match="Undefined name y"):
+        run_source("print(y);")
+    with pytest.raises(InterpretError, match="f takes 1 arguments, not 2"):
+        run_source("fun f(a) { return a; } f(1, 2);")
+    with pytest.raises(InterpretError, match="Can't call 1"):
+        run_source("fun f(a) { return a; } f(1)(2);")
+    with pytest.raises(InterpretError):
+        run_source("fun f() { return 1; } print(f + 1);")
+    with pytest.raises(InterpretError, match="bad operand type"):
+        run_source("fun f() { return 1; } print(-f);")
+    with pytest.raises(TypeError, match="no handler for 'print'"):
+        run(Program(("print",)))
+
+
+def test_compiled_once_runs_many_times():
+    out = io.StringIO()
+    program = compile(lex_and_parse("fun f(x) { return x * 2; } print(f(n));"), out)
+    for n in (1.0, 2.0):
+        env = program(Environment({"n": n}))
+        assert isinstance(env.values["f"], PoxFunction)
+        assert env.values["f"](5.0) == 10.0
+    assert out.getvalue() == "2\n4\n"
+
+
+def test_other_trees():
+    out = io.StringIO()
+    square = Function("square", ["x"], Block((Return(Call(Identifier("mul"), (Identifier("x"),))),)))
+    program = Program((
+        Function("mul", ["a"], Block((Return(Literal(6.0)),))),
+        square,
+        Var("y", Literal(2.0)),
+        Print(FunctionApply("square", ("y",))),
+    ))
+    run(program, out)
+    assert out.getvalue() == "6\n"
+
+    consed = lex_and_parse("fun f(x) { return x + 1; } print(f(f(1)));", session=Session(nodes=NodeFactory()))
+    out = io.StringIO()
+    run(consed, out)
+    assert out.getvalue() == "3\n"
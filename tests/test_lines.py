@@ -0,0 +1,58 @@
+import pytest
+
+from pox.func_parse import lex_and_parse, parse_file
+from pox.lines import LineIndex, render
+
+SRC = "fun f(x) {\n  return x;\n}\nprint(1 + 2);\nprint(3 * 4 x);\nprint(5);"
+
+
+def test_locate():
+    index = LineIndex.from_source(SRC)
+    assert len(index) == 6
+    assert index.locate(0) == (1, 1)
+    assert index.locate(SRC.index("return")) == (2, 3)
+    assert index.locate(SRC.rindex("x)")) == (5, 13)
+    assert index.locate(len(SRC)) == (6, 10)
+
+
+def test_render_window():
+    index = LineIndex.from_source(SRC)
+    start = SRC.rindex("x)")
+    read_lines = lambda first, last: index.source_lines(SRC, first, last)
+    assert render(index, read_lines, start, start + 1, context=1) == "\n".join(
+        [
+            " --> line 5, column 13",
+            "4 | print(1 + 2);",
+            "5 | print(3 * 4 x);",
+            "  |             ^",
+            "6 | print(5);",
+        ]
+    )
+
+
+def test_render_clips_wide_lines():
+    src = "a" * 1000 + " $$$ " + "b" * 1000
+    index = LineIndex.from_source(src)
+    read_lines = lambda first, last: index.source_lines(src, first, last)
+    out = render(index, read_lines, 1001, 1004, width=20).split("\n")
+    assert out[1] == "1 | aaaaaaaaa $$$ bbbbbb"
+    assert out[2] == "  |           ^^^"
+
+
+def test_panic_shows_only_context():
+    src = "print(1);\n" * 10000 + "print(3 * 4 x);\n" + "print(2);\n" * 10000
+    with pytest.raises(RuntimeError, match="Expected") as e:
+        lex_and_parse(src)
+    context = str(e.value).split("\n", 2)[2]
+    assert context.count("\n") == 6
+    assert "line 10001, column 13" in context
+
+
+def test_panic_from_file(tmp_path):
+    path = tmp_path / "src.pox"
+    path.write_text("// ünïcode\n" + SRC)
+    with pytest.raises(RuntimeError, match="Expected") as e:
+        parse_file(str(path))
+    out = str(e.value)
+    assert "line 6, column 13" in out
+    assert "6 | print(3 * 4 " in out
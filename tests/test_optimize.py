@@ -0,0 +1,71 @@
+import io
+from operator import add, mul
+
+import pytest
+
+from pox.func_parse import Binary, Block, Identifier, Literal, Print, Program, Return, Session, lex_and_parse
+from pox.hashcons import NodeFactory
+from pox.interp import run
+from pox.optimize import count, optimize, summary
+
+
+def optimized(src, **kwargs):
+    return optimize(lex_and_parse(src, **kwargs))[0]
+
+
+def test_constant_expressions():
+    assert optimized("print((1 + 2) * 3 - -1);") == Program((Print(Literal(10.0)),))
+    assert optimized("print(x * (2 + 3));") == Program((Print(Binary(mul, Identifier("x"), Literal(5.0))),))
+    assert optimized("print(0 && f() || 2);") == Program((Print(Literal(2.0)),))
+    assert optimized("print(1 && f());").statements[0].expr.callee == Identifier("f")
+
+
+def test_operations_that_cant_be_folded():
+    # they raise, or don't make a number, when the program runs
+    for src in ("print(1 / 0);", "print(1 < 2);", "print(!1);", "print(1 & 2);"):
+        program = lex_and_parse(src)
+        assert optimize(program)[0] is program
+
+
+def test_groupings_go():
+    assert optimized("print((x) + ((y)));") == Program(
+        (Print(Binary(add, Identifier("x"), Identifier("y"))),)
+    )
+
+
+def test_unreachable_statements():
+    program = optimized("fun f(x) { print(x); return x; print(1); return 2; } print(f(3)); return 4; print(5);")
+    assert len(program.statements) == 3
+    assert program.statements[0].body.statements[1] == Return(Identifier("x"))
+    assert len(program.statements[0].body.statements) == 2
+    assert program.statements[2] == Return(Literal(4.0))
+    # a block that returns ends the block it is in
+    nested = Block((Print(Identifier("x")), Block((Return(Identifier("x")),)), Print(Literal(1.0))))
+    assert optimize(nested)[0] == Block(nested.statements[:2])
+
+
+def test_unchanged_trees_are_reused():
+    program = lex_and_parse("fun f(x) { return x + 1; } print(f(2));")
+    result, report = optimize(program)
+    assert result is program
+    assert [(s.name, s.changes) for s in report] == [("fold", 0), ("ungroup", 0), ("dead_code", 0)]
+
+
+def test_report():
+    program = lex_and_parse("print((1 + 2)); return 1; print(3);")
+    _, report = optimize(program)
+    assert [(s.name, s.changes, s.nodes_before, s.nodes_after) for s in report] == [
+        ("fold", 2, 10, 7), ("ungroup", 0, 7, 7), ("dead_code", 2, 7, 5),
+    ]
+    assert report[0].nodes_before == count(program)
+    assert summary(report).splitlines()[0].startswith("fold")
+
+
+@pytest.mark.parametrize("nodes", [None, NodeFactory()])
+def test_same_output(nodes):
+    src = "fun f(x) { return (x + 2 * 3) / (1 + 1); print(0); } print(f(4)); print(1 || f(0));"
+    expected, out = io.StringIO(), io.StringIO()
+    program = lex_and_parse(src, session=Session(nodes=nodes))
+    run(program, expected)
+    run(optimize(program)[0], out)
+    assert out.getvalue() == expected.getvalue() == "5\n1\n"
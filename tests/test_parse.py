@@ -1,14 +1,25 @@
+import pytest
+
 from pox.func_parse import (
+    Session,
     lex_and_parse,
     to_json,
     Program,
     Function,
     Block,
+    Call,
     Return,
     Binary,
     Identifier,
+    Print,
+    Literal,
+    Unary,
+    Grouping,
+    logical_and,
+    logical_or,
 )
-from operator import mul
+from pox.symbols import SymbolTable
+from operator import add, mul, sub, truediv, neg, not_, eq, lt, ge, and_, or_, xor
 
 
 def test_parse_function():
@@ -39,3 +50,147 @@ def test_parse_function():
             ),
         )
     )
+
+
+def test_parse_skips_comments():
+    src = """
+    // first
+    fun one() { return 1; }
+    /* second /* nested */ */
+    fun two() { return 2; }
+    print(1 + 2);
+    """
+
+    ast = lex_and_parse(src)
+
+    assert ast == Program(
+        statements=(
+            Function(name="one", parameters=[], body=Block((Return(Literal(1.0)),))),
+            Function(name="two", parameters=[], body=Block((Return(Literal(2.0)),))),
+            Print(Binary(operator=add, left=Literal(1.0), right=Literal(2.0))),
+        )
+    )
+
+
+def test_parse_records_symbol_ids():
+    symbols = SymbolTable()
+    ast = lex_and_parse("fun f(x, y) { return y * x; } print(f);", symbols)
+    f, p = ast.statements
+
+    assert symbols.names == ["f", "x", "y"]
+    assert (f.name_id, f.parameter_ids) == (0, (1, 2))
+    assert f.body.statements[0].expr.left.symbol_id == 2
+    assert p.expr.symbol_id == 0
+    assert p.expr.symbol is f.name
+
+
+def expr(src: str):
+    return lex_and_parse(f"print({src});").statements[0].expr
+
+
+X, Y, Z, F = Identifier("x"), Identifier("y"), Identifier("z"), Identifier("f")
+
+
+def test_operators_are_left_associative():
+    assert expr("x - y - z") == Binary(sub, Binary(sub, X, Y), Z)
+    assert expr("x / y * z") == Binary(mul, Binary(truediv, X, Y), Z)
+
+
+def test_operator_precedence():
+    assert expr("x + y * z") == Binary(add, X, Binary(mul, Y, Z))
+    assert expr("x * (y + z)") == Binary(mul, X, Grouping(Binary(add, Y, Z)))
+    assert expr("x < y == y >= z") == Binary(eq, Binary(lt, X, Y), Binary(ge, Y, Z))
+    assert expr("x | y ^ z & x") == Binary(or_, X, Binary(xor, Y, Binary(and_, Z, X)))
+    assert expr("x || y && z == x") == Binary(logical_or, X, Binary(logical_and, Y, Binary(eq, Z, X)))
+    assert expr("x or y and z") == expr("x || y && z")
+
+
+def test_unary_operators():
+    assert expr("-x * !y") == Binary(mul, Unary(neg, X), Unary(not_, Y))
+    assert expr("!-x") == Unary(not_, Unary(neg, X))
+    assert expr("x - -y") == Binary(sub, X, Unary(neg, Y))
+
+
+SAMPLE = """
+// every construct the grammar has
+fun f(a, b, c) {
+  fun g(x) { return -(x + a) * !b; };
+  print(c / (a - (b || c && a)));
+  return a | b ^ c & (a == b);
+}
+print(1 + 2 * 3);
+x < y >= -(-z);
+f(1, g(2)(), -f(x, y, z))(3);
+"""
+
+
+def test_stack_parser_matches_recursive_parser():
+    assert lex_and_parse(SAMPLE, recursive=False) == lex_and_parse(SAMPLE)
+    assert lex_and_parse("", recursive=False) == Program(statements=())
+
+
+def _parse_error(src, recursive):
+    try:
+        lex_and_parse(src, recursive=recursive)
+    except Exception as e:
+        return type(e), str(e)
+    raise AssertionError(f"{src!r} parsed")
+
+
+@pytest.mark.parametrize("src", [
+    "fun f(b, ) {}", "fun f(,) {}", "fun f(a b) {}", "fun 1() {}", "fun f", "fun f() ", "fun f() {", "fun f() { ; }",
+    "print", "print(", "print(1", "print(1)", "1 +", "-", "(1;", "f(", "f(1,)", "f(;", "f()(", "{ 1; }", "1 2;",
+])
+def test_stack_parser_fails_like_recursive_parser(src):
+    error, message = _parse_error(src, recursive=True)
+    assert error is RuntimeError
+    assert _parse_error(src, recursive=False) == (error, message)
+
+
+def _statement_positions(src, recursive):
+    session = Session(positions={})
+    ast = lex_and_parse(src, recursive=recursive, session=session)
+    found = []
+
+    def walk(statements):
+        for stmt in statements:
+            found.append((type(stmt).__name__, session.positions.get(id(stmt))))
+            if isinstance(stmt, Function):
+                walk(stmt.body.statements)
+
+    walk(ast.statements)
+    return found
+
+
+def test_stack_parser_records_statement_positions():
+    src = "print(1);\nfun f(a) {\n  return a;\n  f(a);\n};\n-f(2);"
+    assert _statement_positions(src, recursive=False) == _statement_positions(src, recursive=True) == [
+        ("Print", 0), ("Function", 10), ("Return", 23), ("Call", 35), ("Unary", 44),
+    ]
+
+
+def test_stack_parser_has_no_depth_limit():
+    depth = 5000
+    ast = lex_and_parse("(" * depth + "x" + ")" * depth + ";", recursive=False)
+    node = ast.statements[0]
+    for _ in range(depth):
+        node = node.expr
+    assert node == X
+
+    depth = 3000
+    src = "".join(f"fun f{n}(a) {{" for n in range(depth)) + "return a;" + "}" * depth
+    ast = lex_and_parse(src, recursive=False)
+    node = ast.statements[0]
+    for n in range(depth):
+        assert node.name == f"f{n}"
+        node = node.body.statements[0]
+    assert node == Return(Identifier("a"))
+
+
+def test_calls():
+    assert expr("f()") == Call(F, ())
+    assert expr("f(x, y + 1)(z)") == Call(Call(F, (X, Binary(add, Y, Literal(1.0)))), (Z,))
+    assert expr("-f(x) * 2") == Binary(mul, Unary(neg, Call(F, (X,))), Literal(2.0))
+    assert lex_and_parse("f()(x)(); print(f((x), -y));", recursive=False) == lex_and_parse(
+        "f()(x)(); print(f((x), -y));"
+    )
@@ -0,0 +1,54 @@
+import io
+import traceback
+
+import pytest
+
+from pox.interp import InterpretError
+from pox.pycompile import compile_source
+
+
+def test_functions_are_python_functions():
+    namespace = compile_source("fun sq(x) { return x * x; }").run()
+    assert namespace["sq"](3) == 9
+    assert list(namespace) == ["sq"]
+    out = io.StringIO()
+    compile_source("print(sq(k));").run({"sq": namespace["sq"], "k": 4}, out)
+    assert out.getvalue() == "16\n"
+
+
+def test_tracebacks_point_at_pox_lines():
+    src = "fun f(x) {\n  return x;\n}\nfun g(x) {\n  return f(x) / 0;\n}\ng(1);\n"
+    with pytest.raises(InterpretError, match="division by zero") as info:
+        compile_source(src, "<divide>").run()
+    frames = traceback.extract_tb(info.value.__cause__.__traceback__)
+    assert [(frame.filename, frame.lineno) for frame in frames[1:]] == [("<divide>", 7), ("<divide>", 5)]
+    assert frames[-1].line == "return f(x) / 0;"
+
+
+def test_errors():
+    with pytest.raises(InterpretError, match="Undefined name y"):
+        compile_source("fun f() { return y; } f();").run()
+    with pytest.raises(InterpretError, match="Undefined name f"):
+        compile_source("fun g() { print(f()); fun f() { return 2; } } g();").run()
+    with pytest.raises(InterpretError, match="Undefined name None$"):
+        compile_source("print(None);").run()
+    with pytest.raises(InterpretError, match="not callable"):
+        compile_source("x();").run({"x": 1})
+    with pytest.raises(InterpretError, match="takes 1 positional argument"):
+        compile_source("fun f(a) { return a; } f(1, 2);").run()
+
+
+def test_compiled_once_per_source():
+    src = "print(1);"
+    assert compile_source(src) is compile_source(src)
+    assert compile_source(src, "<other>") is not compile_source(src)
+
+
+def test_tracebacks_show_the_source_that_ran():
+    first = "print(1 / 0);\n"
+    compile_source(first, "<shared>")
+    compile_source("print(2);\nprint(2 / 0);\n", "<shared>")
+    with pytest.raises(InterpretError) as info:
+        compile_source(first, "<shared>").run()
+    frames = traceback.extract_tb(info.value.__cause__.__traceback__)
+    assert frames[-1].line == "print(1 / 0);"
@@ -0,0 +1,68 @@
+import pytest
+
+from pox.func_parse import Session, lex_and_parse
+from pox.hashcons import NodeFactory
+from pox.resolver import ResolveError, resolve
+
+
+def test_addresses():
+    program = lex_and_parse("""
+    fun adder(x) {
+      fun add(y) { return x + y; }
+      return add;
+    }
+    print(adder(1)(2));
+    """)
+    adder = program.statements[0]
+    add = adder.body.statements[0]
+    resolution = resolve(program)
+    assert resolution.frame(program) == ("adder",)
+    assert resolution.frame(adder) == ("x", "add")
+    assert resolution.frame(add) == ("y",)
+
+    body = add.body.statements[0].expr
+    assert resolution.address(body.left) == (1, 0)
+    assert resolution.address(body.right) == (0, 0)
+    assert resolution.address(adder.body.statements[1].expr) == (0, 1)
+    call = program.statements[1].expr
+    assert resolution.address(call.callee.callee) == (0, 0)
+
+
+def test_names_defined_later_in_a_scope():
+    # f's body only runs once g is defined
+    program = lex_and_parse("fun f() { return g(); } fun g() { return 1; } print(f());")
+    resolution = resolve(program)
+    assert resolution.frame(program) == ("f", "g")
+    assert resolution.address(program.statements[0].body.statements[0].expr.callee) == (1, 1)
+
+
+def test_uses_before_a_local_definition_find_the_outer_name():
+    program = lex_and_parse(
+        "fun g() { return 1; } fun f() { print(g()); fun g() { return 2; } print(g()); return 0; } print(f());"
+    )
+    f = program.statements[1]
+    resolution = resolve(program)
+    assert resolution.address(f.body.statements[0].expr.callee) == (1, 0)
+    assert resolution.address(f.body.statements[2].expr.callee) == (0, 0)
+
+
+def test_predefined_names():
+    program = lex_and_parse("print(k + 1);")
+    with pytest.raises(ResolveError):
+        resolve(program)
+    assert resolve(program, ["k"]).address(program.statements[0].expr.left) == (0, 0)
+
+
+def test_every_error_is_reported():
+    with pytest.raises(ResolveError) as info:
+        resolve(lex_and_parse("fun f(a, a) { return b; } print(c); print(c);"))
+    assert info.value.errors == ["f has two parameters named a", "Undefined name b in f", "Undefined name c in <program>"]
+
+
+def test_shared_nodes():
+    nodes = NodeFactory()
+    same = lex_and_parse("fun f(x) { return x; } fun g(x) { return x; }", session=Session(nodes=nodes))
+    resolve(same)
+    different = lex_and_parse("fun f(x) { return x; } fun g(y, x) { return x; }", session=Session(nodes=nodes))
+    with pytest.raises(ResolveError, match="shared between scopes"):
+        resolve(different)
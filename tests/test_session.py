@@ -0,0 +1,42 @@
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pox.func_parse import Session, lex_and_parse
+
+
+def test_session_keeps_diagnostics():
+    session = Session()
+    with pytest.raises(RuntimeError):
+        lex_and_parse("print(1);\nprint(2 x);\n", session=session)
+    assert session.src.startswith("print(1);")
+    assert session.tokens[8].lexeme == "x"
+    [diagnostic] = session.diagnostics
+    assert "line 2, column 9" in diagnostic
+
+
+def source(n):
+    # each bad source fails on its own line, at an identifier naming it
+    return "print(1);\n" * (n % 50) + f"print(1 + 2 bad{n});\n" + "print(2);\n" * 50
+
+
+def parse(n):
+    with pytest.raises(RuntimeError) as e:
+        lex_and_parse(source(n))
+    return str(e.value)
+
+
+def test_concurrent_parses_keep_their_own_source():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(parse, range(400)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    for n, error in enumerate(results):
+        assert f"line {n % 50 + 1}, column 13" in error
+        assert re.findall(r"bad\d+", error) == [f"bad{n}"]
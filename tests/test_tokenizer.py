@@ -0,0 +1,275 @@
+import pytest
+from hypothesis import given
+from hypothesis.strategies import integers, text
+
+from pox.token_types import *
+from pox.symbols import SymbolTable
+from pox.tokenizer import tokenize, iter_tokens, iter_file_tokens, relex, Edit, EditableTokens, LexError, TokenStream, TokenBuffer
+
+
+def kinds(src: str):
+    return [(t.token_type, t.lexeme) for t in tokenize(src)]
+
+
+def test_tokenize_positions():
+    tokens = tokenize("fun f(x) {\n  return x * 2.5;\n}")
+    assert [(t.token_type, t.char, t.lexeme) for t in tokens] == [
+        (FUN, 0, "fun"),
+        (IDENTIFIER, 4, "f"),
+        (OPEN_PAREN, 5, "("),
+        (IDENTIFIER, 6, "x"),
+        (CLOSE_PAREN, 7, ")"),
+        (OPEN_BRACE, 9, "{"),
+        (RETURN, 13, "return"),
+        (IDENTIFIER, 20, "x"),
+        (STAR, 22, "*"),
+        (NUMBER, 24, "2.5"),
+        (SEMICOLON, 27, ";"),
+        (CLOSE_BRACE, 29, "}"),
+    ]
+
+
+def test_keywords_need_a_whole_word():
+    assert kinds("format fun fun_ printer or") == [
+        (IDENTIFIER, "format"),
+        (FUN, "fun"),
+        (IDENTIFIER, "fun_"),
+        (IDENTIFIER, "printer"),
+        (OR, "or"),
+    ]
+
+
+def test_longest_operator_wins():
+    assert kinds("!== <=> && & || |") == [
+        (BANG_EQUAL, "!="),
+        (EQUAL, "="),
+        (LESS_EQUAL, "<="),
+        (GREATER, ">"),
+        (AND, "&&"),
+        (BINAND, "&"),
+        (OR, "||"),
+        (BINOR, "|"),
+    ]
+
+
+def test_numbers():
+    assert kinds("1 1. 1.5 .5") == [
+        (NUMBER, "1"),
+        (NUMBER, "1."),
+        (NUMBER, "1.5"),
+        (DOT, "."),
+        (NUMBER, "5"),
+    ]
+
+
+def test_strings():
+    assert kinds(r"""'a"b' "c\"d" """) == [
+        (STRING, "'a\"b'"),
+        (STRING, r'"c\"d"'),
+    ]
+
+
+def test_comments():
+    assert kinds("a // line \\\n still\nb /* x /* y */ z */ c /*/ d") == [
+        (IDENTIFIER, "a"),
+        (LINE_COMMENT, "// line \\\n still\n"),
+        (IDENTIFIER, "b"),
+        (MULTI_LINE_COMMENT, "/* x /* y */ z */"),
+        (IDENTIFIER, "c"),
+        (MULTI_LINE_COMMENT, "/*/"),
+        (IDENTIFIER, "d"),
+    ]
+
+
+def test_unterminated_comment_runs_to_the_end():
+    assert kinds("a /* b /* c */") == [
+        (IDENTIFIER, "a"),
+        (MULTI_LINE_COMMENT, "/* b /* c */"),
+    ]
+
+
+def test_whitespace_only():
+    assert tokenize("") == []
+    assert tokenize(" \n\t ") == []
+
+
+@pytest.mark.parametrize("src, char", [("a $", 2), ("x 'open", 2), ("  #", 2)])
+def test_lex_error(src: str, char: int):
+    with pytest.raises(LexError, match=f"at char {char}$"):
+        tokenize(src)
+
+
+def test_iter_tokens_drops_comments():
+    src = "a // line\nb /* block */ c"
+    assert [t.lexeme for t in iter_tokens(src)] == ["a", "b", "c"]
+    assert [t for t in tokenize(src) if t.token_type not in (LINE_COMMENT, MULTI_LINE_COMMENT)] == list(
+        iter_tokens(src)
+    )
+
+
+def test_iter_tokens_is_lazy():
+    tokens = iter_tokens("a b $")
+    assert next(tokens).lexeme == "a"
+    assert next(tokens).lexeme == "b"
+    with pytest.raises(LexError):
+        next(tokens)
+
+
+def test_token_stream_lookahead_and_release():
+    stream = TokenStream(iter_tokens("a b c d"))
+    assert stream[2].lexeme == "c"
+    assert stream.has(3)
+    assert not stream.has(4)
+
+    stream.release(2)
+    assert stream[2].lexeme == "c"
+    with pytest.raises(IndexError):
+        stream[1]
+    with pytest.raises(IndexError):
+        stream[4]
+
+
+def test_token_buffer_matches_tokenize():
+    src = "fun f(x) { /* c */ return x + 1.5; } // done"
+    buffer = TokenBuffer.from_source(src, comments=True)
+    assert len(buffer) == len(tokenize(src))
+    assert list(buffer) == tokenize(src)
+    assert TOKEN_TYPES[buffer.kind(0)] is FUN
+    assert buffer.kind(0) == FUN.code
+    assert buffer.lexeme(1) == "f"
+    assert [t.lexeme for t in TokenBuffer.from_source(src)] == [t.lexeme for t in iter_tokens(src)]
+
+
+def test_token_buffer_parses_like_a_stream():
+    from pox.func_parse import _parse
+
+    src = "fun f(x, y) { return x * (y + 2); } print(f);"
+    assert _parse(TokenBuffer.from_source(src)) == _parse(iter_tokens(src))
+
+
+def test_token_buffer_symbols_are_interned_when_lexing():
+    from pox.func_parse import _parse
+
+    src = "fun f(x, y) { return x * y; } print(f(y, 1));"
+    symbols = SymbolTable()
+    buffer = TokenBuffer.from_source(src, symbols=symbols)
+    assert [t.symbol for t in buffer] == [t.symbol for t in tokenize(src, SymbolTable())]
+    names = list(symbols.names)
+    # reading them back leaves the table alone
+    assert _parse(buffer) == _parse(iter_tokens(src, SymbolTable()))
+    assert symbols.names == names
+    assert TokenBuffer.from_source(src)[1].symbol is None
+
+
+def relexed(src: str, edit: Edit):
+    tokens = EditableTokens(tokenize(src))
+    new_src = edit.apply(src)
+    relex(tokens, new_src, edit)
+    return list(tokens), new_src
+
+
+def test_relex_only_rescans_the_edit():
+    src = "fun f(x) { return x + 1; }\nprint(f(2));"
+    tokens = EditableTokens(tokenize(src))
+    tail = list(tokens)[-4:]
+    edit = Edit(offset=src.index("1;"), deleted=1, inserted="100")
+    new_src = edit.apply(src)
+
+    lo, hi = relex(tokens, new_src, edit)
+
+    assert list(tokens) == tokenize(new_src)
+    assert [t.lexeme for t in list(tokens)[lo:hi]] == ["100"]
+    assert all(a is b for a, b in zip(tail, list(tokens)[-4:]))
+
+
+def test_relex_leaves_the_tokens_past_the_edit_alone():
+    src = "print(1);\n" * 1000
+    tokens = EditableTokens(tokenize(src))
+    last = list(tokens)[-1]
+    char = last.char
+    for n in range(3):
+        edit = Edit(offset=6 + n, deleted=0, inserted="2")
+        src = edit.apply(src)
+        relex(tokens, src, edit)
+    # only reading it brings its offset up to date
+    assert last.char == char
+    assert list(tokens)[-1] is last
+    assert last.char == char + 3
+    assert list(tokens) == tokenize(src)
+
+
+@pytest.mark.parametrize(
+    "src, edit",
+    [
+        ("a /* b */ c", Edit(3, 0, "/* ")),
+        ("a /* b /* c */ d */ e", Edit(12, 2, "")),
+        ("a /* b */ c */ d", Edit(0, 0, "/*")),
+        ('x "a b" y', Edit(4, 0, '" + "')),
+        ('x "a b" y "c" z', Edit(3, 1, "")),
+        ("ab cd", Edit(2, 1, "")),
+        ("format", Edit(3, 3, "")),
+        ("a // c\nb", Edit(6, 1, " ")),
+    ],
+)
+def test_relex_matches_tokenize(src: str, edit: Edit):
+    tokens, new_src = relexed(src, edit)
+    assert tokens == tokenize(new_src)
+
+
+@given(
+    src=text(alphabet="ab1 \n/*\\\"'+=;", max_size=30),
+    offset=integers(min_value=0, max_value=30),
+    deleted=integers(min_value=0, max_value=5),
+    inserted=text(alphabet="ab1 \n/*\\\"'+=;", max_size=5),
+)
+def test_relex_random_edits(src: str, offset: int, deleted: int, inserted: str):
+    offset = min(offset, len(src))
+    edit = Edit(offset, min(deleted, len(src) - offset), inserted)
+    new_src = edit.apply(src)
+    try:
+        tokens = EditableTokens(tokenize(src))
+        expected = tokenize(new_src)
+    except LexError:
+        return
+    relex(tokens, new_src, edit)
+    assert list(tokens) == expected
+
+
+FILE_SRC = """\
+// héllo wörld
+fun long_function_name(x, y) {
+  /* a /* nested ☃ */ comment */
+  return "a string with \\" escapes ✓" + 12.75;
+}
+print(long_function_name(1, 2));
+"""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 64, 1 << 20])
+@pytest.mark.parametrize("comments", [False, True])
+def test_iter_file_tokens_across_chunks(tmp_path, chunk_size: int, comments: bool):
+    path = tmp_path / "src.pox"
+    path.write_text(FILE_SRC, encoding="utf-8")
+    expected = tokenize(FILE_SRC) if comments else list(iter_tokens(FILE_SRC))
+    assert list(iter_file_tokens(str(path), comments, chunk_size)) == expected
+
+
+@pytest.mark.parametrize("src, char", [("", None), ("a b $ c", 4), ("a 'open", 2)])
+def test_iter_file_tokens_errors(tmp_path, src: str, char):
+    path = tmp_path / "src.pox"
+    path.write_text(src)
+    if char is None:
+        assert list(iter_file_tokens(str(path), chunk_size=2)) == []
+    else:
+        with pytest.raises(LexError, match=f"at char {char}$"):
+            list(iter_file_tokens(str(path), chunk_size=2))
+
+
+def test_tokenize_interns_identifiers():
+    symbols = SymbolTable()
+    tokens = tokenize("x + y * x(fun)", symbols)
+    xs = [t for t in tokens if t.lexeme == "x"]
+    assert xs[0].lexeme is xs[1].lexeme
+    assert [t.symbol for t in tokens] == [0, None, 1, None, 0, None, None, None]
+    assert symbols.names == ["x", "y"]
+    assert tokens == tokenize("x + y * x(fun)")